@@ -0,0 +1,160 @@
+'''
+    IPv4 addresses and CIDR prefixes
+
+    Addresses are the dotted strings of the testcase files ('10.2.0.7'), prefixes
+    the same with a length ('10.2.0.0/24'). A router owning a subnet advertises the
+    prefix instead of the addresses it covers (see Router.addSubnet), and the
+    routers forward with a longest-prefix match over the prefixes they know.
+'''
+
+_values = {}
+
+
+def address_value(address):
+    '''
+        32-bit integer of a dotted address, memoized
+    '''
+    value = _values.get(address)
+    if value is None:
+        parts = address.split('.')
+        if len(parts) != 4:
+            raise ValueError('invalid address ' + address)
+        value = 0
+        for part in parts:
+            byte = int(part)
+            if not 0 <= byte < 256:
+                raise ValueError('invalid address ' + address)
+            value = value << 8 | byte
+        _values[address] = value
+    return value
+
+
+def is_prefix(destination):
+    '''
+        Check whether a destination of a routing table is a prefix
+    '''
+    return '/' in destination
+
+
+def parse_prefix(prefix):
+    '''
+        Split a prefix into the integer of its network and its length
+
+        Return:
+            (network, length), the bits of network past length are cleared
+    '''
+    if not is_prefix(prefix):
+        raise ValueError('invalid prefix ' + prefix)
+    address, length = prefix.split('/')
+    length = int(length)
+    if not 0 <= length <= 32:
+        raise ValueError('invalid prefix ' + prefix)
+    return address_value(address) & _mask(length), length
+
+
+def covers(prefix, address):
+    '''
+        Check whether a prefix contains an address
+    '''
+    network, length = parse_prefix(prefix)
+    return address_value(address) & _mask(length) == network
+
+
+def _mask(length):
+    return (0xffffffff << (32 - length)) & 0xffffffff
+
+
+
+class _Node(object):
+    '''
+        Node of PrefixTrie, the prefix network/length, children indexed by the next bit
+    '''
+    __slots__ = ('network', 'length', 'prefix', 'children')
+
+    def __init__(self, network, length, prefix = None):
+        self.network = network
+        self.length = length
+        self.prefix = prefix
+        self.children = [None, None]
+
+
+
+class PrefixTrie(object):
+    '''
+        Binary trie of prefixes for longest-prefix match, path compressed: a node is
+        either a prefix stored or a branching point, chains of single children are skipped,
+        so a lookup visits at most one node per prefix containing the address (plus branchings)
+
+        Attributes:
+            root: root node, None if the trie is empty
+            size: number of prefixes stored
+            cache: address -> result of lookup, cleared when a prefix is inserted
+    '''
+    def __init__(self):
+        self.root = None
+        self.size = 0
+        self.cache = {}
+
+    def __len__(self):
+        return self.size
+
+    def insert(self, prefix):
+        '''
+            Store a prefix ('10.2.0.0/24'), nothing happens if it is already stored
+        '''
+        network, length = parse_prefix(prefix)
+        self.root = self._insert(self.root, network, length, prefix)
+        self.cache = {}
+
+    def _insert(self, node, network, length, prefix):
+        '''
+            Insert a prefix below node
+
+            Return:
+                the node to put in place of node
+        '''
+        if node is None:
+            self.size += 1
+            return _Node(network, length, prefix)
+        common = min(node.length, length, 32 - (node.network ^ network).bit_length())
+        if common == node.length:
+            if length == node.length:
+                if node.prefix is None:
+                    node.prefix = prefix
+                    self.size += 1
+                return node
+            bit = network >> (31 - node.length) & 1
+            node.children[bit] = self._insert(node.children[bit], network, length, prefix)
+            return node
+        # the prefix and node part before the end of node: split there
+        if common == length:
+            self.size += 1
+            new = _Node(network, length, prefix)
+        else:
+            new = _Node(network & _mask(common), common)
+            new.children[network >> (31 - common) & 1] = self._insert(None, network, length, prefix)
+        new.children[node.network >> (31 - common) & 1] = node
+        return new
+
+    def lookup(self, address):
+        '''
+            Longest prefix containing an address
+
+            Return:
+                the prefix string, None if no prefix contains the address
+        '''
+        if address in self.cache:
+            return self.cache[address]
+        value = address_value(address)
+        node = self.root
+        best = None
+        while node is not None:
+            if (value ^ node.network) >> (32 - node.length):
+                break
+            if node.prefix is not None:
+                best = node.prefix
+            if node.length == 32:
+                break
+            node = node.children[value >> (31 - node.length) & 1]
+        self.cache[address] = best
+        return best
@@ -0,0 +1,242 @@
+'''
+    Active queue management: queue disciplines of a Buffer
+
+    A buffer without queue discipline is drop-tail: a packet is lost only when it does
+    not fit. A queue discipline can drop Data Packets earlier, when they enter the
+    buffer (enqueue) or when the link takes them out (dequeue). Routing packets are
+    never dropped early. Drops go through Buffer.drop, i.e. they are recorded with
+    record_packet_loss and record_buffer_occupancy like the drop-tail losses.
+    There is no ECN in the TCPs of this simulator, so packets are dropped, not marked.
+
+    A discipline is selected per link in the testcase file with "aqm red|codel|pie"
+    (default droptail), every buffer of the link gets its own instance.
+    Random decisions use a generator seeded with the buffer name, runs are repeatable.
+'''
+import random
+
+from constants import *
+
+
+class QueueDiscipline(object):
+    '''
+        Base class of the queue disciplines, never drops
+
+        Attributes:
+            buffer: the buffer managed
+            random: random generator of the discipline
+    '''
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.random = random.Random(buffer.name)
+
+    def enqueue(self, packet, now):
+        '''
+            Called before a Data Packet is pushed into the buffer
+
+            Return:
+                True to drop the packet
+        '''
+        return False
+
+    def dequeue(self, packet, sojourn, now):
+        '''
+            Called when a Data Packet is popped out of the buffer, it is already removed
+
+            Args:
+                sojourn: time spent by the packet in the buffer
+
+            Return:
+                True to drop the packet instead of sending it
+        '''
+        return False
+
+
+
+class Red(QueueDiscipline):
+    '''
+        Random Early Detection (Floyd & Jacobson), byte mode
+        The average queue avg is an EWMA of the queue at every arrival, decayed over
+        idle periods as if packets of PACKET_SIZE had arrived to an empty queue.
+        Between minThreshold and maxThreshold, a packet is dropped with probability
+        pb / (1 - count * pb), pb = maxP * (avg - min) / (max - min), count being the
+        number of packets accepted since the last drop; above maxThreshold all are.
+
+        Attributes:
+            minThreshold, maxThreshold: thresholds in bytes, 1/4 and 3/4 of the buffer by default
+            maxP: drop probability at maxThreshold
+            weight: weight of the last sample in avg
+            avg: average queue in bytes
+            count: packets accepted since the last early drop
+            idleSince: time when the buffer became empty, None if it is not
+    '''
+    def __init__(self, buffer, minThreshold = None, maxThreshold = None, maxP = 0.1, weight = 0.002):
+        super(Red, self).__init__(buffer)
+        self.minThreshold = minThreshold if minThreshold is not None else 0.25 * buffer.buffer_size
+        self.maxThreshold = maxThreshold if maxThreshold is not None else 0.75 * buffer.buffer_size
+        self.maxP = maxP
+        self.weight = weight
+        self.avg = 0.0
+        self.count = 0
+        self.idleSince = 0.0
+
+    def enqueue(self, packet, now):
+        if self.buffer.bytes == 0 and self.idleSince is not None:
+            idle = max(now - self.idleSince, 0) * self.buffer.link.rate / PACKET_SIZE
+            self.avg *= (1 - self.weight) ** idle
+        else:
+            self.avg += self.weight * (self.buffer.bytes - self.avg)
+        self.idleSince = None
+
+        if self.avg < self.minThreshold:
+            self.count = 0
+            return False
+        if self.avg >= self.maxThreshold:
+            self.count = 0
+            return True
+        pb = self.maxP * (self.avg - self.minThreshold) / (self.maxThreshold - self.minThreshold)
+        self.count += 1
+        pa = pb / (1 - self.count * pb) if self.count * pb < 1 else 1.0
+        if self.random.random() < pa:
+            self.count = 0
+            return True
+        return False
+
+    def dequeue(self, packet, sojourn, now):
+        if self.buffer.bytes == 0:
+            self.idleSince = now
+        return False
+
+
+
+class CoDel(QueueDiscipline):
+    '''
+        Controlled Delay (RFC 8289)
+        Once the sojourn time of the packets has stayed above target for a whole
+        interval, CoDel enters the dropping state: it drops a packet, then the next ones
+        at interval / sqrt(count), until the sojourn time goes back under target.
+
+        Attributes:
+            target: acceptable standing queue delay in s
+            interval: sliding window in s, about a worst case RTT
+            firstAboveTime: time when the sojourn time will have stayed above target for an interval
+            dropNext: time of the next drop in the dropping state
+            count: drops since entering the dropping state
+            lastCount: count when the dropping state was last left
+            dropping: in the dropping state
+    '''
+    def __init__(self, buffer, target = 0.005, interval = 0.1):
+        super(CoDel, self).__init__(buffer)
+        self.target = target
+        self.interval = interval
+        self.firstAboveTime = 0
+        self.dropNext = 0
+        self.count = 0
+        self.lastCount = 0
+        self.dropping = False
+
+    def controlLaw(self, time):
+        return time + self.interval / self.count ** 0.5
+
+    def okToDrop(self, sojourn, now):
+        '''
+            Check whether the sojourn time has been above target for an interval
+            The queue is not considered standing if less than a packet is left
+        '''
+        if sojourn < self.target or self.buffer.bytes <= PACKET_SIZE:
+            self.firstAboveTime = 0
+            return False
+        if self.firstAboveTime == 0:
+            self.firstAboveTime = now + self.interval
+            return False
+        return now >= self.firstAboveTime
+
+    def dequeue(self, packet, sojourn, now):
+        okToDrop = self.okToDrop(sojourn, now)
+        if self.dropping:
+            if not okToDrop:
+                self.dropping = False
+                return False
+            if now >= self.dropNext:
+                self.count += 1
+                self.dropNext = self.controlLaw(self.dropNext)
+                return True
+            return False
+        if okToDrop:
+            self.dropping = True
+            # drop faster if the dropping state was left recently
+            delta = self.count - self.lastCount
+            if delta > 1 and now - self.dropNext < 16 * self.interval:
+                self.count = delta
+            else:
+                self.count = 1
+            self.dropNext = self.controlLaw(now)
+            self.lastCount = self.count
+            return True
+        return False
+
+
+
+class Pie(QueueDiscipline):
+    '''
+        Proportional Integral controller Enhanced (RFC 8033)
+        Every tUpdate, the drop probability moves by alpha * (qdelay - target) +
+        beta * (qdelay - qdelay_old), both scaled down while the probability is small.
+        The queue delay is estimated as the queue over the link rate. The updates are
+        not events: they are caught up at the next arrival.
+        A burst of maxBurst is let through after an idle period.
+
+        Attributes:
+            target: target queue delay in s
+            tUpdate: update period of the probability in s
+            alpha, beta: gains of the controller, in 1/s
+            maxBurst: burst allowance in s
+            probability: current drop probability
+            qdelayOld: queue delay at the previous update
+            burstAllowance: remaining burst allowance in s
+            nextUpdate: time of the next update
+    '''
+    def __init__(self, buffer, target = 0.015, tUpdate = 0.015, alpha = 0.125, beta = 1.25, maxBurst = 0.15):
+        super(Pie, self).__init__(buffer)
+        self.target = target
+        self.tUpdate = tUpdate
+        self.alpha = alpha
+        self.beta = beta
+        self.maxBurst = maxBurst
+        self.probability = 0.0
+        self.qdelayOld = 0.0
+        self.burstAllowance = maxBurst
+        self.nextUpdate = 0.0
+
+    def update(self):
+        '''
+            Periodic update of the drop probability
+        '''
+        qdelay = 1.0 * self.buffer.bytes / self.buffer.link.rate
+        p = self.probability
+        # small probabilities move by small steps
+        scale = 1.0
+        for bound, factor in [(0.000001, 2048), (0.00001, 512), (0.0001, 128), (0.001, 32), (0.01, 8), (0.1, 2)]:
+            if p < bound:
+                scale = 1.0 / factor
+                break
+        p += scale * (self.alpha * (qdelay - self.target) + self.beta * (qdelay - self.qdelayOld))
+        if qdelay == 0 and self.qdelayOld == 0:
+            p *= 0.98
+        self.probability = min(max(p, 0.0), 1.0)
+
+        self.burstAllowance = max(0.0, self.burstAllowance - self.tUpdate)
+        if self.probability == 0 and qdelay < self.target / 2 and self.qdelayOld < self.target / 2:
+            self.burstAllowance = self.maxBurst
+        self.qdelayOld = qdelay
+
+    def enqueue(self, packet, now):
+        while self.nextUpdate <= now:
+            self.update()
+            self.nextUpdate += self.tUpdate
+        if self.burstAllowance > 0:
+            return False
+        if self.probability < 0.2 and self.qdelayOld < self.target / 2:
+            return False
+        if self.buffer.bytes <= 2 * PACKET_SIZE:
+            return False
+        return self.random.random() < self.probability
@@ -0,0 +1,699 @@
+'''
+    Benchmark for the simulation engine
+'''
+import matplotlib
+matplotlib.use('Agg')
+
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from engine import SimEngine
+from constants import EVENT_LINK_AVAILABLE, CATE_PKTS_RECEIVED, CATE_PACKET_LOSS, CATE_LINK_RATE, CATE_CONTROL_BYTES, \
+    PACKET_SIZE, ACK_PACKET_SIZE
+from element import DataPacket, Router
+from events import Event
+from parse import parse
+from profiler import EngineProfiler
+from routing import flow_paths
+from scheduler import SCHEDULERS
+import topology
+
+# testcases to be measured and their running time
+TESTCASES = [('testcase0.txt', 30), ('testcase1.txt', 30), ('testcase2.txt', 60)]
+
+# synthetic topologies to be measured: (kind, n, m), n is k for fat_tree
+TOPOLOGY_SIZES = [('dumbbell', 2, 4), ('dumbbell', 4, 16), ('dumbbell', 8, 32),
+                  ('parking_lot', 4, 4), ('parking_lot', 16, 16), ('parking_lot', 32, 32),
+                  ('fat_tree', 4, 8), ('fat_tree', 6, 16), ('fat_tree', 8, 32),
+                  ('random_graph', 8, 8), ('random_graph', 24, 24), ('random_graph', 48, 48),
+                  ('shared_hosts', 2, 64), ('shared_hosts', 2, 256)]
+
+# simulation time of each synthetic run
+TOPOLOGY_MAXTIME = 5
+
+# topologies and time of the routing protocol comparison
+ROUTING_SIZES = [('random_graph', 24, 8), ('random_graph', 48, 16), ('fat_tree', 4, 8), ('fat_tree', 6, 16)]
+ROUTING_MAXTIME = 12
+ROUTING_PROTOCOLS = ['dynamic', 'dv_delta', 'link_state']
+
+# testcases and link cost damping settings (see Router.setDamping) of the route flapping comparison
+DAMPING_CASES = [('testcase1.txt', 40), ('testcase2.txt', 60)]
+DAMPING_SETTINGS = [('raw', None),
+                    ('ewma', {'alpha': 0.25}),
+                    ('ewma+switch', {'alpha': 0.25, 'switch': 0.1}),
+                    ('ewma+hyst+switch', {'alpha': 0.25, 'hysteresis': 0.1, 'switch': 0.1}),
+                    ('blend+switch', {'alpha': 0.25, 'blend': 0.5, 'switch': 0.1})]
+
+# topologies, flow size (MB), time and (routing mode, ecmp tolerance) of the multipath comparison
+ECMP_SIZES = [('fat_tree', 4, 16), ('random_graph', 16, 16)]
+ECMP_DATA_AMT = 2
+ECMP_MAXTIME = 5
+ECMP_RUNS = [('static_hops', None), ('static_hops', 0), ('dv_delta', None), ('dv_delta', 0.2)]
+
+# campus topologies (routers, flows, hosts per router), time and routing modes of the subnet comparison
+SUBNET_SIZES = [(8, 8, 32), (32, 8, 64)]
+SUBNET_MAXTIME = 6
+SUBNET_PROTOCOLS = ['static', 'dv_delta']
+
+# campus topology (routers, flows, hosts per router), repetitions and forwarding setups
+# (name, subnets, routing mode, ecmp tolerance, pinned) of the per-hop forwarding cost comparison
+FORWARDING_SIZE = (32, 64, 64)
+FORWARDING_ROUNDS = 2000
+FORWARDING_SETUPS = [('exact', False, 'static', None, False),
+                     ('prefix', True, 'static', None, False),
+                     ('ecmp', False, 'static_hops', 0, False),
+                     ('pinned', False, 'static', None, True)]
+
+# topologies, time and routing modes of the end-to-end comparison of routed and pinned flows
+PINNED_SIZES = [('random_graph', 16, 16), ('fat_tree', 4, 16)]
+PINNED_MAXTIME = 10
+PINNED_PROTOCOLS = ['static', 'dynamic']
+
+# topologies, time and numbers of processes of the parallel simulation scaling (pdes.py),
+# all links full duplex so that any of them can be cut
+PDES_SIZES = [('random_graph', 32, 32), ('fat_tree', 6, 32)]
+PDES_MAXTIME = 5
+PDES_WORKERS = [1, 2, 4, 8]
+
+# machine-readable results, compared with the next runs
+BASELINE_FILE = 'benchmark_baseline.json'
+
+# a slowdown larger than this fraction of the baseline speed is reported as a regression.
+# Speed is compared as wall time of the same run, not events/s: the number of events
+# needed per packet is itself subject to optimization
+REGRESSION_TOLERANCE = 0.2
+
+
+def run_case(file_name, maxtime, scheduler = 'heap'):
+    '''
+        Run one testcase and measure the engine throughput
+
+        Args:
+            file_name: the testcase .txt file
+            maxtime: maximum simulation time
+            scheduler: name of the event scheduler used by the engine
+
+        Return:
+            (engine after the run, wall time in s)
+    '''
+    engine = SimEngine(maxtime, scheduler = scheduler)
+    parse(engine, file_name)
+    start = time.time()
+    engine.run()
+    wall = time.time() - start
+    return engine, wall
+
+
+def bench_schedulers(cases = TESTCASES):
+    '''
+        Compare events/sec of all scheduler backends on the given testcases
+        All backends execute the same events, so the fingerprints should be equal
+    '''
+    print '{:<20}{:<10}{:>10}{:>10}{:>12}  {}'.format('testcase', 'scheduler', 'events', 'wall/s', 'events/s', 'fingerprint')
+    for file_name, maxtime in cases:
+        for name in sorted(SCHEDULERS):
+            engine, wall = run_case(file_name, maxtime, name)
+            count = engine.executedEvents
+            print '{:<20}{:<10}{:>10}{:>10.2f}{:>12.0f}  {}'.format(os.path.basename(file_name), name, count, wall,
+                                                                    count / wall, engine.getFingerprint())
+
+
+class NullReactor(object):
+    '''
+        Reactor doing nothing, used to measure the bare cost of the event path
+    '''
+    def react_to_link_available(self, event):
+        pass
+    
+    def react_to_packet_receipt(self, event):
+        pass
+
+
+def bench_events(n = 200000):
+    '''
+        Microbenchmark of the event path: create, push, pop and execute n events
+        (alternating LinkAvailable and PacketReceipt) on an engine with a NullReactor
+        
+        Args:
+            n: number of events
+    '''
+    engine = SimEngine(float('inf'))
+    reactor = NullReactor()
+    start = time.time()
+    for i in xrange(n / 2):
+        engine.push_event(Event.CreateEventPacketReceipt(i * 1e-3, reactor, None))
+        engine.push_event(Event(i * 1e-3, reactor, EVENT_LINK_AVAILABLE))
+    engine.run()
+    wall = time.time() - start
+    
+    event = Event.CreateEventPacketReceipt(0, reactor, None)
+    size = sys.getsizeof(event)
+    if hasattr(event, '__dict__'):
+        size += sys.getsizeof(event.__dict__)
+    print 'events: {}  wall: {:.2f}s  ns/event: {:.0f}  bytes/event: {}'.format(n, wall, wall / n * 1e9, size)
+
+
+def run_topology(size):
+    '''
+        Generate one synthetic topology and run it with a profiler
+        Called in a fresh worker process, so that ru_maxrss is the peak of this run only
+
+        Args:
+            size: (kind, n, m)
+
+        Return:
+            dict of results
+    '''
+    kind, n, m = size
+    caseFile = tempfile.NamedTemporaryFile(suffix = '.txt', delete = False)
+    caseFile.close()
+    builder = topology.TOPOLOGIES[kind](n, m)
+    builder.write(caseFile.name)
+
+    try:
+        engine = SimEngine(TOPOLOGY_MAXTIME)
+        parse(engine, caseFile.name)
+        profiler = EngineProfiler(engine)
+        start = time.time()
+        engine.run()
+        wall = time.time() - start
+    finally:
+        os.remove(caseFile.name)
+
+    return {'kind': kind, 'n': n, 'm': m,
+            'routers': len(builder.routers), 'links': len(builder.links),
+            'events': engine.executedEvents, 'wall': wall, 'events_per_sec': engine.executedEvents / wall,
+            'peak_queue': profiler.peakQueue,
+            'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            'fingerprint': engine.getFingerprint()}
+
+
+def bench_topologies(sizes = TOPOLOGY_SIZES, baseline = BASELINE_FILE, save = False):
+    '''
+        Run the synthetic topologies, each one in its own process, and compare
+        their speed with the baseline file
+
+        Args:
+            sizes: list of (kind, n, m)
+            baseline: the baseline .json file
+            save: write the results as the new baseline
+
+        Return:
+            list of results
+    '''
+    pool = multiprocessing.Pool(1, maxtasksperchild = 1)
+    try:
+        results = pool.map(run_topology, sizes, chunksize = 1)
+    finally:
+        pool.close()
+        pool.join()
+
+    previous = {}
+    if os.path.exists(baseline):
+        with open(baseline) as baselineFile:
+            for result in json.load(baselineFile)['results']:
+                previous[(result['kind'], result['n'], result['m'])] = result
+
+    print '{:<14}{:>4}{:>5}{:>9}{:>10}{:>9}{:>11}{:>8}{:>11}  {}'.format(
+        'topology', 'n', 'm', 'routers', 'events', 'wall/s', 'events/s', 'queue', 'rss/MB', 'vs baseline')
+    for result in results:
+        old = previous.get((result['kind'], result['n'], result['m']))
+        change = ''
+        if old:
+            ratio = old['wall'] / result['wall'] - 1
+            change = '{:+.1%}'.format(ratio)
+            if ratio < -REGRESSION_TOLERANCE:
+                change += ' REGRESSION'
+        print '{:<14}{:>4}{:>5}{:>9}{:>10}{:>9.2f}{:>11.0f}{:>8}{:>11.1f}  {}'.format(
+            result['kind'], result['n'], result['m'], result['routers'], result['events'], result['wall'],
+            result['events_per_sec'], result['peak_queue'], result['peak_rss_kb'] / 1024.0, change)
+
+    if save:
+        with open(baseline, 'w') as baselineFile:
+            json.dump({'maxtime': TOPOLOGY_MAXTIME, 'date': time.strftime('%Y-%m-%d'), 'results': results},
+                      baselineFile, indent = 2, sort_keys = True)
+    return results
+
+
+def run_routing(job):
+    '''
+        Run one synthetic topology with one routing protocol
+        Convergence is the first time when every router has a route to every host
+
+        Args:
+            job: ((kind, n, m), routing mode)
+
+        Return:
+            dict of results
+    '''
+    (kind, n, m), routing = job
+    caseFile = tempfile.NamedTemporaryFile(suffix = '.txt', delete = False)
+    caseFile.close()
+    topology.TOPOLOGIES[kind](n, m).write(caseFile.name)
+    try:
+        engine = SimEngine(ROUTING_MAXTIME)
+        parser = parse(engine, caseFile.name, routing = routing)
+    finally:
+        os.remove(caseFile.name)
+
+    addresses = [host.address for host in parser.hosts.values()]
+    routers = parser.routers.values()
+    converged = None
+    start = time.time()
+    now = 0.0
+    while converged is None and now < ROUTING_MAXTIME:
+        now += 0.01
+        engine.run_until(now)
+        if all(router.fib.get(address) is not None for router in routers for address in addresses):
+            converged = now
+    engine.run()
+    wall = time.time() - start
+
+    received = engine.recorder.category[CATE_PKTS_RECEIVED]
+    return {'kind': kind, 'n': n, 'm': m, 'routing': routing, 'converged': converged,
+            'packets': sum(router.routingPackets for router in routers),
+            'bytes': sum(router.routingBytes for router in routers),
+            'acked': sum(content[-1][1] for content in received.values()),
+            'events': engine.executedEvents, 'wall': wall}
+
+
+def bench_routing(sizes = ROUTING_SIZES, protocols = ROUTING_PROTOCOLS):
+    '''
+        Compare the convergence time and the control traffic of the routing protocols
+        Control traffic is counted as the Router Packets sent by the routers
+
+        Return:
+            list of results
+    '''
+    jobs = [(size, routing) for size in sizes for routing in protocols]
+    pool = multiprocessing.Pool(maxtasksperchild = 1)
+    try:
+        results = pool.map(run_routing, jobs, chunksize = 1)
+    finally:
+        pool.close()
+        pool.join()
+
+    print '{:<14}{:>4}{:>5}  {:<12}{:>10}{:>10}{:>11}{:>9}{:>10}{:>9}'.format(
+        'topology', 'n', 'm', 'routing', 'converge', 'packets', 'kB', 'acked', 'events', 'wall/s')
+    for result in results:
+        print '{:<14}{:>4}{:>5}  {:<12}{:>10}{:>10}{:>11.0f}{:>9}{:>10}{:>9.2f}'.format(
+            result['kind'], result['n'], result['m'], result['routing'],
+            '%.2fs' % result['converged'] if result['converged'] is not None else '-',
+            result['packets'], result['bytes'] / 1024.0, result['acked'], result['events'], result['wall'])
+    return results
+
+
+def run_damping(job):
+    '''
+        Run one testcase with one link cost damping setting
+
+        Args:
+            job: ((testcase file, maxtime), (setting name, damping))
+
+        Return:
+            dict of results, a flow not done has no completion time
+    '''
+    (file_name, maxtime), (setting, damping) = job
+    engine = SimEngine(maxtime)
+    parser = parse(engine, file_name, damping = damping)
+    engine.run()
+
+    received = engine.recorder.category[CATE_PKTS_RECEIVED]
+    done = {}
+    for name, flow in parser.flows.items():
+        done[name] = received[name][-1][0] if flow.isDone() else None
+    return {'case': file_name, 'setting': setting, 'done': done,
+            'changes': dict((name, router.routeChanges) for name, router in parser.routers.items()),
+            'loss': sum(value for content in engine.recorder.category[CATE_PACKET_LOSS].values()
+                        for (_, value) in content)}
+
+
+def bench_damping(cases = DAMPING_CASES, settings = DAMPING_SETTINGS):
+    '''
+        Compare the route changes and the flow completion times of the link cost damping settings
+        (distance-vector routing)
+
+        Return:
+            list of results
+    '''
+    jobs = [(case, setting) for case in cases for setting in settings]
+    pool = multiprocessing.Pool(maxtasksperchild = 1)
+    try:
+        results = pool.map(run_damping, jobs, chunksize = 1)
+    finally:
+        pool.close()
+        pool.join()
+
+    print '{:<15}{:<18}{:>8}{:>6}  {:<28}{}'.format('testcase', 'damping', 'changes', 'loss', 'per router', 'done')
+    for result in results:
+        print '{:<15}{:<18}{:>8}{:>6}  {:<28}{}'.format(
+            result['case'], result['setting'], sum(result['changes'].values()), result['loss'],
+            ' '.join('%s:%d' % item for item in sorted(result['changes'].items())),
+            ' '.join('%s:%s' % (name, '%.1fs' % time if time is not None else '-')
+                     for name, time in sorted(result['done'].items())))
+    return results
+
+
+def link_utilization(engine, link, maxtime):
+    '''
+        Fraction of the time a link was transmitting, from its recorded rate
+        (both directions of a full-duplex link count, i.e. it can reach 2)
+    '''
+    busy = 0.0
+    for name in set(transmitter.name for transmitter in link.transmitters):
+        content = engine.recorder.category[CATE_LINK_RATE].get(name, [(0, 0)])
+        for (start, rate), (end, _) in zip(content, content[1:] + [(maxtime, 0)]):
+            busy += (end - start) * rate
+    return busy / (link.rate * 8.0 / 1024 / 1024 * maxtime)
+
+
+def run_ecmp(job):
+    '''
+        Run one synthetic topology with single path or multipath routing
+
+        Args:
+            job: ((kind, n, m), (routing mode, ecmp tolerance))
+
+        Return:
+            dict of results, utilization is over the links between routers
+    '''
+    (kind, n, m), (routing, ecmp) = job
+    caseFile = tempfile.NamedTemporaryFile(suffix = '.txt', delete = False)
+    caseFile.close()
+    topology.TOPOLOGIES[kind](n, m, data_amt = ECMP_DATA_AMT).write(caseFile.name)
+    try:
+        engine = SimEngine(ECMP_MAXTIME)
+        parser = parse(engine, caseFile.name, routing = routing, ecmp = ecmp)
+        engine.run()
+    finally:
+        os.remove(caseFile.name)
+
+    received = engine.recorder.category[CATE_PKTS_RECEIVED]
+    utilization = [link_utilization(engine, link, ECMP_MAXTIME) for link in parser.links.values()
+                   if isinstance(link.node1, Router) and isinstance(link.node2, Router)]
+    return {'kind': kind, 'n': n, 'm': m, 'routing': routing, 'ecmp': ecmp,
+            'throughput': sum(content[-1][1] for content in received.values()) * PACKET_SIZE * 8.0 / 1024 / 1024
+                          / ECMP_MAXTIME,
+            'done': sum(1 for flow in parser.flows.values() if flow.isDone()),
+            'utilization': utilization}
+
+
+def bench_ecmp(sizes = ECMP_SIZES, runs = ECMP_RUNS):
+    '''
+        Compare the aggregate throughput and the link utilization of single path and ECMP routing
+
+        Return:
+            list of results
+    '''
+    jobs = [(size, run) for size in sizes for run in runs]
+    pool = multiprocessing.Pool(maxtasksperchild = 1)
+    try:
+        results = pool.map(run_ecmp, jobs, chunksize = 1)
+    finally:
+        pool.close()
+        pool.join()
+
+    print '{:<14}{:>4}{:>5}  {:<12}{:>6}{:>10}{:>7}{:>10}{:>9}{:>7}'.format(
+        'topology', 'n', 'm', 'routing', 'ecmp', 'Mbps', 'done', 'util avg', 'max', 'idle')
+    for result in results:
+        utilization = result['utilization']
+        print '{:<14}{:>4}{:>5}  {:<12}{:>6}{:>10.2f}{:>7}{:>10.3f}{:>9.3f}{:>7}'.format(
+            result['kind'], result['n'], result['m'], result['routing'],
+            result['ecmp'] if result['ecmp'] is not None else '-', result['throughput'], result['done'],
+            sum(utilization) / max(1, len(utilization)), max(utilization or [0]),
+            '%d/%d' % (sum(1 for value in utilization if value < 0.01), len(utilization)))
+    return results
+
+
+def run_subnets(job):
+    '''
+        Run one campus topology with hosts numbered in their router's subnet or not
+
+        Args:
+            job: ((n, m, hosts), routing mode, subnets)
+
+        Return:
+            dict of results
+    '''
+    (n, m, hosts), routing, subnets = job
+    caseFile = tempfile.NamedTemporaryFile(suffix = '.txt', delete = False)
+    caseFile.close()
+    topology.campus(n, m, hosts, subnets = subnets).write(caseFile.name)
+    try:
+        engine = SimEngine(SUBNET_MAXTIME)
+        parser = parse(engine, caseFile.name, routing = routing)
+        start = time.time()
+        engine.run()
+        wall = time.time() - start
+    finally:
+        os.remove(caseFile.name)
+
+    entries = [len(router.rt) for router in parser.routers.values()]
+    control = engine.recorder.category[CATE_CONTROL_BYTES]
+    return {'n': n, 'hosts': len(parser.hosts), 'routing': routing, 'subnets': subnets,
+            'entries': 1.0 * sum(entries) / len(entries),
+            'control': sum(value for content in control.values() for t, value in content) / 1024.0,
+            'done': sum(1 for flow in parser.flows.values() if flow.isDone()), 'flows': len(parser.flows),
+            'events': engine.executedEvents, 'wall': wall}
+
+
+def bench_subnets(sizes = SUBNET_SIZES, protocols = SUBNET_PROTOCOLS):
+    '''
+        Compare the routing table size, control traffic and speed with and without route aggregation
+
+        Return:
+            list of results
+    '''
+    jobs = [(size, routing, subnets) for size in sizes for routing in protocols for subnets in (False, True)]
+    pool = multiprocessing.Pool(maxtasksperchild = 1)
+    try:
+        results = pool.map(run_subnets, jobs, chunksize = 1)
+    finally:
+        pool.close()
+        pool.join()
+
+    print '{:>4}{:>7}  {:<10}{:>9}{:>10}{:>12}{:>7}{:>10}{:>8}'.format(
+        'n', 'hosts', 'routing', 'subnets', 'rt size', 'ctl kB', 'done', 'events', 'wall')
+    for result in results:
+        print '{:>4}{:>7}  {:<10}{:>9}{:>10.0f}{:>12.0f}{:>7}{:>10}{:>8.2f}'.format(
+            result['n'], result['hosts'], result['routing'], 'yes' if result['subnets'] else 'no',
+            result['entries'], result['control'], '%d/%d' % (result['done'], result['flows']),
+            result['events'], result['wall'])
+    return results
+
+
+def pin_flows(builder, caseFile):
+    '''
+        Pin every flow of a generated topology to its static shortest path, and write it to caseFile
+    '''
+    builder.write(caseFile)
+    parser = parse(SimEngine(0), caseFile, routing = 'static')
+    builder.paths = flow_paths(parser)
+    builder.write(caseFile)
+
+
+def drop_packet(packet, sender):
+    pass
+
+
+def bench_forwarding(size = FORWARDING_SIZE, rounds = FORWARDING_ROUNDS, setups = FORWARDING_SETUPS):
+    '''
+        Microbenchmark of Router.receiveData: time to pick the link of a data packet or an ACK
+        at every router of the path of the flows. The links drop the packets, so that only the
+        forwarding decision is measured
+
+        Return:
+            setup name -> ns per hop
+    '''
+    n, m, hosts = size
+    results = {}
+    print '{:<10}{:>8}{:>10}{:>12}'.format('setup', 'hops', 'rt size', 'ns/hop')
+    for name, subnets, routing, ecmp, pinned in setups:
+        caseFile = tempfile.NamedTemporaryFile(suffix = '.txt', delete = False)
+        caseFile.close()
+        builder = topology.campus(n, m, hosts, subnets = subnets)
+        try:
+            if pinned:
+                pin_flows(builder, caseFile.name)
+            else:
+                builder.write(caseFile.name)
+            parser = parse(SimEngine(0), caseFile.name, routing = routing, ecmp = ecmp)
+        finally:
+            os.remove(caseFile.name)
+
+        for link in parser.links.values():
+            link.send = drop_packet
+        calls = []
+        for flowName, path in sorted(flow_paths(parser).items()):
+            flow = parser.flows[flowName]
+            data = DataPacket(flow.source, flow.destination, flow, 0, PACKET_SIZE, False, 0)
+            ack = DataPacket(flow.destination, flow.source, flow, 0, ACK_PACKET_SIZE, True, 1)
+            for router in path:
+                calls += [(parser.routers[router], data), (parser.routers[router], ack)]
+        start = time.time()
+        for i in xrange(rounds):
+            for router, packet in calls:
+                router.receiveData(packet)
+        wall = time.time() - start
+        results[name] = wall / (rounds * len(calls)) * 1e9
+        entries = [len(router.rt) for router in parser.routers.values()]
+        print '{:<10}{:>8}{:>10.0f}{:>12.0f}'.format(name, len(calls), 1.0 * sum(entries) / len(entries),
+                                                    results[name])
+    return results
+
+
+def run_pinned(job):
+    '''
+        Run one synthetic topology with its flows routed or pinned to their static shortest path
+
+        Args:
+            job: ((kind, n, m), routing mode, pinned)
+
+        Return:
+            dict of results
+    '''
+    (kind, n, m), routing, pinned = job
+    caseFile = tempfile.NamedTemporaryFile(suffix = '.txt', delete = False)
+    caseFile.close()
+    builder = topology.TOPOLOGIES[kind](n, m)
+    try:
+        if pinned:
+            pin_flows(builder, caseFile.name)
+        else:
+            builder.write(caseFile.name)
+        engine = SimEngine(PINNED_MAXTIME)
+        parser = parse(engine, caseFile.name, routing = routing)
+        start = time.time()
+        engine.run()
+        wall = time.time() - start
+    finally:
+        os.remove(caseFile.name)
+
+    received = engine.recorder.category[CATE_PKTS_RECEIVED]
+    return {'kind': kind, 'n': n, 'm': m, 'routing': routing, 'pinned': pinned,
+            'throughput': sum(content[-1][1] for content in received.values()) * PACKET_SIZE * 8.0 / 1024 / 1024
+                          / PINNED_MAXTIME,
+            'done': sum(1 for flow in parser.flows.values() if flow.isDone()), 'flows': len(parser.flows),
+            'events': engine.executedEvents, 'wall': wall, 'fingerprint': engine.getFingerprint()}
+
+
+def bench_pinned(sizes = PINNED_SIZES, protocols = PINNED_PROTOCOLS):
+    '''
+        Compare the per-hop forwarding cost of routed and pinned flows, then whole runs of both
+        (pinned to the static shortest path, a static run is the same as a routed one)
+
+        Return:
+            (bench_forwarding results, list of run_pinned results)
+    '''
+    forwarding = bench_forwarding()
+    print
+    jobs = [(size, routing, pinned) for size in sizes for routing in protocols for pinned in (False, True)]
+    pool = multiprocessing.Pool(maxtasksperchild = 1)
+    try:
+        results = pool.map(run_pinned, jobs, chunksize = 1)
+    finally:
+        pool.close()
+        pool.join()
+
+    print '{:<14}{:>4}{:>5}  {:<10}{:>8}{:>10}{:>7}{:>10}{:>8}  {}'.format(
+        'topology', 'n', 'm', 'routing', 'pinned', 'Mbps', 'done', 'events', 'wall', 'fingerprint')
+    for result in results:
+        print '{:<14}{:>4}{:>5}  {:<10}{:>8}{:>10.2f}{:>7}{:>10}{:>8.2f}  {}'.format(
+            result['kind'], result['n'], result['m'], result['routing'], 'yes' if result['pinned'] else 'no',
+            result['throughput'], '%d/%d' % (result['done'], result['flows']), result['events'], result['wall'],
+            result['fingerprint'])
+    return forwarding, results
+
+
+def bench_pdes(sizes = PDES_SIZES, workers = PDES_WORKERS):
+    '''
+        Wall time of partitioned runs with 1, 2, 4 and 8 processes against the sequential run.
+        The speedup is bounded by the number of cores, which is printed with the results
+
+        Return:
+            list of results
+    '''
+    import pdes
+
+    overrides = {'*': {'duplex': 'full'}}
+    results = []
+    print 'cores: {}'.format(multiprocessing.cpu_count())
+    print '{:<14}{:>4}{:>5}{:>9}{:>9}{:>8}{:>10}{:>9}'.format('topology', 'n', 'm', 'workers', 'rounds', 'wall',
+                                                           'events', 'speedup')
+    for kind, n, m in sizes:
+        caseFile = tempfile.NamedTemporaryFile(suffix = '.txt', delete = False)
+        caseFile.close()
+        topology.TOPOLOGIES[kind](n, m).write(caseFile.name)
+        try:
+            engine = SimEngine(PDES_MAXTIME)
+            parse(engine, caseFile.name, link_overrides = overrides)
+            start = time.time()
+            engine.run()
+            sequential = time.time() - start
+            runs = [(0, 0, sequential, engine.executedEvents)]
+            for count in workers:
+                start = time.time()
+                recorder, stats = pdes.run_partitioned(caseFile.name, PDES_MAXTIME, count,
+                                                       link_overrides = overrides)
+                runs.append((stats['workers'], stats['rounds'], time.time() - start, stats['events']))
+        finally:
+            os.remove(caseFile.name)
+        for count, rounds, wall, events in runs:
+            print '{:<14}{:>4}{:>5}{:>9}{:>9}{:>8.2f}{:>10}{:>9.2f}'.format(
+                kind, n, m, count or 'seq', rounds, wall, events, sequential / wall)
+            results.append({'kind': kind, 'n': n, 'm': m, 'workers': count, 'rounds': rounds, 'wall': wall,
+                            'events': events, 'speedup': sequential / wall})
+    return results
+
+
+def main():
+    '''
+        python benchmark.py                 compare schedulers on testcase0/1/2
+        python benchmark.py events          event path microbenchmark
+        python benchmark.py topologies      synthetic topologies, compared with benchmark_baseline.json
+        python benchmark.py baseline        synthetic topologies, saved as the new baseline
+        python benchmark.py routing         routing protocols on synthetic topologies
+        python benchmark.py damping         route flapping with the link cost damping settings
+        python benchmark.py ecmp            single path and multipath routing on synthetic topologies
+        python benchmark.py subnets         routing tables with and without subnets on campus topologies
+        python benchmark.py pinned          per-hop forwarding cost and runs of routed and pinned flows
+        python benchmark.py pdes            parallel simulation with 1 to 8 processes against sequential
+        python benchmark.py case.txt ...    compare schedulers on the given testcases
+    '''
+    if sys.argv[1:] == ['events']:
+        bench_events()
+        return
+    if sys.argv[1:] == ['routing']:
+        bench_routing()
+        return
+    if sys.argv[1:] == ['damping']:
+        bench_damping()
+        return
+    if sys.argv[1:] == ['ecmp']:
+        bench_ecmp()
+        return
+    if sys.argv[1:] == ['subnets']:
+        bench_subnets()
+        return
+    if sys.argv[1:] == ['pinned']:
+        bench_pinned()
+        return
+    if sys.argv[1:] == ['pdes']:
+        bench_pdes()
+        return
+    if sys.argv[1:] in [['topologies'], ['baseline']]:
+        bench_topologies(save = sys.argv[1] == 'baseline')
+        return
+    cases = TESTCASES
+    if len(sys.argv) > 1:
+        cases = [(file_name, 30) for file_name in sys.argv[1:]]
+    bench_schedulers(cases)
+
+
+if __name__ == '__main__':
+    main()
@@ -13,6 +13,25 @@ ACK_PACKET_SIZE = 64
 '''
 ROUTER_PACKET_GENERATION_INTERVAL = 5
 
+'''
+    Size of a link-state advertisement: header, plus one entry per link (as in OSPF)
+'''
+LSA_HEADER_SIZE = 20
+LSA_LINK_SIZE = 12
+
+'''
+    Size of a distance-vector update: header, plus one entry per destination (as in RIP)
+    Minimum interval between two triggered updates of a router (see distancevector.py)
+'''
+DV_HEADER_SIZE = 4
+DV_ENTRY_SIZE = 20
+DV_HOLD_DOWN = 0.01
+
+'''
+    The bytes of the routing packets are recorded summed over intervals of this length (s)
+'''
+CONTROL_BYTES_INTERVAL = 0.1
+
 '''
     Scale factor for log computation
 '''
@@ -20,14 +39,30 @@ BIT_TO_PKT_SCALOR = 10.0 * 1024 * 1024 / PACKET_SIZE
 
 '''
     The followings are all events need to be handled
+    Event types are integer opcodes, used as index of the handler table in events.py
+'''
+EVENT_LINK_AVAILABLE = 0
+EVENT_PACKET_RECEIPT = 1
+EVENT_ROUTINGTABLE_OUTDATED = 2
+EVENT_PACKET_TIMEOUT = 3
+EVENT_FLOW_START = 4
+EVENT_ROUTINGTABLE_UPDATE = 5
+EVENT_FAST_UPDATE = 6
+
+EVENT_NAMES = ['LinkAvailable', 'PacketReceipt', 'RoutingTableOutdated', 'PacketTimeOut',
+               'FlowStart', 'RoutingTableUpdate', 'FastUpdate']
+
+'''
+    Priority class of each event type, indexed by the event opcode
+    Events with the same time stamp are executed by priority (smaller first),
+    then in the order they have been pushed
+        0: link state changes
+        1: packet deliveries
+        2: flow start and TCP updates
+        3: routing table maintenance
+        4: packet time_out, so that an ACK arriving at the same time is handled first
 '''
-EVENT_LINK_AVAILABLE = 'LinkAvailable'
-EVENT_PACKET_RECEIPT = 'PacketReceipt'
-EVENT_ROUTINGTABLE_OUTDATED = 'RoutingTableOutdated'
-EVENT_PACKET_TIMEOUT = 'PacketTimeOut'
-EVENT_FLOW_START = 'FlowStart'
-EVENT_ROUTINGTABLE_UPDATE = 'RoutingTableUpdate'
-EVENT_FAST_UPDATE = 'FastUpdate'
+EVENT_PRIORITY = [0, 1, 3, 4, 2, 3, 2]
 
 '''
     The followings are all data can be logged and plotted   
@@ -45,9 +80,11 @@ CATE_RTT = "cate_rtt"
 CATE_STATE = "cate_state"
 CATE_DUP_TIMES = "cate_dup_times"
 CATE_TIMEOUT = "cate_timeout"
+CATE_CONTROL_BYTES = "cate_control_bytes"
 
 CATE_ALL = [CATE_LINK_RATE, CATE_PACKET_LOSS, CATE_BUFFER_OCCUPANCY, CATE_FLOW_RATE, CATE_WINDOW_SIZE, 
-            CATE_PACKET_DELAY, CATE_PKTS_RECEIVED, CATE_SSTHRE, CATE_RTT, CATE_STATE, CATE_DUP_TIMES, CATE_TIMEOUT]
+            CATE_PACKET_DELAY, CATE_PKTS_RECEIVED, CATE_SSTHRE, CATE_RTT, CATE_STATE, CATE_DUP_TIMES, CATE_TIMEOUT,
+            CATE_CONTROL_BYTES]
 
 
 
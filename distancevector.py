@@ -0,0 +1,254 @@
+'''
+    Distance-vector routing with triggered delta updates (RIP style)
+
+    The routers of the 'dynamic' mode send their whole routing table, copied, to all
+    their links every time a cost is measured or an entry changes. DeltaVectorRouter
+    measures the costs the same way ('request' / 'ack_request' every updateTime), but:
+        - an 'update' carries only the entries changed since the previous update, as
+          (False, {destination address: (cost, next hop)}); the whole table is sent
+          once per measurement round, as (True, table), so that lost updates are repaired
+        - updates are triggered by changes, but a router sends at most one every
+          holdDown seconds: the changes made meanwhile wait for the hold-down timer
+          (an EVENT_ROUTINGTABLE_OUTDATED event) and go out together in one update
+        - entries which changed back to the value last advertised are not sent
+        - split horizon: an update is not sent to a neighbor if all its entries go
+          through that neighbor, before and after the change
+        - poisoned reverse: an entry whose next hop is the receiver is taken as
+          unreachable by it, the next hop is in the update so all the neighbors
+          share the same update
+        - only neighbor routers get updates, hosts ignore them anyway
+    An update is a RouterPacket of DV_HEADER_SIZE + DV_ENTRY_SIZE bytes per entry.
+    The addresses covered by the subnets of a router are advertised as their prefix.
+
+    No table is copied to be sent: the full table sent is the routing table itself,
+    which is copied on the next write (copy on write). The tables received are never
+    modified either, a neighbor keeps the last full table of a router until a delta
+    is merged into it. Every router keeps the last vector of each neighbor router,
+    the route to a destination is the best of them plus the cost to that neighbor
+    (Bellman-Ford), computed again only for the destinations an update or a new cost
+    measurement changes.
+
+    Selected with parse(engine, case, routing = 'dv_delta').
+'''
+from constants import *
+from element import Router, RouterPacket
+from events import Event
+from tracing import tracer, TRACE_DEBUG
+
+
+class DeltaVectorRouter(Router):
+    '''
+        Router running distance-vector routing with triggered delta updates
+        It keeps equal-cost next hops (ECMP) if ecmp is set. The next hops are recomputed
+        from the measured costs during the run: a flow hashed to one of them can move to
+        another path when the set changes
+
+        Attributes (in addition to the ones of Router):
+            holdDown: minimum interval between two triggered updates
+            linkCosts: neighbor address -> last measured cost
+            vectors: neighbor router address -> its last known table
+                key: destination address, value: (cost, next hop)
+            sharedVectors: neighbors whose vector is a table received as is, copied before a merge
+            rtShared: rt has been sent, copied before the next write
+            pending: destination address -> value advertised before, for the entries
+                     changed since the last update
+            nextUpdate: earliest time of the next triggered update
+            timer: pending hold-down event, None if there is none
+            updatesSent: updates sent, counted once per neighbor
+            updatesSuppressed: updates not sent to a neighbor (split horizon)
+    '''
+    multipathCapable = True
+
+    def __init__(self, engine, name, address, updateTime = ROUTER_PACKET_GENERATION_INTERVAL,
+                 holdDown = DV_HOLD_DOWN):
+        # set before Router.__init__, which already writes a route
+        self.rtShared = False
+        self.pending = {}
+        super(DeltaVectorRouter, self).__init__(engine, name, address, updateTime)
+        self.holdDown = holdDown
+        self.linkCosts = {}
+        self.vectors = {}
+        self.sharedVectors = set()
+        self.nextUpdate = 0
+        self.timer = None
+        self.updatesSent = 0
+        self.updatesSuppressed = 0
+
+    def setRoute(self, destAddr, value):
+        '''
+            Change a route, copy the routing table first if it has been sent,
+            and remember the change for the next update
+        '''
+        if self.rtShared:
+            self.rt = dict(self.rt)
+            self.rtShared = False
+        if destAddr not in self.pending:
+            self.pending[destAddr] = self.rt.get(destAddr)
+        super(DeltaVectorRouter, self).setRoute(destAddr, value)
+
+    def startMeasureCost(self):
+        '''
+            Called periodically to for cost measuring
+            The whole routing table is sent first
+        '''
+        self.broadcastTable()
+        self.broadcastRequestPacket()
+
+    def measureCost(self, packet):
+        '''
+            Handle receipt of Router Packet - 'ack_request'
+            A new cost changes the routes to the neighbor and through it
+        '''
+        neighbor = packet.source.address
+        cost = self.linkCost(neighbor, packet.routerTable)
+        if self.linkCosts.get(neighbor) == cost:
+            return
+        self.linkCosts[neighbor] = cost
+        destinations = set(self.vectors.get(neighbor, ()))
+        destinations.add(neighbor)
+        self.recompute(destinations)
+        self.trigger()
+
+    def updateRT(self, neiPacket):
+        '''
+            Merge the 'update' of a neighbor router into its vector,
+            and compute the routes again for the entries changed
+
+            Args:
+                neiPacket: the 'update' packet
+        '''
+        neighbor = neiPacket.source.address
+        full, table = neiPacket.routerTable
+        vector = self.vectors.get(neighbor, {})
+        if full:
+            changed = [destAddr for destAddr in set(vector) | set(table) if vector.get(destAddr) != table.get(destAddr)]
+            self.vectors[neighbor] = table
+            self.sharedVectors.add(neighbor)
+        else:
+            changed = [destAddr for destAddr, value in table.items() if vector.get(destAddr) != value]
+            if not changed:
+                return
+            if neighbor in self.sharedVectors or neighbor not in self.vectors:
+                vector = dict(vector)
+                self.vectors[neighbor] = vector
+                self.sharedVectors.discard(neighbor)
+            vector.update(table)
+        self.recompute(changed)
+        self.trigger()
+        # routing table to check network status
+        if tracer.enabled and tracer.wants('routing', TRACE_DEBUG):
+            tracer.log('routing', TRACE_DEBUG, self.engine.getCurrentTime(), 'routing_table',
+                       router = self.name, table = dict(self.rt))
+
+    def recompute(self, destinations):
+        '''
+            Bellman-Ford for some destinations: the best of the measured cost to the
+            destination (if it is a neighbor) and of the costs through each neighbor router
+            The current next hop is kept unless another one is cheaper by more than switchThreshold
+            With ECMP, the next hops within the tolerance whose own cost is lower are kept too
+        '''
+        for destAddr in destinations:
+            if destAddr == self.address or destAddr in self.subnets:
+                continue
+            current = self.rt.get(destAddr)
+            currentHop = current[1] if current is not None else None
+            best = None
+            kept = None
+            # (cost through the neighbor, neighbor, cost of the neighbor)
+            candidates = []
+            if destAddr in self.linkCosts:
+                best = (self.linkCosts[destAddr], destAddr)
+                candidates.append((best[0], destAddr, 0))
+                if destAddr == currentHop:
+                    kept = best
+            for neighbor, vector in self.vectors.items():
+                entry = vector.get(destAddr)
+                # poisoned reverse: the neighbor goes through this router
+                if entry is None or entry[1] == self.address or neighbor not in self.linkCosts:
+                    continue
+                cost = self.linkCosts[neighbor] + entry[0]
+                candidates.append((cost, neighbor, entry[0]))
+                if neighbor == currentHop and (kept is None or cost < kept[0]):
+                    kept = (cost, neighbor)
+                if best is None or cost < best[0]:
+                    best = (cost, neighbor)
+            if kept is not None and best[0] >= kept[0] * (1 - self.switchThreshold):
+                best = kept
+            if best is None:
+                if current is None:
+                    continue
+                best = (float('inf'), currentHop)
+            if self.ecmp is not None:
+                bound = best[0] * (1 + self.ecmp)
+                self.setMultipath(destAddr, [best[1]] + [neighbor for cost, neighbor, remaining in candidates
+                                                         if cost <= bound and remaining < best[0]])
+            if best != current:
+                self.setRoute(destAddr, best)
+
+    def trigger(self):
+        '''
+            Send the pending changes now, or when the hold-down timer expires
+        '''
+        if not self.pending or self.timer is not None:
+            return
+        now = self.engine.getCurrentTime()
+        if now >= self.nextUpdate:
+            self.broadcastDelta()
+        else:
+            self.timer = Event(self.nextUpdate, self, EVENT_ROUTINGTABLE_OUTDATED, background = True)
+            self.engine.push_event(self.timer)
+
+    def react_to_routing_table_outdated(self, event):
+        '''
+            The hold-down timer expired, send the changes made meanwhile
+        '''
+        self.timer = None
+        if self.pending:
+            self.broadcastDelta()
+
+    def broadcastDelta(self):
+        '''
+            Send the entries changed since the last update to the neighbor routers
+        '''
+        pending = self.pending
+        self.pending = {}
+        self.nextUpdate = self.engine.getCurrentTime() + self.holdDown
+        delta = dict((destAddr, self.rt[destAddr]) for destAddr, before in pending.items()
+                     if self.rt[destAddr] != before and not self.isAggregated(destAddr))
+        if not delta:
+            return
+        packet = None
+        for address, (link, side) in self.neighbors.items():
+            neighbor = link.node2 if side == 1 else link.node1
+            if not isinstance(neighbor, Router):
+                continue
+            # split horizon: the neighbor ignores all these entries, before and after
+            if all((pending[destAddr] is None or pending[destAddr][1] == address) and value[1] == address
+                   for destAddr, value in delta.items()):
+                self.updatesSuppressed += 1
+                continue
+            if packet is None:
+                packet = RouterPacket(self, self.engine.getCurrentTime(), DV_HEADER_SIZE + DV_ENTRY_SIZE * len(delta),
+                                      (False, delta), 'update')
+            self.sendRouterPacket(link, packet)
+            self.updatesSent += 1
+
+    def broadcastTable(self):
+        '''
+            Send the whole routing table to the neighbor routers, without copying it
+            (a router with subnets sends a copy without the addresses they cover)
+        '''
+        self.pending = {}
+        self.nextUpdate = self.engine.getCurrentTime() + self.holdDown
+        if self.subnets:
+            table = self.advertisedTable()
+        else:
+            table = self.rt
+            self.rtShared = True
+        packet = RouterPacket(self, self.engine.getCurrentTime(), DV_HEADER_SIZE + DV_ENTRY_SIZE * len(table),
+                              (True, table), 'update')
+        for address, (link, side) in self.neighbors.items():
+            neighbor = link.node2 if side == 1 else link.node1
+            if isinstance(neighbor, Router):
+                self.sendRouterPacket(link, packet)
+                self.updatesSent += 1
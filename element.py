@@ -1,5 +1,7 @@
 from events import *
 from constants import *
+from tracing import tracer, TRACE_DEBUG, TRACE_INFO, TRACE_WARNING
+from addressing import PrefixTrie, address_value, is_prefix, parse_prefix
 
 import collections
 import copy
@@ -17,6 +19,9 @@ class Packet(object):
             timestamp: the time when current packet is made
             packetsize: the size of current packet
     '''
+    # packets are created by the million: no per-instance __dict__
+    __slots__ = ('source', 'destination', 'timestamp', 'packetsize')
+
     def __init__(self, source, destination, timestamp, packetsize):
         self.source = source
         self.destination = destination
@@ -38,12 +43,15 @@ class DataPacket(Packet):
             pck_id: unique ID for a Data Packet in a data flow 
             originalPacketTimestamp: the time when the original packet is made  
     '''
+    __slots__ = ('acknowledgement', 'flow', 'pck_id', 'originalPacketTimestamp')
+
     def __init__(self, source, destination, flow, timestamp, packetsize, acknowledgement, pck_id):
         super(DataPacket, self).__init__(source = source, destination = destination,
                                          timestamp = timestamp,packetsize = packetsize)
         self.acknowledgement = acknowledgement 
         self.flow = flow
         self.pck_id = pck_id
+        self.originalPacketTimestamp = None
 
 
     def setOriginalPacketTimestamp(self, timestamp):
@@ -72,8 +80,11 @@ class RouterPacket(Packet):
             type: type of current router packet.
                   1) 'request'
                   2) 'ack_request'
-                  3) 'update'
+                  3) 'update' (a table, or (full, entries) with delta updates, see distancevector.py)
+                  4) 'lsa' (link-state routing, see linkstate.py)
     '''
+    __slots__ = ('routerTable', 'type')
+
     def __init__(self, source, timestamp, packetsize, routerTable, type = None):
         super(RouterPacket, self).__init__(source = source, destination = 0,
                                            timestamp = timestamp, packetsize = packetsize)
@@ -82,6 +93,50 @@ class RouterPacket(Packet):
 
 
 
+class PacketPool(object):
+    '''
+        Free-list of Data Packets, used instead of allocating a new packet for every
+        data packet and ACK. A packet goes back to the pool when it is delivered to its
+        host, dropped by a buffer or dropped by a router without route to its destination. Router Packets are not pooled: one packet object
+        is shared by all the links of a broadcast.
+        
+        Attributes:
+            free: packets ready to be reused
+            allocated: number of packets created by the pool
+            reused: number of packets taken from the free-list
+    '''
+    def __init__(self):
+        self.free = []
+        self.allocated = 0
+        self.reused = 0
+
+    def acquire(self, source, destination, flow, timestamp, packetsize, acknowledgement, pck_id):
+        '''
+            Get a Data Packet, same arguments as DataPacket
+        '''
+        if not self.free:
+            self.allocated += 1
+            return DataPacket(source, destination, flow, timestamp, packetsize, acknowledgement, pck_id)
+        self.reused += 1
+        packet = self.free.pop()
+        packet.source = source
+        packet.destination = destination
+        packet.timestamp = timestamp
+        packet.packetsize = packetsize
+        packet.acknowledgement = acknowledgement
+        packet.flow = flow
+        packet.pck_id = pck_id
+        packet.originalPacketTimestamp = None
+        return packet
+
+    def release(self, packet):
+        '''
+            Give back a Data Packet which is no longer referenced by the simulation
+        '''
+        self.free.append(packet)
+
+
+
 class Element(object):
     '''
         Super class for Host, Link, Buffer, Router and Flow
@@ -107,11 +162,15 @@ class Host(Element):
             link: the link associated with current host.
                   one host can have one and only one link
             flows: the flows associated with current host.
+            sourceFlows: the flows whose source is current host
+            destinationFlows: the flows whose destination is current host
     '''
     def __init__(self, engine, name, address):    
         super(Host, self).__init__(engine, name)
         self.link = None
         self.flows = []
+        self.sourceFlows = set()
+        self.destinationFlows = set()
         self.address = address
         
     def addFlow(self, flow):
@@ -122,6 +181,10 @@ class Host(Element):
                 flow: the flow to be associated
         '''
         self.flows.append(flow)
+        if self == flow.source:
+            self.sourceFlows.add(flow)
+        if self == flow.destination:
+            self.destinationFlows.add(flow)
         
     def send(self, packet):
         '''
@@ -137,7 +200,8 @@ class Host(Element):
             Handle the receive of a packet
             
             For Data Packet,
-                Call flow.sourceReceive or flow.destinationReceive to handle it
+                Call flow.sourceReceive or flow.destinationReceive of the flow of the
+                packet to handle it, according to the role of current host in the flow
                 
             For Router Packet,
                 handle 'request' packet, calculate and send out
@@ -146,16 +210,19 @@ class Host(Element):
                 packet: packet received
         '''
         if isinstance(packet, DataPacket):
-            if packet.flow in self.flows:
-                for flow in self.flows:
-                    if self == flow.source:
-                        flow.sourceReceive(packet)
-                    if self == flow.destination:
-                        flow.destinationReceive(packet)
+            flow = packet.flow
+            if flow in self.sourceFlows:
+                flow.sourceReceive(packet)
+            if flow in self.destinationFlows:
+                flow.destinationReceive(packet)
+            # the packet has been delivered, nothing refers to it any more
+            if self.engine.packetPool is not None:
+                self.engine.packetPool.release(packet)
         if isinstance(packet, RouterPacket):
             if packet.type == 'request':
                 comeCost = self.engine.getCurrentTime() - packet.timestamp
                 ackRouterPacket = RouterPacket(self, packet.timestamp, PACKET_SIZE, comeCost, 'ack_request')
+                self.engine.recorder.record_control_bytes(self.link, self.engine.getCurrentTime(), PACKET_SIZE)
                 self.send(ackRouterPacket)
     
     def react_to_packet_receipt(self, event):
@@ -173,7 +240,10 @@ class Host(Element):
 class Link(Element):
     '''
         Link is used for basic data transmission.
-        Use two buffers and a Decide function to realize half-duplex transmission
+        A half-duplex link has a single Transmitter for both of its buffers, which uses
+        a Decide function to pick the direction of every packet.
+        A full-duplex link has one Transmitter per direction, each with its own buffer
+        and its own events, so the two directions never wait for each other.
         
         Attributes:
             engine: engine associated, used for simulation
@@ -181,19 +251,29 @@ class Link(Element):
             node1: the source node
             node2: the destination node
             propogationDelay: current link delay
+            duplex: 'half' or 'full'
+            aqm: queue discipline class of the buffers (see aqm.py), None for drop-tail
             buffer1: buffer associated with data transmission from source to destination
             buffer2: buffer associated with data transmission from destination to source
-            busy: a Boolean value, current status of link        
+            transmitters: [transmitter of buffer1, transmitter of buffer2], the same one twice
+                          for a half-duplex link
     '''
-    def __init__(self, engine, name, node1, node2, delay, rate, buffer_size):
+    def __init__(self, engine, name, node1, node2, delay, rate, buffer_size, duplex = 'half', aqm = None):
         super(Link, self).__init__(engine, name)
         self.node1 = node1
         self.node2 = node2
         self.propogationDelay = delay
         self.rate = rate
-        self.buffer1 = Buffer(self.engine, self.name+'a', buffer_size, self)
-        self.buffer2 = Buffer(self.engine, self.name+'b', buffer_size, self)
-        self.busy = False
+        self.duplex = duplex
+        self.buffer1 = Buffer(self.engine, self.name+'a', buffer_size, self, aqm)
+        self.buffer2 = Buffer(self.engine, self.name+'b', buffer_size, self, aqm)
+        if duplex == 'full':
+            # the link rate of each direction is recorded apart, under the buffer names
+            self.transmitters = [Transmitter(self.engine, self.name+'a', self, [(self.buffer1, node2)]),
+                                 Transmitter(self.engine, self.name+'b', self, [(self.buffer2, node1)])]
+        else:
+            transmitter = Transmitter(self.engine, self.name, self, [(self.buffer1, node2), (self.buffer2, node1)])
+            self.transmitters = [transmitter, transmitter]
         self.attachToNode(node1)
         self.attachToNode(node2)
     
@@ -212,82 +292,236 @@ class Link(Element):
             node.link = self
         if isinstance(node, Router):
             if node == self.node1:
-                node.links.append((self, 1))
+                node.addLink(self, 1)
             if node == self.node2:
-                node.links.append((self, 2))
+                node.addLink(self, 2)
 
 
     def send(self, packet, sender):
         '''
             Function for packet sending
-                1) push buffer
-                2) Call self.decide() for data transmission
+            Hand the packet to the transmitter of the buffer of the sender
                 
             Args:
                 packet: the packet to be sent
                 sender: specify the source of packet, use corresponding buffer for sending
         '''
         if sender == self.node1:
-            self.buffer1.push(packet)
+            self.transmitters[0].send(packet, self.buffer1)
         if sender == self.node2:
-            self.buffer2.push(packet)
-           
-        if not self.busy:
-            self.decide()
-            
-    def decide(self):
+            self.transmitters[1].send(packet, self.buffer2)
+
+    def setPipelined(self, pipelined):
         '''
-            Main function for half-duplex data transmission
-                1) Calculate the amount of buffer packets and decide for fair transmission
-                   Buffer has larger amount of packets has priority to send
-                2) Calculate link delay
-                3) Reschedule 2 events: let receive to receive and let link to send next packet
+            Set the pipelined mode of the transmitters of the link (see Transmitter)
         '''
-        lg1 = len(self.buffer1.buffer); lg2 = len(self.buffer2.buffer)
-        if lg1 == 0 and lg2 == 0:
-            return
-        
-        self.busy = True
+        for transmitter in self.transmitters:
+            transmitter.pipelined = pipelined
+
+
+
+class Transmitter(Element):
+    '''
+        Transmitter of a link, sends the packets waiting in its buffers one at a time
         
-        self.engine.recorder.record_link_rate(self, self.engine.getCurrentTime(), self.rate*8/1024/1024)
-        popper = None
-        receiver = None
+        The transmitter is a pipeline: the packets on the wire are kept in inFlight, in
+        order of arrival (one packet is sent at a time, so arrivals are monotone), and the
+        transmitter has a single pending event, wakeEvent, at the next arrival.
+        The end of a transmission is not an event: nothing but send() changes the buffers,
+        so the transmissions due since the last wake up are started afterwards (catchUp),
+        from the buffers as they were at that time, before anything new is pushed.
+        The wake up delivers packets, so it has the priority of a packet receipt, and both
+        are ordered by the name of the transmitter (Event.order): deliveries happen in the
+        same order whether the transmitter is pipelined or not.
         
+        Attributes:
+            engine: engine associated, used for simulation
+            name: a specific name, the link rate is recorded under it
+            link: the link of the transmitter
+            ports: list of (buffer, receiver of the packets of the buffer)
+            freeTime: time when the current transmission ends, the transmitter is busy until then
+            transmitting: the last link rate recorded is the one of a transmission
+            inFlight: packets on the wire, deque of (arrival time, receiver, packet)
+            inFlightData: number of Data Packets in inFlight
+            wakeEvent: the pending EVENT_LINK_AVAILABLE event of the transmitter, None if idle
+            pipelined: if False, every packet gets its own EVENT_PACKET_RECEIPT event and the
+                       transmitter wakes up at the end of every transmission (used by pdes.py
+                       for links whose two ends are simulated by different processes)
+    '''
+    def __init__(self, engine, name, link, ports):
+        super(Transmitter, self).__init__(engine, name)
+        self.link = link
+        self.ports = ports
+        self.freeTime = 0
+        self.transmitting = False
+        self.inFlight = collections.deque()
+        self.inFlightData = 0
+        self.wakeEvent = None
+        self.pipelined = True
+
+    def send(self, packet, buffer):
+        '''
+            Function for packet sending
+                1) start the transmissions due so far
+                2) push buffer
+                3) Call self.decide() for data transmission if the transmitter is free
+                
+            Args:
+                packet: the packet to be sent
+                buffer: buffer of the direction of the packet
+        '''
+        now = self.engine.getCurrentTime()
+        self.catchUp(now)
+        buffer.push(packet)
+        if self.freeTime <= now:
+            self.decide(now)
+        self.schedule()
+
+    def select(self):
+        '''
+            Pick the buffer to send from
+            With two buffers (half duplex), the buffer with more packets has priority
+            
+            Return:
+                (buffer to pop, receiver), (None, None) if the buffers are empty
+        '''
+        if len(self.ports) == 1:
+            port = self.ports[0]
+            return port if port[0].buffer else (None, None)
+        (buffer1, receiver1), (buffer2, receiver2) = self.ports
+        lg1 = len(buffer1.buffer); lg2 = len(buffer2.buffer)
+        if lg1 == 0 and lg2 == 0:
+            return None, None
         if lg1 == 0:
-            popper = self.buffer2
-            receiver = self.node1
-        elif lg2 == 0:
-            popper = self.buffer1
-            receiver = self.node2
+            return buffer2, receiver2
+        if lg2 == 0 or lg1 > lg2:
+            return buffer1, receiver1
+        return buffer2, receiver2
+            
+    def decide(self, start):
+        '''
+            Main function for data transmission
+                1) Call self.select to pick the packet to be sent
+                2) Calculate link delay
+                3) Put the packet on the wire, it arrives at start + delay
+            
+            Args:
+                start: time when the transmission starts, now or the end of the previous one
+            
+            Return:
+                True if a transmission was started, False if nothing was waiting
+        '''
+        packet = None
+        while packet is None:
+            popper, receiver = self.select()
+            if popper is None:
+                return False
+            # None if the queue discipline of the buffer dropped everything
+            packet = popper.pop(start)
+        
+        link = self.link
+        if self.transmitting:
+            # back to back transmission, the previous one ended at start
+            self.engine.recorder.record_link_rate(self, self.freeTime, 0)
+        self.transmitting = True
+        self.engine.recorder.record_link_rate(self, start, link.rate*8/1024/1024)
+
+        transmissionDeley = 1.0*packet.packetsize / link.rate
+        delay = link.propogationDelay + transmissionDeley
+        self.freeTime = start + transmissionDeley
+        if self.pipelined:
+            self.inFlight.append((start + delay, receiver, packet))
+            if isinstance(packet, DataPacket):
+                self.inFlightData += 1
         else:
-            if lg1 > lg2:
-                popper = self.buffer1
-                receiver = self.node2
-            else:
-                popper = self.buffer2
-                receiver = self.node1
+            # routing packets are housekeeping
+            event = Event.CreateEventPacketReceipt(start + delay, receiver, packet,
+                                                   background = isinstance(packet, RouterPacket), order = self.name)
+            self.engine.push_event(event)
+        return True
 
-        packet = popper.pop()
-        
-        transmissionDeley = 1.0*packet.packetsize / self.rate
-        delay = self.propogationDelay + transmissionDeley
-        event1 = Event.CreateEventPacketReceipt(self.engine.getCurrentTime() + delay, receiver, packet)
-        self.engine.push_event(event1)
-        
-        event2 = Event(self.engine.getCurrentTime() + transmissionDeley, self, EVENT_LINK_AVAILABLE)
-        self.engine.push_event(event2)
+    def catchUp(self, now):
+        '''
+            Start the transmissions which were due until now, back to back, then
+            record the end of the last one if the transmitter is free
+            
+            Args:
+                now: current simulation time
+        '''
+        while self.freeTime <= now and self.decide(self.freeTime):
+            pass
+        if self.transmitting and self.freeTime <= now:
+            self.transmitting = False
+            self.engine.recorder.record_link_rate(self, self.freeTime, 0)
+
+    def schedule(self):
+        '''
+            Make sure the transmitter wakes up at the next packet arrival. While packets are
+            waiting, the packet on the wire arrives no later than the end of the current
+            transmission plus the propagation delay, i.e. before the packets sent next:
+            their transmissions are started in time by catchUp at that wake up.
+            A transmitter which is not pipelined wakes up at the end of the current transmission.
+            Routing packets are housekeeping: the event is a background event unless Data
+            Packets are on the wire or waiting.
+        '''
+        if self.pipelined:
+            if not self.inFlight:
+                return
+            wake = self.inFlight[0][0]
+        else:
+            if not self.transmitting:
+                return
+            wake = self.freeTime
+
+        event = self.wakeEvent
+        if event is not None:
+            if event.time <= wake:
+                if event.background and self.carriesData():
+                    # data is on the link, its wake up is no longer housekeeping only
+                    self.engine.set_foreground(event)
+                return
+            self.engine.cancel_event(event)
+        self.wakeEvent = Event(wake, self, EVENT_LINK_AVAILABLE, background = not self.carriesData())
+        if self.pipelined:
+            self.wakeEvent.priority = EVENT_PRIORITY[EVENT_PACKET_RECEIPT]
+            self.wakeEvent.order = self.name
+        self.engine.push_event(self.wakeEvent)
+
+    def carriesData(self):
+        '''
+            Check whether a Data Packet is on the wire or waiting in a buffer
+        '''
+        if self.inFlightData > 0:
+            return True
+        for buffer, receiver in self.ports:
+            if buffer.hasData():
+                return True
+        return False
 
 
     def react_to_link_available(self, event):
         '''
-            Function used for data transmission
+            Wake up of the transmitter: start the transmissions due, deliver the packets
+            which have arrived, then schedule the next wake up
             
             Args:
                 event: event to be reacted to, which should be EVENT_LINK_AVAILABLE here
         '''
-        self.busy = False
-        self.engine.recorder.record_link_rate(self, self.engine.getCurrentTime(), 0)
-        self.decide()
+        self.wakeEvent = None
+        now = self.engine.getCurrentTime()
+        self.catchUp(now)
+        inFlight = self.inFlight
+        profiler = self.engine.profiler
+        while inFlight and inFlight[0][0] <= now:
+            arrival, receiver, packet = inFlight.popleft()
+            if isinstance(packet, DataPacket):
+                self.inFlightData -= 1
+            if profiler is None:
+                receiver.receive(packet)
+            else:
+                # charged to the receiver, as the packet receipt event of a transmitter not pipelined
+                profiler.deliver(receiver, packet)
+        self.schedule()
 
 
 
@@ -300,54 +534,101 @@ class Buffer(Element):
             name: a specific name
             buffer: a queue to store pending packets
             bytes: total amount of data in the buffer
+            dataPackets: number of Data Packets in the buffer
             link: link associated with the buffer           
+            aqm: queue discipline (see aqm.py), None for drop-tail
     '''
-    def __init__(self, engine, name, buffer_size, link):
+    def __init__(self, engine, name, buffer_size, link, aqm = None):
         super(Buffer, self).__init__(engine, name)
         self.buffer = collections.deque()
         self.bytes = 0
+        self.dataPackets = 0
         self.buffer_size = buffer_size
         self.link = link
+        self.aqm = aqm(self) if aqm is not None else None
 
 
     def push(self, packet):
         '''
             Push new packets into the buffer
             
+            If the queue discipline drops the packet, handle packet lost
             If buffer can fit the new packet, add it to the data queue
             Else, handle packet lost
             
             Args:
                 packet: packet waiting to be transmitted
         '''
-        if self.bytes + packet.packetsize <= self.buffer_size:
+        if self.aqm is not None and isinstance(packet, DataPacket) \
+                and self.aqm.enqueue(packet, self.engine.getCurrentTime()):
+            self.drop(packet, self.engine.getCurrentTime(), 'aqm')
+        elif self.bytes + packet.packetsize <= self.buffer_size:
             self.buffer.append((self.engine.getCurrentTime(), packet))
             self.bytes += packet.packetsize
+            if isinstance(packet, DataPacket):
+                self.dataPackets += 1
             
             self.engine.recorder.record_packet_loss(self, self.engine.getCurrentTime(), 0)
             self.engine.recorder.record_buffer_occupancy(self, self.engine.getCurrentTime(), 1.0 * self.bytes/PACKET_SIZE)
         else:
-            print "packet loss"
             if isinstance(packet, DataPacket):
-                self.engine.recorder.record_packet_loss(self, self.engine.getCurrentTime(), 1)
-                self.engine.recorder.record_buffer_occupancy(self, self.engine.getCurrentTime(), 1.0 * self.bytes/PACKET_SIZE)
-                print 'Packet Lost: [{}],'.format(packet.pck_id)
+                self.drop(packet, self.engine.getCurrentTime(), 'overflow')
+            elif tracer.enabled:
+                tracer.log('buffer', TRACE_INFO, self.engine.getCurrentTime(), 'router_packet_lost',
+                           buffer = self.name, source = packet.source.name, type = packet.type)
+
+    def drop(self, packet, time, reason):
+        '''
+            Handle the loss of a Data Packet, which is not in the queue
+            
+            Args:
+                packet: the packet lost
+                time: time of the loss
+                reason: 'overflow' (drop-tail) or 'aqm' (dropped by the queue discipline)
+        '''
+        self.engine.recorder.record_packet_loss(self, time, 1)
+        self.engine.recorder.record_buffer_occupancy(self, time, 1.0 * self.bytes/PACKET_SIZE)
+        if tracer.enabled:
+            tracer.log('buffer', TRACE_INFO, time, 'packet_lost', buffer = self.name, flow = packet.flow.name,
+                       pck_id = packet.pck_id, ack = packet.acknowledgement, reason = reason)
+        if self.engine.packetPool is not None:
+            self.engine.packetPool.release(packet)
 
 
-    def pop(self):
+    def hasData(self):
+        '''
+            Check whether a Data Packet is waiting in the buffer
+        '''
+        return self.dataPackets > 0
+
+    def pop(self, time = None):
         '''
             Pop out a packet from the queue and change the bytes of current buffer accordingly
             
+            Args:
+                time: time of the pop, the current time by default (the link may start
+                      a transmission which was due earlier)
+            
             Return:
                 packet: if there is a packet in the queue, return the packet
+                        None if the queue discipline dropped all of them
         '''
         if self.bytes == 0 :
-            print "Buffer underflow"
+            if tracer.enabled:
+                tracer.log('buffer', TRACE_WARNING, self.engine.getCurrentTime(), 'underflow', buffer = self.name)
         else:
-            time, packet = self.buffer.popleft()
-            self.bytes -= packet.packetsize
-            self.engine.recorder.record_buffer_occupancy(self, self.engine.getCurrentTime(), 1.0 * self.bytes/PACKET_SIZE)
-            return packet
+            if time is None:
+                time = self.engine.getCurrentTime()
+            while self.buffer:
+                pushTime, packet = self.buffer.popleft()
+                self.bytes -= packet.packetsize
+                if isinstance(packet, DataPacket):
+                    self.dataPackets -= 1
+                    if self.aqm is not None and self.aqm.dequeue(packet, time - pushTime, time):
+                        self.drop(packet, time, 'aqm')
+                        continue
+                self.engine.recorder.record_buffer_occupancy(self, time, 1.0 * self.bytes/PACKET_SIZE)
+                return packet
 
 
 
@@ -358,20 +639,180 @@ class Router(Element):
         Attributes:
             address: the IP address
             updateTime: a specific time interval for routing table update
-            links: all links associated with the router
+            links: all links associated with the router, list of (link, side)
+                   side is 1 if the router is node1 of the link, 2 if it is node2
+            neighbors: (link, side) to reach each neighbor
+                key: neighbor ip address, value: the first of the links to it
             defaultLink: the default link to be used
             rt: routing table
-                key: host ip addre, value: 1:cost; 2:next hop
+                key: host ip addre or prefix ('10.2.0.0/24'), value: 1:cost; 2:next hop
+            fib: forwarding table compiled from rt, only changed with it (see setRoute)
+                key: destination ip address, value: (link, side) to the next hop,
+                     None if the next hop is not a neighbor
+            ecmp: cost tolerance of equal-cost multipath (fraction of the best cost), None for single path
+            multipath: (link, side) of every next hop, for the destinations with several of them (ECMP)
+                key: destination ip address, value: tuple of (link, side)
+            subnets: prefixes owned by the router, advertised instead of the addresses they cover
+            subnetMasks: (network, length) of each subnet
+            prefixes: trie of the prefixes in rt, for longest-prefix match, None while there is none
+            routingPackets: number of Router Packets sent by the router
+            routingBytes: total size of the Router Packets sent by the router
+            routeChanges: number of times the next hop of a destination changed
+            damping: cost damping options (see setDamping), None if costs are raw delays
+            switchThreshold: fraction by which a new next hop must be cheaper than the current one
+            smoothedCosts: neighbor address -> EWMA of the measured delay
+            reportedCosts: neighbor address -> last cost used for the link to the neighbor
     '''
+    # whether the routing protocol fills multipath when ecmp is set (the static modes always can)
+    multipathCapable = False
+
     def __init__(self, engine, name, address, updateTime = ROUTER_PACKET_GENERATION_INTERVAL):
         super(Router,self).__init__(engine, name)
         self.address = address
         self.updateTime = updateTime
         self.links = []
+        self.neighbors = {}
         self.defaultLink = None
         self.rt = {}
-        self.rt[address] = (0, address)
+        self.fib = {}
+        self.ecmp = None
+        self.multipath = {}
+        self.subnets = []
+        self.subnetMasks = []
+        self.prefixes = None
+        self.routingPackets = 0
+        self.routingBytes = 0
+        self.routeChanges = 0
+        self.damping = None
+        self.switchThreshold = 0.0
+        self.smoothedCosts = {}
+        self.reportedCosts = {}
+        self.setRoute(address, (0, address))
     
+    def addLink(self, link, side):
+        '''
+            Attach a link to the router
+            
+            Args:
+                link: the link
+                side: 1 if the router is node1 of the link, 2 if it is node2
+        '''
+        self.links.append((link, side))
+        neighbor = link.node2 if side == 1 else link.node1
+        if neighbor.address not in self.neighbors:
+            self.neighbors[neighbor.address] = (link, side)
+            # routes through this neighbor can be forwarded now
+            for destAddr, (cost, nextHop) in self.rt.items():
+                if nextHop == neighbor.address:
+                    self.fib[destAddr] = (link, side)
+
+    def setRoute(self, destAddr, value):
+        '''
+            Change a route of the routing table, and the forwarding table if the next hop changes
+            
+            Args:
+                destAddr: the destination ip address
+                value: (cost, next hop)
+        '''
+        old = self.rt.get(destAddr)
+        self.rt[destAddr] = value
+        if old is None or old[1] != value[1]:
+            self.fib[destAddr] = self.neighbors.get(value[1])
+            if old is None and is_prefix(destAddr):
+                if self.prefixes is None:
+                    self.prefixes = PrefixTrie()
+                self.prefixes.insert(destAddr)
+            if old is not None:
+                self.routeChanges += 1
+                if tracer.enabled:
+                    tracer.log('routing', TRACE_DEBUG, self.engine.getCurrentTime(), 'route_changed',
+                               router = self.name, destination = destAddr, before = old[1], after = value[1])
+
+    def addSubnet(self, prefix):
+        '''
+            Make the router the owner of a subnet: the addresses it covers are reached
+            through the router, which advertises the prefix instead of them
+
+            Args:
+                prefix: the subnet, e.g. '10.2.0.0/24'
+        '''
+        self.subnetMasks.append(parse_prefix(prefix))
+        self.subnets.append(prefix)
+        self.setRoute(prefix, (0, self.address))
+
+    def isAggregated(self, destAddr):
+        '''
+            Check whether a destination is covered by a subnet of the router, i.e. not advertised
+        '''
+        if not self.subnets or is_prefix(destAddr):
+            return False
+        value = address_value(destAddr)
+        for network, length in self.subnetMasks:
+            if (value ^ network) >> (32 - length) == 0:
+                return True
+        return False
+
+    def advertisedTable(self):
+        '''
+            Copy of the routing table as advertised to the neighbors (see isAggregated)
+        '''
+        if not self.subnets:
+            return copy.copy(self.rt)
+        return dict((destAddr, value) for destAddr, value in self.rt.items() if not self.isAggregated(destAddr))
+
+    def setMultipath(self, destAddr, nextHops):
+        '''
+            Set the next hops of a destination for ECMP, the route of rt is used for
+            the destinations left with a single one
+
+            Args:
+                destAddr: the destination ip address
+                nextHops: ip addresses of the next hops
+        '''
+        ports = tuple(self.neighbors[nextHop] for nextHop in sorted(set(nextHops)) if nextHop in self.neighbors)
+        if len(ports) > 1:
+            self.multipath[destAddr] = ports
+        elif destAddr in self.multipath:
+            del self.multipath[destAddr]
+
+    def setDamping(self, alpha = 1.0, blend = 0.0, hysteresis = 0.0, switch = 0.0):
+        '''
+            Damp the link costs measured by the router
+            The defaults leave the costs as they are (raw delay of the 'ack_request')
+
+            Args:
+                alpha: weight of a new delay sample in the EWMA of the delays of a link
+                blend: weight of the static cost of the link (propagation plus transmission
+                       delay of a Data Packet), the EWMA gets the rest
+                hysteresis: a cost which moved by less than this fraction of the last cost
+                            used is ignored, the last one is kept
+                switch: a route moves to another next hop only if it is cheaper than the
+                        current one by more than this fraction
+        '''
+        self.damping = (alpha, blend, hysteresis)
+        self.switchThreshold = switch
+
+    def linkCost(self, neighbor, delay):
+        '''
+            Cost of the link to a neighbor from a measured delay, damped if setDamping was called
+
+            Args:
+                neighbor: the IP address of the neighbor
+                delay: the delay measured by an 'ack_request'
+        '''
+        if self.damping is None:
+            return delay
+        alpha, blend, hysteresis = self.damping
+        smoothed = self.smoothedCosts.get(neighbor)
+        smoothed = delay if smoothed is None else smoothed + alpha * (delay - smoothed)
+        self.smoothedCosts[neighbor] = smoothed
+        link = self.neighbors[neighbor][0]
+        cost = blend * (link.propogationDelay + 1.0 * PACKET_SIZE / link.rate) + (1 - blend) * smoothed
+        reported = self.reportedCosts.get(neighbor)
+        if reported is not None and abs(cost - reported) <= hysteresis * reported:
+            return reported
+        self.reportedCosts[neighbor] = cost
+        return cost
 
 
                
@@ -381,12 +822,9 @@ class Router(Element):
             Broadcast Router Packet (update)
             Call link.send for data transmission
         '''
-        routerPacket =  RouterPacket(self, self.engine.getCurrentTime(), PACKET_SIZE, copy.copy(self.rt), 'update')
+        routerPacket =  RouterPacket(self, self.engine.getCurrentTime(), PACKET_SIZE, self.advertisedTable(), 'update')
         for link in self.links:
-            if link[1] == 1:
-                link[0].send(routerPacket, self)
-            if link[1] == 2:
-                link[0].send(routerPacket, self)
+            self.sendRouterPacket(link[0], routerPacket)
 
 
     def broadcastRequestPacket(self):
@@ -397,10 +835,16 @@ class Router(Element):
         '''
         routerPacket =  RouterPacket(self, self.engine.getCurrentTime(), PACKET_SIZE, None, 'request')
         for link in self.links:
-            if link[1] == 1:
-                link[0].send(routerPacket, self)
-            if link[1] == 2:
-                link[0].send(routerPacket, self)
+            self.sendRouterPacket(link[0], routerPacket)
+
+    def sendRouterPacket(self, link, packet):
+        '''
+            Send a Router Packet over a link, and count it (also per link, in CATE_CONTROL_BYTES)
+        '''
+        self.routingPackets += 1
+        self.routingBytes += packet.packetsize
+        self.engine.recorder.record_control_bytes(link, self.engine.getCurrentTime(), packet.packetsize)
+        link.send(packet, self)
 
 
     def generateACKRouterPacket(self, packet):
@@ -413,31 +857,36 @@ class Router(Element):
         neigh = packet.source.address
         comeCost = self.engine.getCurrentTime() - packet.timestamp
         ackRouterPacket = RouterPacket(self, self.engine.getCurrentTime(), PACKET_SIZE, comeCost, 'ack_request')
-        self.send(neigh, ackRouterPacket)
+        port = self.neighbors.get(neigh)
+        if port is not None:
+            self.sendRouterPacket(port[0], ackRouterPacket)
 
 
     def send(self, destAddr, packet):
         '''
-            Send out packet
+            Send out packet to a neighbor
             
             Args:
-                destAddr: the IP address of destination
+                destAddr: the IP address of the neighbor
                 packet: the packet to be sent
         '''      
-        for link in self.links:
-            if link[1] == 1:
-                if link[0].node2.address == destAddr:
-                    link[0].send(packet, self)
-#                     self.packet.setPreHop(self, self.engine.getCurrentTime())
-                    break
-            if link[1] == 2:
-                if link[0].node1.address == destAddr:
-                    link[0].send(packet, self)
-#                     self.packet.setPreHop(self, self.engine.getCurrentTime())
-                    break 
+        port = self.neighbors.get(destAddr)
+        if port is not None:
+            port[0].send(packet, self)
 
  
     def react_to_packet_receipt(self, event):
+        '''
+            Used to react to an EVENT_PACKET_RECEIPT event
+            Call self.receive to handle it
+            
+            Args:
+                event: event to be reacted to, which should be EVENT_PACKET_RECEIPT here
+        '''
+        self.receive(event.packet)
+
+
+    def receive(self, packet):
         '''
             React to packet receipt according to the packet type:
                 1) Data Packet: 
@@ -450,9 +899,8 @@ class Router(Element):
                        Call self.updateRT
             
             Args:
-                event: event to be reacted to, which should be EVENT_PACKET_RECEIPT here
+                packet: packet received
         '''
-        packet = event.packet
         if isinstance(packet, DataPacket):
             self.receiveData(packet)
             
@@ -479,10 +927,10 @@ class Router(Element):
            Call  self.broadcastRequestPacket
         '''
         
-        neiCost = packet.routerTable
+        neiCost = self.linkCost(packet.source.address, packet.routerTable)
         
         updateVal = (neiCost, packet.source.address)
-        self.rt[packet.source.address] = updateVal
+        self.setRoute(packet.source.address, updateVal)
         self.broadcastRouterPacket()
 
 
@@ -495,6 +943,10 @@ class Router(Element):
             In the following comment, "nei" is the neighbor router which sends this update packet to self
         '''
         neiRT = neiPacket.routerTable
+        # the cost to nei is not measured yet (its 'ack_request' is still on the way):
+        # ignore the update, nei broadcasts again after its next cost measurement
+        if neiPacket.source.address not in self.rt:
+            return
         neiCost = self.rt[neiPacket.source.address][0]
         flag = False
         for (destAddr, neiVal) in neiRT.items():
@@ -511,39 +963,58 @@ class Router(Element):
                     if self.rt[destAddr] != updateVal:
                         
                         flag = True
-                        self.rt[destAddr] = updateVal 
+                        self.setRoute(destAddr, updateVal)
                 else:
                     # if nexthop is not nei, change it to nei if the dynamic metric to go through nei is smaller
-                    # than the original cost
-                    if neiVal[0] + neiCost < self.rt[destAddr][0]:
+                    # than the original cost (by more than switchThreshold)
+                    if neiVal[0] + neiCost < self.rt[destAddr][0] * (1 - self.switchThreshold):
                         flag = True
                         updateVal = (neiVal[0]+neiCost, neiPacket.source.address)
-                        self.rt[destAddr] = updateVal
+                        self.setRoute(destAddr, updateVal)
             
             # if this is a new record, add it to routing table           
             else:
                 flag = True
                 updateVal = (neiVal[0]+neiCost, neiPacket.source.address)
-                self.rt[destAddr] = updateVal
+                self.setRoute(destAddr, updateVal)
         #flag is set to True when routing table changes. 
         if flag:
             # broadcast Router packet with 'update' type to all neighbor routers
             self.broadcastRouterPacket()
-        #print out routing table to check network status. use Router1 as a sample
-        if self.name == 'R1':
-            print self.rt
+        # routing table to check network status
+        if tracer.enabled and tracer.wants('routing', TRACE_DEBUG):
+            tracer.log('routing', TRACE_DEBUG, self.engine.getCurrentTime(), 'routing_table',
+                       router = self.name, table = dict(self.rt))
 
 
     def receiveData(self, packet):
         '''
            Handle receipt of Data Packet, send to the next hop
+           A packet without route (or whose next hop is not a neighbor) is not forwarded
+           With several next hops (ECMP), the hash of the flow and of the router picks one,
+           so all the packets of a flow take the same path as long as the next hops do not
+           change (static routing; with dv_delta they change with the link costs)
+           A destination without its own route takes the route of the longest prefix containing it
+           A flow pinned to a path (see Flow.setPath) takes the link of its hop, rt is not used
         '''
-
-        if packet.destination.address in self.rt:
-            nextHop = self.rt[packet.destination.address][1]   
-            self.send(nextHop, packet)
+        hops = packet.flow.hops
+        if hops is not None:
+            # data goes to the destination, ACKs back to the source
+            hops[self][1 if packet.acknowledgement else 0][0].send(packet, self)
+            return
+        destAddr = packet.destination.address
+        if self.prefixes is not None and destAddr not in self.fib:
+            destAddr = self.prefixes.lookup(destAddr) or destAddr
+        if self.multipath and destAddr in self.multipath:
+            ports = self.multipath[destAddr]
+            port = ports[hash((packet.flow.name, self.address)) % len(ports)]
         else:
-            self.send(self.links[0], packet)
+            port = self.fib.get(destAddr)
+        if port is not None:
+            port[0].send(packet, self)
+        elif self.engine.packetPool is not None:
+            # the packet is lost here, nothing refers to it any more
+            self.engine.packetPool.release(packet)
 
 
     def react_to_routing_table_update(self, event):
@@ -555,7 +1026,8 @@ class Router(Element):
                 event: event to be reacted to, which should be EVENT_ROUTINGTABLE_OUTDATED here            
         '''
         self.startMeasureCost()
-        event = Event(self.engine.getCurrentTime() + self.updateTime, self, EVENT_ROUTINGTABLE_UPDATE)
+        event = Event(self.engine.getCurrentTime() + self.updateTime, self, EVENT_ROUTINGTABLE_UPDATE,
+                      background = True)
         self.engine.push_event(event)
 
 
@@ -574,6 +1046,9 @@ class Flow(Element):
             tcp: the TCP algorithm to be used (which will be specified in parse.py)
             outOfOrderPackets: IF of packets received in advance of the packet expected
             lastOrderedPacketID: ID of the next packet to be expected
+            path: routers the flow is pinned to, from the source, None if it is routed
+            hops: (link, side) of every router of the path, None if the flow is routed
+                key: router, value: ((link, side) to the next router, (link, side) to the previous one)
     '''
     def __init__(self, engine, name, source, destination, amount, start_time, tcp):
         super(Flow, self).__init__(engine, name)
@@ -584,6 +1059,8 @@ class Flow(Element):
 
         self.outOfOrderPackets = []
         self.lastOrderedPacketID = 0
+        self.path = None
+        self.hops = None
                 
         source.addFlow(self)
         destination.addFlow(self)
@@ -591,6 +1068,44 @@ class Flow(Element):
         self.tcp.setFlow(self)
 
 
+    def setPath(self, routers):
+        '''
+            Pin the flow to a path: its data and ACKs go through these routers whatever their
+            routing tables say. The links are looked up once here, so the nodes must be linked already
+            
+            Args:
+                routers: the routers from the source to the destination
+        '''
+        if not routers:
+            raise ValueError('empty path of flow ' + self.name)
+        nodes = [self.source] + list(routers) + [self.destination]
+        for node in routers:
+            if not isinstance(node, Router):
+                raise ValueError(node.name + ' in the path of flow ' + self.name + ' is not a router')
+        if len(set(routers)) < len(routers):
+            raise ValueError('path of flow ' + self.name + ' goes through a router twice')
+        for host, router in [(self.source, routers[0]), (self.destination, routers[-1])]:
+            if host.link is None or router not in (host.link.node1, host.link.node2):
+                raise ValueError('no link between ' + host.name + ' and ' + router.name)
+        hops = {}
+        for i in xrange(1, len(nodes) - 1):
+            ports = []
+            for other in [nodes[i + 1], nodes[i - 1]]:
+                port = nodes[i].neighbors.get(other.address)
+                if port is None:
+                    raise ValueError('no link between ' + nodes[i].name + ' and ' + other.name)
+                ports.append(port)
+            hops[nodes[i]] = tuple(ports)
+        self.path = list(routers)
+        self.hops = hops
+
+    def isDone(self):
+        '''
+            Check whether all packets of the flow have been acknowledged
+        '''
+        return self.tcp.acknowledgedPacketID >= self.amount - 1
+
+
     def generatePacket(self, pck_id):
         '''
             Generate new packet
@@ -598,6 +1113,10 @@ class Flow(Element):
             Args:
                 pck_id: the id of the packet to be generated
         '''
+        pool = self.engine.packetPool
+        if pool is not None:
+            return pool.acquire(self.source, self.destination, self, self.engine.getCurrentTime(), PACKET_SIZE,
+                                False, pck_id)
         packet = DataPacket(self.source, self.destination, self, self.engine.getCurrentTime(), PACKET_SIZE, 
                             False, pck_id)        
         return packet
@@ -626,8 +1145,13 @@ class Flow(Element):
             else:
                 heapq.heappush(self.outOfOrderPackets, packet.pck_id)
 
-        ack_packet = DataPacket(packet.destination, packet.source, self, self.engine.getCurrentTime(), ACK_PACKET_SIZE, 
-                                True, self.lastOrderedPacketID + 1)
+        pool = self.engine.packetPool
+        if pool is not None:
+            ack_packet = pool.acquire(packet.destination, packet.source, self, self.engine.getCurrentTime(),
+                                      ACK_PACKET_SIZE, True, self.lastOrderedPacketID + 1)
+        else:
+            ack_packet = DataPacket(packet.destination, packet.source, self, self.engine.getCurrentTime(), ACK_PACKET_SIZE, 
+                                    True, self.lastOrderedPacketID + 1)
         ack_packet.setOriginalPacketTimestamp(packet.timestamp)
 
         return ack_packet
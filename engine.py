@@ -2,8 +2,16 @@
     Simulation Engine (Event Priority Queue)
 '''
 
-import heapq
+import cPickle as pickle
+import gc
+import sys
+import zlib
+
 import record
+from scheduler import SCHEDULERS
+
+# pickling the element graph recurses along links and routers
+CHECKPOINT_RECURSION_LIMIT = 20000
 
 
 class SimEngine:
@@ -11,16 +19,54 @@ class SimEngine:
         Main class for network simulation
         
         Attributes:
-            queue: event priority queue
+            queue: event priority queue (heap or calendar, see scheduler.py)
             MAXTIME: maximum time for simulation
             curTime: current simulation time stamp
             recorder: handle all data need to be logged and plotted
+            executedEvents: number of events executed so far
+            cancelledEvents: number of cancelled events still sitting in the queue
+            pushedEvents: number of events pushed so far, gives the insertion sequence number
+            fingerprint: rolling CRC-32 of the executed event stream (time, type, reactor name).
+                         Two runs with the same fingerprint executed the same events in the
+                         same order, whatever the process or the hash seed
+            profiler: the attached profiler.EngineProfiler, None by default
+            foregroundEvents: number of queued events which are not background events
+            stopWhenQuiescent: end run() as soon as only background events are left
+            stopConditions: callables (engine) -> bool, run() ends when one returns True
+                            (see stopping.py). They are checked every stopCheckInterval
+            stopReason: why the last run() ended: 'empty', 'maxtime', 'quiescent' or
+                        the name of the stop condition
+            packetPool: element.PacketPool recycling Data Packets, None when packets
+                        are not pooled
+            disableGC: the cyclic garbage collector is turned off during run() and
+                       run_until(). Dead packets and events are not part of reference cycles,
+                       they are freed by reference counting anyway; the collector would
+                       only rescan the ever growing recorded data.
     '''
-    def __init__(self, maxtime):
-        self.queue = []
+    # the queue is compacted once it holds more cancelled events than this
+    # and they make up more than half of it
+    COMPACT_THRESHOLD = 64
+
+    def __init__(self, maxtime, scheduler = 'heap', pool_packets = False, disable_gc = False):
+        self.queue = SCHEDULERS[scheduler]()
         self.MAXTIME = maxtime
         self.curTime = 0
         self.recorder = record.Record()
+        self.executedEvents = 0
+        self.cancelledEvents = 0
+        self.pushedEvents = 0
+        self.fingerprint = 0
+        self.profiler = None
+        self.foregroundEvents = 0
+        self.stopWhenQuiescent = False
+        self.stopConditions = []
+        self.stopCheckInterval = 0.1
+        self.stopReason = None
+        self.packetPool = None
+        if pool_packets:
+            from element import PacketPool
+            self.packetPool = PacketPool()
+        self.disableGC = disable_gc
         
     def getCurrentTime(self):
         '''
@@ -30,19 +76,100 @@ class SimEngine:
 
     def push_event(self, event):
         '''
-            Push (event.time, event), so that it will be ordered by event.time
+            Push the event into the queue, so that it will be ordered by event.time
+            Events with the same time are ordered by event.priority, event.order, then by
+            insertion, which keeps runs reproducible
             
             Args:
                 event: the event to be handled
         '''
-        heapq.heappush(self.queue, (event.time, event))
+        event.seq = self.pushedEvents
+        self.pushedEvents += 1
+        event.queued = True
+        if not event.background:
+            self.foregroundEvents += 1
+        self.queue.push(event)
 
     def pop_event(self):
         '''
             Pop the event, with the nearest time stamp.
             (Ordered by event.time in the queue)
+            Cancelled events are dropped on the way.
+        '''
+        event = self.queue.pop()
+        while event.cancelled:
+            self.cancelledEvents -= 1
+            event = self.queue.pop()
+        event.queued = False
+        if not event.background:
+            self.foregroundEvents -= 1
+        return event
+
+    def peek_event(self):
+        '''
+            Get the next event to be executed without removing it from the queue,
+            None if there is no pending event
+        '''
+        while len(self.queue) > 0:
+            event = self.queue.peek()
+            if not event.cancelled:
+                return event
+            self.queue.pop()
+            self.cancelledEvents -= 1
+        return None
+
+    def cancel_event(self, event):
+        '''
+            Cancel a pending event (e.g. a timer that has been re-armed).
+            The event is left in the queue and skipped when popped; the queue is
+            compacted when cancelled events make up most of it.
+            
+            Args:
+                event: the event to be cancelled, ignored if it is None or no longer queued
+        '''
+        if event is None or not event.queued:
+            return
+        event.queued = False
+        event.cancelled = True
+        self.cancelledEvents += 1
+        if not event.background:
+            self.foregroundEvents -= 1
+        if self.cancelledEvents > self.COMPACT_THRESHOLD and 2 * self.cancelledEvents > len(self.queue):
+            self.queue.discard_cancelled()
+            self.cancelledEvents = 0
+
+    def set_foreground(self, event):
+        '''
+            Turn a queued background event into a foreground one, e.g. when data starts
+            waiting for a link busy with a routing packet
+            
+            Args:
+                event: the event to be changed
+        '''
+        if event is not None and event.queued and event.background:
+            event.background = False
+            self.foregroundEvents += 1
+
+    def add_stop_condition(self, condition):
+        '''
+            Add a condition ending run() early
+            
+            Args:
+                condition: callable (engine) -> bool, named by its 'name' attribute if any
         '''
-        return heapq.heappop(self.queue)[1]
+        self.stopConditions.append(condition)
+
+    def pendingEvents(self):
+        '''
+            Number of events which are still to be executed
+        '''
+        return len(self.queue) - self.cancelledEvents
+
+    def getFingerprint(self):
+        '''
+            Get the fingerprint of the executed event stream as a hex string
+        '''
+        return '%08x' % (self.fingerprint & 0xffffffff)
 
     def execute_top(self):
         '''
@@ -50,6 +177,8 @@ class SimEngine:
         '''
         event = self.pop_event()
         self.curTime = event.time
+        self.executedEvents += 1
+        self.fingerprint = zlib.crc32(repr((event.time, event.type, getattr(event.reactor, 'name', ''))), self.fingerprint)
         event.execute()
             
 
@@ -59,9 +188,125 @@ class SimEngine:
             Run method of engine
                 1) ended when executed all events in the queue
                 2) ended when current simulation time exceeds MAXTIME
+                3) ended when only background events are left, if stopWhenQuiescent
+                4) ended when a stop condition is met
+            The reason is kept in self.stopReason
         '''
-        while len(self.queue) > 0 and self.curTime < self.MAXTIME:            
+        if self.disableGC and gc.isenabled():
+            gc.disable()
+            try:
+                self._run()
+            finally:
+                gc.enable()
+        else:
+            self._run()
+
+    def _run(self):
+        '''
+            Event loop of run()
+        '''
+        if not self.stopWhenQuiescent and not self.stopConditions:
+            while self.pendingEvents() > 0 and self.curTime < self.MAXTIME:            
+                self.execute_top()
+        else:
+            nextCheck = self.curTime
+            while self.pendingEvents() > 0 and self.curTime < self.MAXTIME:
+                if self.stopWhenQuiescent and self.foregroundEvents == 0:
+                    self.stopReason = 'quiescent'
+                    return
+                self.execute_top()
+                if self.stopConditions and self.curTime >= nextCheck:
+                    nextCheck = self.curTime + self.stopCheckInterval
+                    for condition in self.stopConditions:
+                        if condition(self):
+                            self.stopReason = getattr(condition, 'name', getattr(condition, '__name__', 'condition'))
+                            return
+        self.stopReason = 'maxtime' if self.curTime >= self.MAXTIME else 'empty'
+
+    def run_until(self, time):
+        '''
+            Execute all events earlier than time (and MAXTIME), then set the current
+            simulation time to time. Can be called repeatedly to step the simulation,
+            and run() continues from there.
+            
+            Args:
+                time: the simulation time to stop at
+        '''
+        end = min(time, self.MAXTIME)
+        paused = self.disableGC and gc.isenabled()
+        if paused:
+            gc.disable()
+        try:
+            self._run_until(end)
+        finally:
+            if paused:
+                gc.enable()
+        if end != float('inf'):
+            self.curTime = max(self.curTime, end)
+
+    def _run_until(self, end):
+        '''
+            Event loop of run_until()
+        '''
+        event = self.peek_event()
+        while event is not None and event.time < end:
             self.execute_top()
+            event = self.peek_event()
+
+    def __getstate__(self):
+        '''
+            Used by pickle (checkpoint and fork), an attached profiler is left out
+        '''
+        state = dict(self.__dict__)
+        state.pop('execute_top', None)
+        state['profiler'] = None
+        return state
+
+    def save_checkpoint(self, file_name):
+        '''
+            Save the whole simulation state into a file: event queue, elements of parse,
+            TCP state machines and recorded data
+            
+            Args:
+                file_name: the checkpoint file
+        '''
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(max(limit, CHECKPOINT_RECURSION_LIMIT))
+        try:
+            with open(file_name, 'wb') as checkpointFile:
+                pickle.dump(self, checkpointFile, pickle.HIGHEST_PROTOCOL)
+        finally:
+            sys.setrecursionlimit(limit)
+
+    def fork(self):
+        '''
+            Get an independent copy of the engine in its current state, used to branch
+            several runs from a common prefix without going through a file
+        '''
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(max(limit, CHECKPOINT_RECURSION_LIMIT))
+        try:
+            return pickle.loads(pickle.dumps(self, pickle.HIGHEST_PROTOCOL))
+        finally:
+            sys.setrecursionlimit(limit)
+
+
+
+def load_checkpoint(file_name):
+    '''
+        Restore an engine saved by SimEngine.save_checkpoint
+        The elements are reached through engine.parse (hosts, routers, links, flows)
+        
+        Args:
+            file_name: the checkpoint file
+    '''
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, CHECKPOINT_RECURSION_LIMIT))
+    try:
+        with open(file_name, 'rb') as checkpointFile:
+            return pickle.load(checkpointFile)
+    finally:
+        sys.setrecursionlimit(limit)
 
 
 
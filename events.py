@@ -1,54 +1,102 @@
 from constants import *
 
-class Event:
+'''
+    Name of the reactor method handling each event type, indexed by the event opcode
+'''
+EVENT_HANDLERS = ['react_to_link_available', 'react_to_packet_receipt', 'react_to_routing_table_outdated',
+                  'react_to_time_out', 'react_to_flow_start', 'react_to_routing_table_update',
+                  'react_fast_update']
+
+# reactor class -> list of handler functions, indexed by the event opcode
+_dispatch = {}
+
+
+def bindHandlers(cls):
+    '''
+        Build the handler table of a reactor class
+        A missing handler is looked up on the reactor at call time, so it fails
+        with the usual AttributeError only if such an event is really sent to it
+        
+        Args:
+            cls: class of the reactor
+    '''
+    table = []
+    for name in EVENT_HANDLERS:
+        method = getattr(cls, name, None)
+        if method is None:
+            method = lambda reactor, event, name = name: getattr(reactor, name)(event)
+        else:
+            method = getattr(method, '__func__', method)
+        table.append(method)
+    _dispatch[cls] = table
+    return table
+
+
+
+class Event(object):
     '''
         Event defines all events in the simulation
         
         Attributes:
             time: the time event will happen
             reactor: object to handle the event
+            type: opcode of the event (EVENT_* in constants.py)
             packet: the packet to be received
+            pck_id: ID of the packet which will be time_out
+            priority: priority class, orders events with the same time (EVENT_PRIORITY)
+            order: orders events with the same time and priority before seq, the name of the
+                   transmitter for packet deliveries, so that their order does not depend on when
+                   they were pushed; empty for the other events
+            seq: insertion sequence number, set by SimEngine.push_event
+            queued: whether the event is waiting in the engine queue
+            cancelled: set by SimEngine.cancel_event, a cancelled event is never executed
+            background: housekeeping event (routing, periodic updates), which alone
+                        does not keep a simulation going (see SimEngine.stopWhenQuiescent)
     '''
-    def __init__(self, time, reactor, type):
+    __slots__ = ('time', 'reactor', 'type', 'packet', 'pck_id', 'priority', 'order', 'seq', 'queued', 'cancelled',
+                 'background')
+    
+    def __init__(self, time, reactor, type, packet = None, pck_id = None, background = False):
         self.time = time
         self.reactor = reactor
         self.type = type
+        self.priority = EVENT_PRIORITY[type]
+        self.order = ''
+        self.seq = 0
+        self.packet = packet
+        self.pck_id = pck_id
+        self.queued = False
+        self.cancelled = False
+        self.background = background
 
     def execute(self):
         '''
             Execute corresponding event according to the event type
+            The handler is taken from the table of the reactor class
         '''
-        if (self.type == EVENT_LINK_AVAILABLE):
-            self.reactor.react_to_link_available(self)
-        if (self.type == EVENT_PACKET_RECEIPT):
-            self.reactor.react_to_packet_receipt(self)
-        if (self.type == EVENT_ROUTINGTABLE_OUTDATED):
-            self.reactor.react_to_routing_table_outdated(self)
-        if (self.type == EVENT_ROUTINGTABLE_UPDATE):
-            self.reactor.react_to_routing_table_update(self)
-        if (self.type == EVENT_PACKET_TIMEOUT):
-            self.reactor.react_to_time_out(self)
-        if (self.type == EVENT_FLOW_START):
-            self.reactor.react_to_flow_start(self)
-        if (self.type == EVENT_FAST_UPDATE):
-            self.reactor.react_fast_update(self)
+        reactor = self.reactor
+        try:
+            table = _dispatch[reactor.__class__]
+        except KeyError:
+            table = bindHandlers(reactor.__class__)
+        table[self.type](reactor, self)
             
     @staticmethod
     def CreateEventFastUpdate(time, reactor):
         '''
-            Create a packet receive event
+            Create a periodic window update event of TCP Fast
+            It only changes the window size, so it is a background event
             
             Args:
                 time: the time event will happen
                 reactor: object to handle the event
-                packet: the packet to be received
         '''
-        event = Event(time, reactor, EVENT_FAST_UPDATE)
+        event = Event(time, reactor, EVENT_FAST_UPDATE, background = True)
         
         return event 
 
     @staticmethod
-    def CreateEventPacketReceipt(time, reactor, packet):
+    def CreateEventPacketReceipt(time, reactor, packet, background = False, order = ''):
         '''
             Create a packet receive event
             
@@ -56,10 +104,12 @@ class Event:
                 time: the time event will happen
                 reactor: object to handle the event
                 packet: the packet to be received
+                background: True for routing packets
+                order: name of the transmitter delivering the packet (see Event.order)
         '''
-        event = Event(time, reactor, EVENT_PACKET_RECEIPT)
-        event.packet = packet
-        return event 
+        event = Event(time, reactor, EVENT_PACKET_RECEIPT, packet = packet, background = background)
+        event.order = order
+        return event
     
     @staticmethod
     def CreateEventPacketTimeOut(time, reactor, pck_id=None):
@@ -71,9 +121,7 @@ class Event:
                 reactor: object to handle the event
                 pck_id: ID of the packet which will be time_out
         '''
-        event = Event(time, reactor, EVENT_PACKET_TIMEOUT)
-        event.pck_id = pck_id
-        return event
+        return Event(time, reactor, EVENT_PACKET_TIMEOUT, pck_id = pck_id)
 
 
 
@@ -0,0 +1,549 @@
+'''
+    Hybrid fluid-flow simulation mode
+
+    Instead of packets, every flow is a rate and every link direction a fluid queue:
+        x_f = W_f * PACKET_SIZE / RTT_f        rate of flow f (bytes/s)
+        dq/dt = y - s                          queue of a link direction (bytes)
+    y is the sum of the rates entering the direction, data and ACKs (x_f * ACK_PACKET_SIZE
+    / PACKET_SIZE on the way back), s its service rate. A half-duplex link serves both
+    directions with its rate C: a direction with an empty queue is served at its
+    arrival rate and the backlogged direction gets the rest of C, or both share C in
+    proportion to their arrival rates. Each direction of a full-duplex link has its own
+    rate C: it serves min(y, C), or C while backlogged. A full buffer drops its excess arrival, shared
+    among the flows by their rates. RTT_f adds up the propagation, transmission and
+    queueing delays along the path of the flow and back. An overloaded direction passes
+    the rates of its flows on to the next hop scaled by s / y.
+
+    Windows follow the fluid form of the laws of tcp_reno.py and tcp_fast.py:
+        slow start               dW/dt = x_f / PACKET_SIZE          (W + 1 per ACK)
+        Reno congestion avoid.   dW/dt = x_f / PACKET_SIZE / W      (W + 1/W per ACK)
+        FAST congestion avoid.   dW/dt = gamma * (baseRTT / RTT * W + alpha - W) / RTT
+                                                                    (update every RTT)
+    Losses are discrete events: once a flow has lost a whole packet, its window is
+    halved (fast retransmit), at most once per RTT. Time outs are not modeled.
+    This is coarse when losses drive the windows, as with Reno: run() warns when the
+    flows are Reno or a window was cut by a loss (see the README for the error measured).
+
+    The state (windows and queues) is stepped with an adaptive Heun-Euler integrator;
+    a step is cut at flow starts and at MAXTIME. Over 40 s of testcase0-2 this is 60 to
+    160 times faster than the packet mode (see the README). Flows use the static shortest path
+    (propagation plus transmission delay), there are no routing packets. Buffers are
+    drop-tail, the aqm of the links (aqm.py) is not modeled.
+
+    The results go into the same recorder categories as the packet mode, so that
+    testcase.save_data and Record.plot work unchanged:
+        engine = FluidEngine(maxtime)
+        parse(engine, 'testcase1.txt', tcp = 'reno')
+        engine.run()
+        save_data(engine, dir_data)
+
+    Usage: python fluid.py testcase.txt maxtime [fast|reno] [compare] [static]
+    'compare' also runs the packet mode and prints both side by side.
+'''
+import matplotlib
+matplotlib.use('Agg')
+
+import sys
+import time
+import warnings
+
+from constants import *
+import record
+import routing
+
+
+class FluidFlow(object):
+    '''
+        Fluid state of one flow which is not part of the integrated vector
+
+        Attributes:
+            flow: the element.Flow
+            forward: link directions from the source to the destination
+            backward: link directions of the ACKs
+            state: 'waiting', 'slow_start', 'congestion_control' or 'done'
+            threshold: slow start threshold
+            baseRTT: smallest RTT seen
+            acked: packets acknowledged so far
+            lost: packets lost since the last window reduction
+            lastLoss: time of the last window reduction
+    '''
+    def __init__(self, flow, forward, backward):
+        self.flow = flow
+        self.forward = forward
+        self.backward = backward
+        self.state = 'waiting'
+        self.threshold = flow.tcp.threshold
+        self.baseRTT = float('inf')
+        self.acked = 0.0
+        self.lost = 0.0
+        self.lastLoss = -float('inf')
+
+
+
+class FluidEngine(object):
+    '''
+        Fluid-flow counterpart of SimEngine, the topology is built by parse as usual
+        (the events pushed by parse are not used)
+
+        Attributes:
+            MAXTIME: maximum time for simulation
+            curTime: current simulation time stamp
+            recorder: handle all data need to be logged and plotted
+            steps: number of accepted integration steps
+            rejectedSteps: number of steps redone with a smaller step size
+            stopReason: why the last run() ended: 'maxtime' or 'done'
+            rtol: relative tolerance of the integrator
+            minStep, maxStep: bounds of the step size in s
+    '''
+    # absolute tolerances: window in packets, queue in bytes
+    WINDOW_ATOL = 0.25
+    QUEUE_ATOL = PACKET_SIZE / 4.0
+
+    def __init__(self, maxtime, rtol = 0.01, min_step = 1e-5, max_step = 0.05):
+        self.MAXTIME = maxtime
+        self.curTime = 0
+        self.recorder = record.Record()
+        self.steps = 0
+        self.rejectedSteps = 0
+        self.stopReason = None
+        self.rtol = rtol
+        self.minStep = min_step
+        self.maxStep = max_step
+
+    def getCurrentTime(self):
+        '''
+            Get current simulation time
+        '''
+        return self.curTime
+
+    def push_event(self, event):
+        '''
+            Events created while parsing are not needed by the fluid model
+        '''
+        pass
+
+    def setup(self):
+        '''
+            Index the link directions and route the flows
+            Direction 2*i of link i goes from node1 to node2 (buffer1), 2*i+1 back (buffer2)
+        '''
+        parser = self.parse
+        self.links = [parser.links[name] for name in sorted(parser.links)]
+        self.capacity = []
+        self.propagation = []
+        self.bufferSize = []
+        self.buffers = []
+        self.linkIndex = {}
+        for i, link in enumerate(self.links):
+            self.linkIndex[link.name] = i
+            for buffer in [link.buffer1, link.buffer2]:
+                self.capacity.append(link.rate)
+                self.propagation.append(link.propogationDelay)
+                self.bufferSize.append(buffer.buffer_size)
+                self.buffers.append(buffer)
+
+        adjacency = routing.topology_graph(parser, 'delay')
+        self.flows = []
+        for name in sorted(parser.flows):
+            flow = parser.flows[name]
+            if flow.path is not None:
+                forward = self.pinnedRoute(flow)
+            else:
+                forward = self.route(adjacency, flow.source.name, flow.destination.name)
+            backward = [j ^ 1 for j in reversed(forward)]
+            self.flows.append(FluidFlow(flow, forward, backward))
+        self.window = [0.0] * len(self.flows)
+        self.queue = [0.0] * len(self.capacity)
+
+    def route(self, adjacency, source, destination):
+        '''
+            Shortest path by propagation and transmission delay (routing.py)
+
+            Return:
+                list of link directions from source to destination
+        '''
+        costs, previous = routing.dijkstra(adjacency, source, set(self.parse.routers))
+        path = routing.shortest_path(previous, source, destination)
+        if not path:
+            raise ValueError('no path from {} to {}'.format(source, destination))
+        return self.directions(path)
+
+    def pinnedRoute(self, flow):
+        '''
+            Path a flow is pinned to (Flow.setPath)
+
+            Return:
+                list of link directions from source to destination
+        '''
+        path = [(flow.path[0].name, flow.source.link)]
+        for router, after in zip(flow.path, flow.path[1:] + [flow.destination]):
+            path.append((after.name, flow.hops[router][0][0]))
+        return self.directions(path)
+
+    def directions(self, path):
+        '''
+            Link directions of a path, list of (node name, link to it)
+        '''
+        # going to node2 of a link is its direction 0
+        return [2 * self.linkIndex[link.name] + (0 if link.node2.name == node else 1) for node, link in path]
+
+    def evaluate(self, window, queue):
+        '''
+            Rates and derivatives of the fluid state
+
+            Args:
+                window: window of every flow
+                queue: queue of every link direction
+
+            Return:
+                (dWindow, dQueue, rates, rtts, delays, service, overflow, delivered)
+                rates are the sending rates of the flows, delivered their rates at the
+                destination (after the rate changes of the queues on the way)
+        '''
+        capacity = self.capacity
+        propagation = self.propagation
+        ackRatio = 1.0 * ACK_PACKET_SIZE / PACKET_SIZE
+        rates = []; rtts = []; delays = []
+        for k, fluid in enumerate(self.flows):
+            delay = 0.0
+            for j in fluid.forward:
+                delay += propagation[j] + (queue[j] + PACKET_SIZE) / capacity[j]
+            rtt = delay
+            for j in fluid.backward:
+                rtt += propagation[j] + (queue[j] + ACK_PACKET_SIZE) / capacity[j]
+            rate = 0.0
+            if fluid.state in ('slow_start', 'congestion_control'):
+                rate = window[k] * PACKET_SIZE / rtt
+            rates.append(rate); rtts.append(rtt); delays.append(delay)
+
+        # an overloaded direction passes its flows on at service / arrival of their rates:
+        # the arrivals are computed with the source rates, then again with these ratios.
+        # A draining queue is not credited to its flows (the ratio is at most 1), the
+        # composition of its content is not known
+        ratio = [1.0] * len(capacity)
+        for shaping in (False, True):
+            arrival = [0.0] * len(capacity)
+            delivered = []
+            for k, fluid in enumerate(self.flows):
+                rate = rates[k]
+                for j in fluid.forward:
+                    arrival[j] += rate
+                    rate *= ratio[j]
+                delivered.append(rate)
+                rate *= ackRatio
+                for j in fluid.backward:
+                    arrival[j] += rate
+                    rate *= ratio[j]
+            service = self.serve(arrival, queue)
+            for j in xrange(len(capacity)):
+                ratio[j] = min(1.0, service[j] / arrival[j]) if arrival[j] > 0 else 1.0
+
+        dQueue = [0.0] * len(capacity)
+        overflow = [0.0] * len(capacity)
+        for j in xrange(len(capacity)):
+            change = arrival[j] - service[j]
+            if change > 0 and queue[j] >= self.bufferSize[j]:
+                overflow[j] = change
+                change = 0.0
+            elif change < 0 and queue[j] <= 0:
+                change = 0.0
+            dQueue[j] = change
+
+        dWindow = [0.0] * len(self.flows)
+        for k, fluid in enumerate(self.flows):
+            acks = delivered[k] / PACKET_SIZE
+            if fluid.state == 'slow_start':
+                dWindow[k] = acks
+            elif fluid.state == 'congestion_control':
+                tcp = fluid.flow.tcp
+                if self.parse.tcp == 'fast':
+                    baseRTT = min(fluid.baseRTT, rtts[k])
+                    dWindow[k] = tcp.gamma * (baseRTT / rtts[k] * window[k] + tcp.alpha - window[k]) / rtts[k]
+                else:
+                    dWindow[k] = acks / max(window[k], 1.0)
+        return dWindow, dQueue, rates, rtts, delays, service, overflow, delivered
+
+    def serve(self, arrival, queue):
+        '''
+            Service rate of every link direction
+
+            Args:
+                arrival: arrival rate of every link direction
+                queue: queue of every link direction
+        '''
+        capacity = self.capacity
+        service = [0.0] * len(capacity)
+        for j in xrange(0, len(capacity), 2):
+            C = capacity[j]
+            y0 = arrival[j]; y1 = arrival[j+1]
+            backlog0 = queue[j] > 0; backlog1 = queue[j+1] > 0
+            if self.links[j / 2].duplex == 'full':
+                service[j] = C if backlog0 else min(y0, C)
+                service[j+1] = C if backlog1 else min(y1, C)
+            elif not backlog0 and not backlog1 and y0 + y1 <= C:
+                service[j] = y0; service[j+1] = y1
+            elif not backlog1 and y1 < C and backlog0:
+                service[j+1] = y1; service[j] = C - y1
+            elif not backlog0 and y0 < C and backlog1:
+                service[j] = y0; service[j+1] = C - y0
+            elif y0 + y1 > 0:
+                service[j] = C * y0 / (y0 + y1); service[j+1] = C * y1 / (y0 + y1)
+            else:
+                service[j] = service[j+1] = C / 2.0
+        return service
+
+    def clip(self, window, queue):
+        '''
+            Keep the state in its domain: 1 <= window (of running flows), 0 <= queue <= buffer
+        '''
+        for k, fluid in enumerate(self.flows):
+            if fluid.state in ('slow_start', 'congestion_control'):
+                window[k] = max(window[k], 1.0)
+        for j in xrange(len(queue)):
+            queue[j] = min(max(queue[j], 0.0), self.bufferSize[j])
+        return window, queue
+
+    def nextBreak(self):
+        '''
+            Time of the next flow start, or MAXTIME
+        '''
+        times = [fluid.flow.start_time for fluid in self.flows
+                 if fluid.state == 'waiting' and fluid.flow.start_time > self.curTime]
+        return min(times + [self.MAXTIME])
+
+    def startFlows(self):
+        '''
+            Start the flows whose start time has come, with the initial TCP window
+        '''
+        for k, fluid in enumerate(self.flows):
+            if fluid.state == 'waiting' and fluid.flow.start_time <= self.curTime:
+                fluid.state = 'slow_start'
+                self.window[k] = fluid.flow.tcp.windowSize
+                self.recorder.record_window_size(fluid.flow, self.curTime, self.window[k])
+
+    def update(self, step, first, second):
+        '''
+            Discrete part of an accepted step: acknowledged and lost packets,
+            end of slow start, window reductions, end of the flows
+
+            Args:
+                step: length of the step
+                first, second: evaluate() at the beginning and at the Euler end of the step
+        '''
+        now = self.curTime
+        for j in xrange(len(self.queue)):
+            lost = step / 2.0 * (first[6][j] + second[6][j])
+            if lost <= 0:
+                continue
+            self.recorder.record_packet_loss(self.buffers[j], now, lost / PACKET_SIZE)
+            arrival = sum(first[2][k] for k, fluid in enumerate(self.flows) if j in fluid.forward)
+            for k, fluid in enumerate(self.flows):
+                if j in fluid.forward and arrival > 0:
+                    fluid.lost += lost / PACKET_SIZE * first[2][k] / arrival
+
+        for k, fluid in enumerate(self.flows):
+            if fluid.state not in ('slow_start', 'congestion_control'):
+                continue
+            flow = fluid.flow
+            fluid.baseRTT = min(fluid.baseRTT, first[3][k])
+            delivered = step / 2.0 * (first[7][k] + second[7][k]) / PACKET_SIZE
+            fluid.acked += delivered
+            # same unit as the packet mode: Mb received (summed up by the smoothing)
+            self.recorder.record_flow_rate(flow, now, delivered * PACKET_SIZE * 8.0 / 1024 / 1024)
+            if fluid.acked >= flow.amount:
+                fluid.acked = flow.amount
+                fluid.state = 'done'
+                self.window[k] = 0.0
+                self.recorder.record_window_size(flow, now, 0)
+                self.recorder.record_pkts_received(flow, now, flow.amount - 1)
+                continue
+            if fluid.lost >= 1 and now - fluid.lastLoss > first[3][k]:
+                # fast retransmit: half the window, carry on in congestion avoidance
+                fluid.threshold = self.window[k] / 2.0
+                self.window[k] = max(fluid.threshold, 2.0)
+                fluid.state = 'congestion_control'
+                fluid.lost = 0.0
+                fluid.lastLoss = now
+                self.recorder.record_ssthre(flow, now, fluid.threshold)
+            elif fluid.state == 'slow_start' and self.window[k] >= fluid.threshold:
+                fluid.state = 'congestion_control'
+
+    def recordState(self, rates):
+        '''
+            Log the current state into the recorder, in the units of the packet mode
+        '''
+        now = self.curTime
+        recorder = self.recorder
+        window, queue = self.window, self.queue
+        dWindow, dQueue, rates, rtts, delays, service, overflow, delivered = rates
+        for j in xrange(0, len(queue), 2):
+            link = self.links[j / 2]
+            if link.duplex == 'full':
+                # as the transmitters of the packet mode, one record per direction
+                recorder.record_link_rate(self.buffers[j], now, service[j] * 8 / 1024 / 1024)
+                recorder.record_link_rate(self.buffers[j+1], now, service[j+1] * 8 / 1024 / 1024)
+            else:
+                recorder.record_link_rate(link, now, (service[j] + service[j+1]) * 8 / 1024 / 1024)
+        for j in xrange(len(queue)):
+            recorder.record_buffer_occupancy(self.buffers[j], now, queue[j] / PACKET_SIZE)
+        for k, fluid in enumerate(self.flows):
+            if fluid.state not in ('slow_start', 'congestion_control'):
+                continue
+            flow = fluid.flow
+            recorder.record_window_size(flow, now, window[k])
+            recorder.record_packet_delay(flow, now, delays[k])
+            recorder.record_rtt(flow, now, rtts[k])
+            # ID of the last packet acknowledged, as recorded by the TCPs
+            recorder.record_pkts_received(flow, now, max(int(fluid.acked) - 1, 0))
+
+    def run(self):
+        '''
+            Integrate the fluid model until MAXTIME, or until all the flows are done
+        '''
+        self.setup()
+        step = self.minStep
+        self.startFlows()
+        while self.curTime < self.MAXTIME:
+            if all(fluid.state == 'done' for fluid in self.flows):
+                self.stopReason = 'done'
+                self.warnLosses()
+                return
+            breakTime = self.nextBreak()
+            first = self.evaluate(self.window, self.queue)
+            self.recordState(first)
+            while True:
+                step = min(step, self.maxStep, breakTime - self.curTime)
+                window = [w + step * d for w, d in zip(self.window, first[0])]
+                queue = [q + step * d for q, d in zip(self.queue, first[1])]
+                window, queue = self.clip(window, queue)
+                second = self.evaluate(window, queue)
+                newWindow = [w + step / 2.0 * (d1 + d2) for w, d1, d2 in zip(self.window, first[0], second[0])]
+                newQueue = [q + step / 2.0 * (d1 + d2) for q, d1, d2 in zip(self.queue, first[1], second[1])]
+                newWindow, newQueue = self.clip(newWindow, newQueue)
+
+                # Heun - Euler difference as error estimate
+                error = 0.0
+                for a, b in zip(newWindow, window):
+                    error = max(error, abs(a - b) / (self.WINDOW_ATOL + self.rtol * abs(a)))
+                for a, b in zip(newQueue, queue):
+                    error = max(error, abs(a - b) / (self.QUEUE_ATOL + self.rtol * abs(a)))
+                if error <= 1 or step <= self.minStep:
+                    break
+                self.rejectedSteps += 1
+                step = max(self.minStep, step * max(0.2, 0.9 / error ** 0.5))
+
+            self.window, self.queue = newWindow, newQueue
+            self.curTime += step
+            if breakTime - self.curTime < 1e-12:
+                self.curTime = breakTime
+            self.steps += 1
+            self.update(step, first, second)
+            self.startFlows()
+            step = step * min(2.0, 0.9 / error ** 0.5) if error > 0 else 2.0 * step
+        self.stopReason = 'maxtime'
+        self.warnLosses()
+
+    def warnLosses(self):
+        '''
+            Warn that the results are approximate when losses drove the windows
+        '''
+        lossy = [fluid.flow.name for fluid in self.flows if fluid.lastLoss > -float('inf')]
+        if self.parse.tcp == 'reno' or lossy:
+            warnings.warn('fluid model with {} TCP, windows cut by losses: {}; losses are coarse '
+                          '(no time outs), flow results may differ from the packet mode by a factor 2'
+                          .format(self.parse.tcp, ', '.join(lossy) or 'none'))
+
+
+
+def summarize(engine):
+    '''
+        Per flow summary of a run (packet or fluid mode)
+
+        Return:
+            {flow name: {'acked', 'done', 'throughput', 'delay'}}
+            acked: packets acknowledged at the end, done: time when the flow completed
+            (None if it did not), throughput: Mbps from the start to the end of the flow,
+            delay: time average of the packet delay in s
+    '''
+    category = engine.recorder.category
+    summary = {}
+    for name, flow in engine.parse.flows.items():
+        received = category[CATE_PKTS_RECEIVED].get(name, [(0, 0)])
+        acked = received[-1][1]
+        done = None
+        for t, value in received:
+            if value >= flow.amount - 1:
+                done = t
+                break
+        end = done if done is not None else engine.getCurrentTime()
+        throughput = acked * PACKET_SIZE * 8.0 / 1024 / 1024 / max(end - flow.start_time, 1e-9)
+        delays = category[CATE_PACKET_DELAY].get(name, [])[1:]
+        delay = 0.0
+        if len(delays) > 1:
+            span = delays[-1][0] - delays[0][0]
+            for (t0, v0), (t1, v1) in zip(delays, delays[1:]):
+                delay += v0 * (t1 - t0)
+            delay = delay / span if span > 0 else delays[0][1]
+        summary[name] = {'acked': acked, 'done': done, 'throughput': throughput, 'delay': delay}
+    return summary
+
+
+def compare(case, maxtime, tcp = 'fast', routing = 'dynamic'):
+    '''
+        Run a testcase in packet mode and in fluid mode
+        routing is the routing mode of the packet mode (see routing.py), 'static' uses
+        the same paths as the fluid mode
+
+        Return:
+            (packet summary, fluid summary, packet wall time, fluid wall time)
+    '''
+    from engine import SimEngine
+    from parse import parse
+
+    results = []
+    for engine in [SimEngine(maxtime), FluidEngine(maxtime)]:
+        parse(engine, case, tcp = tcp, routing = routing)
+        start = time.time()
+        engine.run()
+        results.append((summarize(engine), time.time() - start))
+    (packet, packetWall), (fluid, fluidWall) = results
+    return packet, fluid, packetWall, fluidWall
+
+
+def main():
+    if len(sys.argv) < 3:
+        print 'Usage: python fluid.py testcase.txt maxtime [fast|reno] [compare] [static]'
+        return
+    from parse import parse
+
+    case, maxtime = sys.argv[1], float(sys.argv[2])
+    tcp = sys.argv[3] if len(sys.argv) > 3 else 'fast'
+    if 'compare' in sys.argv[4:]:
+        routingMode = 'static' if 'static' in sys.argv[4:] else 'dynamic'
+        packet, fluid, packetWall, fluidWall = compare(case, maxtime, tcp, routingMode)
+        print 'wall: packet {:.2f}s  fluid {:.3f}s  speedup {:.0f}x'.format(packetWall, fluidWall,
+                                                                          packetWall / fluidWall)
+        print '{:<6}{:>10}{:>10}{:>9}{:>9}{:>10}{:>10}{:>10}{:>10}'.format(
+            'flow', 'acked', 'fluid', 'done', 'fluid', 'Mbps', 'fluid', 'delay/s', 'fluid')
+        for name in sorted(packet):
+            p, f = packet[name], fluid[name]
+            print '{:<6}{:>10}{:>10}{:>9}{:>9}{:>10.2f}{:>10.2f}{:>10.4f}{:>10.4f}'.format(
+                name, p['acked'], f['acked'],
+                '%.2f' % p['done'] if p['done'] is not None else '-',
+                '%.2f' % f['done'] if f['done'] is not None else '-',
+                p['throughput'], f['throughput'], p['delay'], f['delay'])
+        return
+
+    engine = FluidEngine(maxtime)
+    parse(engine, case, tcp = tcp)
+    start = time.time()
+    engine.run()
+    wall = time.time() - start
+    print 'fluid: {} steps ({} rejected) in {:.3f}s, {}'.format(engine.steps, engine.rejectedSteps, wall,
+                                                                 engine.stopReason)
+    for name, result in sorted(summarize(engine).items()):
+        print name, result
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+'''
+    Link-state routing (OSPF style)
+
+    Routers measure the cost to their neighbors as in the distance-vector protocol
+    ('request' / 'ack_request' every updateTime). Instead of their whole routing table,
+    they flood a link-state advertisement (LSA) with their own neighbor costs, once per
+    measurement round and only if a cost changed:
+        (origin address, sequence number, {neighbor address: cost})
+    An LSA is a RouterPacket of type 'lsa', of LSA_HEADER_SIZE + LSA_LINK_SIZE bytes per
+    neighbor. A router floods an LSA newer than the one it holds to its other neighbor
+    routers, so every router ends up with the same link-state database (LSDB). The
+    neighbor dicts are never modified once advertised, so all the LSDBs share them.
+
+    Every router keeps a shortest path tree over the LSDB and updates it incrementally
+    (dynamic SPF) for each link whose cost an LSA changes:
+        - a cost decrease which shortens the path of the head of the link is propagated
+          from there with Dijkstra, only over the nodes whose path gets shorter
+        - a cost increase of a tree link detaches the subtree below it, which is attached
+          again from its best neighbors outside of it
+        - any other change leaves the tree as it is
+    Only the destinations whose path changed are written into the routing table; a
+    destination left without a path keeps its entry with an infinite cost.
+
+    Selected with parse(engine, case, routing = 'link_state').
+'''
+import heapq
+
+from constants import *
+from element import Router, RouterPacket
+
+
+class LinkStateRouter(Router):
+    '''
+        Router running link-state routing
+
+        Attributes (in addition to the ones of Router):
+            sequence: sequence number of the last LSA originated
+            neighborCosts: neighbor address -> last measured cost
+            answered: neighbors which answered the last 'request'
+            dirty: neighborCosts changed since the last LSA originated
+            lsdb: origin address -> (sequence number, {neighbor address: cost})
+            inEdges: address -> set of the origins advertising a link to it
+            dist: address -> cost of the shortest path
+            parent: address -> previous address on the shortest path
+            lsaSent: LSAs sent, originated or flooded
+            spfUpdates: link changes which changed the shortest path tree
+            spfSkipped: link changes which did not
+    '''
+    def __init__(self, engine, name, address, updateTime = ROUTER_PACKET_GENERATION_INTERVAL):
+        super(LinkStateRouter, self).__init__(engine, name, address, updateTime)
+        self.sequence = 0
+        self.neighborCosts = {}
+        self.answered = set()
+        self.dirty = False
+        self.lsdb = {}
+        self.inEdges = {}
+        self.dist = {address: 0}
+        self.parent = {}
+        self.lsaSent = 0
+        self.spfUpdates = 0
+        self.spfSkipped = 0
+
+    def startMeasureCost(self):
+        '''
+            Called periodically to for cost measuring
+            Costs measured in the previous round but not advertised yet are advertised first
+        '''
+        if self.dirty:
+            self.originateLSA()
+        self.answered = set()
+        self.broadcastRequestPacket()
+
+    def measureCost(self, packet):
+        '''
+            Handle receipt of Router Packet - 'ack_request'
+            Originate an LSA once all the neighbors have answered, if a cost changed
+        '''
+        neighbor = packet.source.address
+        self.answered.add(neighbor)
+        cost = self.linkCost(neighbor, packet.routerTable)
+        if self.neighborCosts.get(neighbor) != cost:
+            self.neighborCosts[neighbor] = cost
+            self.dirty = True
+        if self.dirty and len(self.answered) >= len(self.neighbors):
+            self.originateLSA()
+
+    def receive(self, packet):
+        '''
+            React to packet receipt, LSAs are handled here, the rest as in Router
+        '''
+        if isinstance(packet, RouterPacket) and packet.type == 'lsa':
+            self.receiveLSA(packet)
+        else:
+            super(LinkStateRouter, self).receive(packet)
+
+    def originateLSA(self):
+        '''
+            Advertise the current neighbor costs
+        '''
+        self.sequence += 1
+        self.dirty = False
+        lsa = (self.address, self.sequence, dict(self.neighborCosts))
+        self.installLSA(lsa)
+        self.flood(lsa, None)
+
+    def receiveLSA(self, packet):
+        '''
+            Install and flood an LSA newer than the one in the LSDB, ignore it otherwise
+        '''
+        lsa = packet.routerTable
+        origin, sequence, costs = lsa
+        if origin == self.address:
+            return
+        if origin in self.lsdb and self.lsdb[origin][0] >= sequence:
+            return
+        self.installLSA(lsa)
+        self.flood(lsa, packet.source.address)
+
+    def flood(self, lsa, sender):
+        '''
+            Send an LSA to all the neighbor routers but the one it came from
+        '''
+        packet = None
+        for address, (link, side) in self.neighbors.items():
+            neighbor = link.node2 if side == 1 else link.node1
+            if address == sender or not isinstance(neighbor, Router):
+                continue
+            if packet is None:
+                packet = RouterPacket(self, self.engine.getCurrentTime(),
+                                      LSA_HEADER_SIZE + LSA_LINK_SIZE * len(lsa[2]), lsa, 'lsa')
+            self.sendRouterPacket(link, packet)
+            self.lsaSent += 1
+
+    def installLSA(self, lsa):
+        '''
+            Store an LSA and update the shortest path tree for every link it changes
+        '''
+        origin, sequence, costs = lsa
+        old = self.lsdb[origin][1] if origin in self.lsdb else {}
+        self.lsdb[origin] = (sequence, costs)
+        links = []
+        for address in set(old) | set(costs):
+            before = old.get(address)
+            after = costs.get(address)
+            if before == after:
+                continue
+            if after is None:
+                self.inEdges[address].discard(origin)
+            else:
+                self.inEdges.setdefault(address, set()).add(origin)
+            links.append((address, before, after))
+        # inEdges must match the LSDB before the tree is walked
+        changed = set()
+        for address, before, after in links:
+            if before is None or (after is not None and after < before):
+                self.linkDecreased(origin, address, after, changed)
+            else:
+                self.linkIncreased(origin, address, changed)
+        self.updateRoutes(changed)
+
+    def linkDecreased(self, origin, address, cost, changed):
+        '''
+            The cost of the link origin -> address went down (or the link is new)
+        '''
+        if origin not in self.dist or self.dist[origin] + cost >= self.dist.get(address, float('inf')):
+            self.spfSkipped += 1
+            return
+        self.spfUpdates += 1
+        self.dist[address] = self.dist[origin] + cost
+        self.parent[address] = origin
+        self.relax([(self.dist[address], address)], changed)
+
+    def linkIncreased(self, origin, address, changed):
+        '''
+            The cost of the link origin -> address went up (or the link is gone)
+        '''
+        if self.parent.get(address) != origin:
+            self.spfSkipped += 1
+            return
+        self.spfUpdates += 1
+        children = {}
+        for node, before in self.parent.items():
+            children.setdefault(before, []).append(node)
+        detached = [address]
+        for node in detached:
+            detached.extend(children.get(node, []))
+        for node in detached:
+            del self.dist[node]
+            del self.parent[node]
+        changed.update(detached)
+
+        heap = []
+        for node in detached:
+            for before in self.inEdges.get(node, ()):
+                if before in self.dist:
+                    cost = self.dist[before] + self.lsdb[before][1][node]
+                    if cost < self.dist.get(node, float('inf')):
+                        self.dist[node] = cost
+                        self.parent[node] = before
+            if node in self.dist:
+                heapq.heappush(heap, (self.dist[node], node))
+        self.relax(heap, changed)
+
+    def relax(self, heap, changed):
+        '''
+            Dijkstra from the nodes in heap, over the nodes whose path gets shorter
+        '''
+        dist = self.dist
+        while heap:
+            cost, node = heapq.heappop(heap)
+            if cost > dist[node]:
+                continue
+            changed.add(node)
+            if node not in self.lsdb:
+                # hosts do not advertise links, they are never crossed
+                continue
+            for other, linkCost in self.lsdb[node][1].items():
+                newCost = cost + linkCost
+                if newCost < dist.get(other, float('inf')):
+                    dist[other] = newCost
+                    self.parent[other] = node
+                    heapq.heappush(heap, (newCost, other))
+
+    def updateRoutes(self, changed):
+        '''
+            Write the new paths of the changed destinations into the routing table
+        '''
+        firstHop = {}
+        for address in changed:
+            if address == self.address:
+                continue
+            if address not in self.dist:
+                # no path left: infinite cost, as the distance-vector routers do
+                if address in self.rt and self.rt[address][0] != float('inf'):
+                    self.setRoute(address, (float('inf'), self.rt[address][1]))
+                continue
+            path = []
+            node = address
+            while node not in firstHop and self.parent[node] != self.address:
+                path.append(node)
+                node = self.parent[node]
+            hop = firstHop.get(node, node)
+            for node in path:
+                firstHop[node] = hop
+            firstHop[address] = hop
+            self.setRoute(address, (self.dist[address], hop))
@@ -3,10 +3,32 @@ from errors import *
 from events import *
 from element import *
 from engine import *
+from routing import ROUTING_MODES, install_static_routes
+from addressing import parse_prefix
+from tracing import tracer, TRACE_INFO
 
+import aqm
 import tcp_fast
 import tcp_reno
 
+'''
+    TCP algorithms which can be used by the flows
+'''
+TCP_VARIANTS = {
+    'fast': tcp_fast.TcpFast,
+    'reno': tcp_reno.TcpReno,
+}
+
+'''
+    Queue disciplines which can be used by the buffers of a link, None is drop-tail
+'''
+AQM_VARIANTS = {
+    'droptail': None,
+    'red': aqm.Red,
+    'codel': aqm.CoDel,
+    'pie': aqm.Pie,
+}
+
 
 class parse:
     '''
@@ -18,14 +40,41 @@ class parse:
             links: all links to be set up
             flows: all flows to be set up
             engine: the engine associated with the parse
+            tcp: name of the TCP algorithm used by all flows (key of TCP_VARIANTS)
+            link_overrides: link attributes replacing the ones of the .txt file, in the same units.
+                            key: link ID, or '*' for all links, value: {attribute: value}
+                            e.g. {'*': {'buffer': 32}, 'L1': {'rate': 5, 'delay': 20, 'duplex': 'full', 'aqm': 'codel'}}
+            routing: routing mode (key of ROUTING_MODES in routing.py), 'dynamic' runs the
+                     distance-vector protocol of the routers, 'link_state' the link-state
+                     protocol, the static modes install shortest paths at t = 0 and send
+                     no routing packets
+            damping: link cost damping of the routers, keyword arguments of Router.setDamping,
+                     e.g. {'alpha': 0.25, 'blend': 0.5, 'hysteresis': 0.1, 'switch': 0.1}.
+                     None (the default) keeps the raw measured delays
+            ecmp: cost tolerance of equal-cost multipath (e.g. 0 for equal costs only, 0.1 for
+                  paths within 10% of the best), None (the default) for single path routing.
+                  Only the static modes and 'dv_delta' support it
     '''
-    def __init__(self, engine, case):
+    def __init__(self, engine, case, tcp = 'fast', link_overrides = None, routing = 'dynamic', damping = None,
+                 ecmp = None):
         self.hosts = {}
         self.routers = {}
         self.links = {}
         self.flows = {}
         self.engine = engine
+        self.tcp = tcp
+        self.link_overrides = link_overrides or {}
+        if routing not in ROUTING_MODES:
+            raise ValueError('unknown routing mode ' + routing)
+        self.routing = routing
+        self.damping = damping
+        routerClass, metric = ROUTING_MODES[routing]
+        if ecmp is not None and metric is None and not routerClass.multipathCapable:
+            raise ValueError('routing mode ' + routing + ' does not support ECMP')
+        self.ecmp = ecmp
         self.readCase(case)
+        if metric is not None:
+            install_static_routes(self, metric, ecmp)
         engine.parse = self
         
     
@@ -39,24 +88,35 @@ class parse:
         '''
         new_host = Host(engine = self.engine, name = name, address = IP_address)
         self.hosts[name] = new_host
-        print "Host " + name + " at " + IP_address + " has been made"
+        if tracer.enabled:
+            tracer.log('parse', TRACE_INFO, 0, 'host_made', host = name, address = IP_address)
 
         
-    def make_router(self, name, IP_address):
+    def make_router(self, name, IP_address, subnets = ()):
         '''
             Set up a router
             
             Args:
                 name: host name
                 IP_address: host IP address
+                subnets: prefixes owned by the router, e.g. ['10.2.0.0/24']
         '''
-        new_router = Router(engine = self.engine, name = name, address = IP_address, updateTime=ROUTER_PACKET_GENERATION_INTERVAL)
+        routerClass, metric = ROUTING_MODES[self.routing]
+        new_router = routerClass(engine = self.engine, name = name, address = IP_address, updateTime=ROUTER_PACKET_GENERATION_INTERVAL)
+        if self.damping:
+            new_router.setDamping(**self.damping)
+        new_router.ecmp = self.ecmp
+        for prefix in subnets:
+            new_router.addSubnet(prefix)
         self.routers[name] = new_router
-        self.engine.push_event(Event(0, new_router, EVENT_ROUTINGTABLE_UPDATE))
-        print "Router " + name + " at " + IP_address + " has been made"
+        # static routes are installed after parsing, the routers send no routing packets
+        if metric is None:
+            self.engine.push_event(Event(0, new_router, EVENT_ROUTINGTABLE_UPDATE, background = True))
+        if tracer.enabled:
+            tracer.log('parse', TRACE_INFO, 0, 'router_made', router = name, address = IP_address)
 
      
-    def make_link(self, name, node1, node2, rate, delay, buffer_size):
+    def make_link(self, name, node1, node2, rate, delay, buffer_size, duplex = 'half', aqm = 'droptail'):
         '''
             Set up a link
             
@@ -67,14 +127,19 @@ class parse:
                 rate: link rate
                 delay: link delay
                 buffer_size: size of the buffer associated with the link (two buffers with equal size)
+                duplex: 'half' (one transmitter shared by both directions) or 'full'
+                aqm: queue discipline of the buffers (key of AQM_VARIANTS)
         '''
         new_link = Link(engine = self.engine, name = name, node1 = node1, node2 = node2,
-                        rate = rate, delay = delay, buffer_size = buffer_size)
+                        rate = rate, delay = delay, buffer_size = buffer_size, duplex = duplex,
+                        aqm = AQM_VARIANTS[aqm])
         self.links[name] = new_link
-        print "Link " + name + " at " + node1.name + " and " + node2.name + " has been made"
+        if tracer.enabled:
+            tracer.log('parse', TRACE_INFO, 0, 'link_made', link = name, node1 = node1.name, node2 = node2.name,
+                       duplex = duplex, aqm = aqm)
 
           
-    def make_flow(self, name, source, destination, data_amount, start_time):
+    def make_flow(self, name, source, destination, data_amount, start_time, path = None):
         '''
             Set up a flow
             
@@ -84,12 +149,17 @@ class parse:
                 destination: the destination node
                 data_amount: amount of packets to be transmitted
                 start_time: time of Flow_Start
+                path: routers the flow is pinned to (see Flow.setPath), None to route it
         '''
         new_flow = Flow(engine = self.engine, name = name, source = source, destination = destination,
-                        amount = data_amount, start_time = start_time, tcp = tcp_fast.TcpFast())
+                        amount = data_amount, start_time = start_time, tcp = TCP_VARIANTS[self.tcp]())
+        if path:
+            new_flow.setPath(path)
         self.flows[name] = new_flow
         self.engine.push_event(Event(new_flow.start_time, new_flow, EVENT_FLOW_START))
-        print "Flow " + name + " from " + source.name + " to " + destination.name + " has been made"
+        if tracer.enabled:
+            tracer.log('parse', TRACE_INFO, 0, 'flow_made', flow = name, source = source.name,
+                       destination = destination.name)
         
     def readCase(self, testcase):
         '''
@@ -107,11 +177,18 @@ class parse:
             routerAttributes = ['IP']
             flowAttributes = ['src', 'dst', 'data_amt', 'start']
             linkAttributes = ['rate', 'delay', 'buffer', 'node1', 'node2']
+            # optional attributes and their default values
+            linkOptions = {'duplex': 'half', 'aqm': 'droptail'}
             
             hostPara = {key: '' for key in hostAttributes}
             routerPara = {key: '' for key in routerAttributes}
+            # optional, one line per subnet of the router
+            routerSubnets = []
             flowPara = {key: '' for key in flowAttributes}
+            # optional, router IDs of the path the flow is pinned to
+            flowPath = []
             linkPara = {key: '' for key in linkAttributes}
+            linkPara.update(linkOptions)
             
             for line in testcaseFile:
                 lineNum += 1
@@ -153,7 +230,14 @@ class parse:
                                                   objectType = objectType,
                                                   objectID = objectID,
                                                   missingPara = key)
-                        self.make_router(name = objectID, IP_address = routerPara['IP'])
+                        for prefix in routerSubnets:
+                            try:
+                                parse_prefix(prefix)
+                            except ValueError:
+                                raise unknownKeyword(lineNum = lineNum,
+                                                     message = 'invalid subnet ' + prefix)
+                        self.make_router(name = objectID, IP_address = routerPara['IP'], subnets = routerSubnets)
+                        routerSubnets = []
                         
                     elif objectType == 'Link':
                         for key in linkAttributes:
@@ -162,6 +246,19 @@ class parse:
                                                   objectType = objectType,
                                                   objectID = objectID,
                                                   missingPara = key)
+                        # apply the overrides given for all links, then the ones of this link
+                        for overrides in [self.link_overrides.get('*', {}), self.link_overrides.get(objectID, {})]:
+                            for key, value in overrides.items():
+                                if key not in linkAttributes and key not in linkOptions:
+                                    raise unknownKeyword(lineNum = lineNum,
+                                                         message = 'invalid link override ' + key)
+                                linkPara[key] = str(value)
+                        if linkPara['duplex'] not in ['half', 'full']:
+                            raise unknownKeyword(lineNum = lineNum,
+                                                 message = 'invalid duplex mode ' + linkPara['duplex'])
+                        if linkPara['aqm'] not in AQM_VARIANTS:
+                            raise unknownKeyword(lineNum = lineNum,
+                                                 message = 'invalid aqm ' + linkPara['aqm'])
                         # make sure that the link connects two valid hosts/routers
                         if linkPara['node1'] in self.hosts:
                             n1 = self.hosts[linkPara['node1']]
@@ -184,7 +281,11 @@ class parse:
                                        node2 = n2,
                                        rate = 1.0* 1024 * 1024 * float(linkPara['rate'] )/ 8,
                                        delay = 0.001 * float(linkPara['delay']),
-                                       buffer_size = 1024 * int(linkPara['buffer']))
+                                       buffer_size = 1024 * int(linkPara['buffer']),
+                                       duplex = linkPara['duplex'],
+                                       aqm = linkPara['aqm'])
+                        # optional attributes are not inherited by the next link
+                        linkPara.update(linkOptions)
                          
                     elif objectType == 'Flow':  
                         for key in flowAttributes:
@@ -195,11 +296,23 @@ class parse:
                                                   missingPara = key)
                         # make sure that the source host and destination host are valid
                         if flowPara['src'] in self.hosts and flowPara['dst'] in self.hosts:
-                            self.make_flow(name = objectID, 
-                                           source = self.hosts[flowPara['src']],
-                                           destination = self.hosts[flowPara['dst']],
-                                           data_amount = 1024 * int(flowPara['data_amt']),
-                                           start_time = float(flowPara['start']))             
+                            for router in flowPath:
+                                if router not in self.routers:
+                                    raise unknownObject(lineNum = lineNum,
+                                                        message = 'unknown router ' + router)
+                            data_amount = 1024 * int(flowPara['data_amt'])
+                            start_time = float(flowPara['start'])
+                            try:
+                                self.make_flow(name = objectID, 
+                                               source = self.hosts[flowPara['src']],
+                                               destination = self.hosts[flowPara['dst']],
+                                               data_amount = data_amount,
+                                               start_time = start_time,
+                                               path = [self.routers[router] for router in flowPath])
+                            except ValueError as error:
+                                raise unknownObject(lineNum = lineNum, message = str(error))
+                            # the path is not inherited by the next flow
+                            flowPath = []
                         else:
                             raise  unknownObject(lineNum = lineNum, 
                                                  message = 'unknown host') 
@@ -215,9 +328,11 @@ class parse:
                 elif (objectType == 'Router'):
                     if keyword in routerAttributes:
                         routerPara[keyword] = line_content[1]
+                    elif keyword == 'subnet':
+                        routerSubnets.append(line_content[1])
                         
                 elif (objectType == 'Link'):
-                    if keyword in linkAttributes:
+                    if keyword in linkAttributes or keyword in linkOptions:
                         linkPara[keyword] = line_content[1]
                     elif keyword == 'connection':
                         linkPara['node1'] = line_content[1]
@@ -226,6 +341,8 @@ class parse:
                 elif (objectType == 'Flow'):
                     if keyword in flowAttributes:
                         flowPara[keyword] = line_content[1]
+                    elif keyword == 'path':
+                        flowPath = line_content[1:]
                         
                 else:
                     raise unknownKeyword(lineNum = lineNum, 
@@ -0,0 +1,329 @@
+'''
+    Conservative parallel discrete-event simulation (PDES)
+
+    The topology is split into logical processes (LPs). Every LP runs in its own OS
+    process with its own SimEngine and parses the whole testcase, but only executes
+    the events of the hosts, routers, links and flows it owns.
+    A packet sent over a link whose two ends are owned by different LPs is shipped
+    to the receiving LP as a message instead of a local PacketReceipt event.
+
+    Synchronization is window based: in every round the coordinator computes the
+    lower bound on the time stamp of any pending event or message (LBTS), and all
+    LPs execute their events earlier than LBTS + lookahead, where the lookahead is
+    the smallest propagation delay of the cut links. A packet sent in a window can
+    not arrive before the window ends, so no LP ever receives a message in its past.
+
+    Cut links must be full duplex: each end of a cut link only transmits its own
+    direction, so the half-duplex arbitration of the two directions can not be
+    simulated. run_partitioned refuses half-duplex cut links, unless it is allowed to
+    make them full duplex (force_full_duplex); it returns the link overrides it
+    applied, a sequential run to compare with must be given the same ones.
+
+    A packet crossing a cut link is a PacketReceipt event of the receiving process,
+    one crossing a local link is delivered by the wake up of its transmitter. Both
+    have the priority of a packet receipt and are ordered by the name of the
+    transmitter (Event.order), not by when they were pushed, so simultaneous events
+    are executed in the same order as in a sequential run. With any routing mode,
+    the recorded data then matches a sequential run with the same link overrides but:
+        - the tail at MAXTIME: a local link records the end of a transmission at its
+          next wake up, a cut link at the end of the transmission, so the last ones
+          are recorded only by the partitioned run. The events at MAXTIME itself,
+          which run() executes but a window does not, are missing
+        - the control bytes of a cut link are recorded per direction (L1a, L1b), the
+          sequential engine records them per link
+
+    Usage: python pdes.py testcase.txt maxtime workers [full_duplex]
+    'full_duplex' makes the half-duplex cut links full duplex.
+'''
+import matplotlib
+matplotlib.use('Agg')
+
+import multiprocessing
+import sys
+import time
+
+from constants import *
+from element import DataPacket, RouterPacket, Host, Router, Link, Transmitter, Flow
+from engine import SimEngine
+from events import Event
+from parse import parse
+import record
+
+
+def partition(parser, workers):
+    '''
+        Split the topology into at most `workers` groups of nodes
+        Routers are ordered by a breadth-first walk of the router graph and cut into
+        contiguous chunks, each host joins the group of the router it is attached to
+
+        Args:
+            parser: parse object holding the topology
+            workers: number of groups wanted
+
+        Return:
+            list of sets of node names
+    '''
+    neighbors = dict((name, []) for name in parser.routers)
+    for link in parser.links.values():
+        if isinstance(link.node1, Router) and isinstance(link.node2, Router):
+            neighbors[link.node1.name].append(link.node2.name)
+            neighbors[link.node2.name].append(link.node1.name)
+
+    order = []
+    for root in sorted(neighbors):
+        if root in order:
+            continue
+        walk = [root]
+        order.append(root)
+        while walk:
+            current = walk.pop(0)
+            for name in sorted(neighbors[current]):
+                if name not in order:
+                    order.append(name)
+                    walk.append(name)
+
+    groups = max(1, min(workers, len(order)))
+    chunk = (len(order) + groups - 1) / groups if order else 1
+    owner = {}
+    for i, name in enumerate(order):
+        owner[name] = i / chunk
+
+    for name, host in parser.hosts.items():
+        other = host.link.node2 if host.link.node1 == host else host.link.node1
+        owner[name] = owner.get(other.name, 0)
+
+    groups = max(owner.values()) + 1 if owner else 1
+    return [set(name for name in owner if owner[name] == i) for i in xrange(groups)]
+
+
+def cut_links(parser, groups):
+    '''
+        Get the links whose two ends belong to different groups
+    '''
+    owner = {}
+    for i, group in enumerate(groups):
+        for name in group:
+            owner[name] = i
+    return [link for link in parser.links.values() if owner[link.node1.name] != owner[link.node2.name]]
+
+
+def encode_packet(packet):
+    '''
+        Turn a packet into a picklable tuple, objects are replaced by their names
+    '''
+    if isinstance(packet, DataPacket):
+        return ('data', packet.source.name, packet.destination.name, packet.flow.name, packet.timestamp,
+                packet.packetsize, packet.acknowledgement, packet.pck_id,
+                getattr(packet, 'originalPacketTimestamp', None))
+    return ('router', packet.source.name, packet.timestamp, packet.packetsize, packet.routerTable, packet.type)
+
+
+def decode_packet(parser, message):
+    '''
+        Rebuild a packet from encode_packet output, using the local copies of the objects
+    '''
+    nodes = parser.nodes
+    if message[0] == 'data':
+        (_, source, destination, flow, timestamp, packetsize, acknowledgement, pck_id, original) = message
+        packet = DataPacket(nodes[source], nodes[destination], parser.flows[flow], timestamp,
+                            packetsize, acknowledgement, pck_id)
+        if original is not None:
+            packet.setOriginalPacketTimestamp(original)
+        return packet
+    (_, source, timestamp, packetsize, routerTable, type) = message
+    return RouterPacket(nodes[source], timestamp, packetsize, routerTable, type)
+
+
+
+class PartitionEngine(SimEngine):
+    '''
+        Engine of one logical process
+
+        Attributes:
+            local: names of the hosts and routers owned by this LP
+            outbox: messages for other LPs, (time, receiver name, encoded packet, event order)
+            filtering: while parsing, events of objects owned by other LPs are dropped
+    '''
+    def __init__(self, maxtime, local):
+        SimEngine.__init__(self, maxtime)
+        self.local = local
+        self.outbox = []
+        self.filtering = True
+
+    def isLocal(self, reactor):
+        '''
+            Check whether an event reactor is owned by this LP
+        '''
+        if isinstance(reactor, (Host, Router)):
+            return reactor.name in self.local
+        if isinstance(reactor, Transmitter):
+            reactor = reactor.link
+        if isinstance(reactor, Link):
+            return reactor.node1.name in self.local or reactor.node2.name in self.local
+        if isinstance(reactor, Flow):
+            return reactor.source.name in self.local
+        return True
+
+    def push_event(self, event):
+        '''
+            Push a local event, or ship a packet receipt of another LP to the outbox
+        '''
+        if event.type == EVENT_PACKET_RECEIPT and event.reactor.name not in self.local:
+            self.outbox.append((event.time, event.reactor.name, encode_packet(event.packet), event.order))
+            return
+        if self.filtering and not self.isLocal(event.reactor):
+            return
+        SimEngine.push_event(self, event)
+
+    def nextTime(self):
+        '''
+            Time of the next pending event, infinity if there is none
+        '''
+        event = self.peek_event()
+        return event.time if event is not None else float('inf')
+
+
+
+def worker(conn, case, maxtime, local, cuts, tcp, link_overrides, routing, damping, ecmp):
+    '''
+        Main loop of one logical process, driven by the coordinator through conn
+
+        Commands:
+            ('run', horizon, messages): deliver messages, run the window,
+                                        reply (outbox, next event time)
+            ('finish',): reply (recorded data, executed events)
+    '''
+    engine = PartitionEngine(maxtime, local)
+    parser = parse(engine, case, tcp = tcp, link_overrides = link_overrides, routing = routing, damping = damping,
+                   ecmp = ecmp)
+    parser.nodes = dict(parser.hosts)
+    parser.nodes.update(parser.routers)
+    # packets crossing a cut link must go through push_event to reach the outbox
+    for name in cuts:
+        parser.links[name].setPipelined(False)
+    engine.filtering = False
+    conn.send(engine.nextTime())
+
+    while True:
+        command = conn.recv()
+        if command[0] == 'run':
+            for (eventTime, receiver, message, order) in command[2]:
+                packet = decode_packet(parser, message)
+                engine.push_event(Event.CreateEventPacketReceipt(eventTime, parser.nodes[receiver], packet,
+                                                                 background = isinstance(packet, RouterPacket),
+                                                                 order = order))
+            engine.run_until(command[1])
+            conn.send((engine.outbox, engine.nextTime()))
+            engine.outbox = []
+        else:
+            category = engine.recorder.category
+            # both ends of a cut link record its control bytes, keep them apart as two directions
+            # (cut links are full duplex, their rate is already recorded per direction)
+            for name in cuts:
+                link = parser.links[name]
+                side = 'a' if link.node1.name in local else 'b'
+                if name in category[CATE_CONTROL_BYTES]:
+                    category[CATE_CONTROL_BYTES][name + side] = category[CATE_CONTROL_BYTES].pop(name)
+            conn.send((category, engine.executedEvents))
+            conn.close()
+            return
+
+
+def run_partitioned(case, maxtime, workers, tcp = 'fast', link_overrides = None, routing = 'dynamic',
+                    damping = None, ecmp = None, force_full_duplex = False):
+    '''
+        Run a testcase with one OS process per logical process
+
+        Args:
+            case: testcase .txt file
+            maxtime: maximum simulation time
+            workers: number of logical processes wanted
+            tcp, link_overrides, routing, damping, ecmp: same as parse
+            force_full_duplex: make the half-duplex cut links full duplex instead of refusing them
+
+        Return:
+            (recorder holding the merged data, stats {'workers', 'rounds', 'events', 'lookahead',
+             'link_overrides'}), link_overrides are the ones given plus duplex full for the cut links
+             which were half duplex
+    '''
+    parser = parse(SimEngine(maxtime), case, tcp = tcp, link_overrides = link_overrides, routing = routing,
+                   damping = damping, ecmp = ecmp)
+    groups = partition(parser, workers)
+    cuts = cut_links(parser, groups)
+    halfDuplex = sorted(link.name for link in cuts if link.duplex != 'full')
+    if halfDuplex:
+        if not force_full_duplex:
+            raise ValueError('half-duplex links cut between processes: ' + ', '.join(halfDuplex)
+                             + ' (make them full duplex, or pass force_full_duplex = True)')
+        link_overrides = dict((name, dict(values)) for name, values in (link_overrides or {}).items())
+        for name in halfDuplex:
+            link_overrides.setdefault(name, {})['duplex'] = 'full'
+    lookahead = min([link.propogationDelay for link in cuts] or [float('inf')])
+    if lookahead <= 0:
+        raise ValueError('cut links need a positive propagation delay')
+
+    owner = {}
+    for i, group in enumerate(groups):
+        for name in group:
+            owner[name] = i
+
+    conns = []
+    processes = []
+    for group in groups:
+        parentConn, childConn = multiprocessing.Pipe()
+        process = multiprocessing.Process(target = worker, args = (childConn, case, maxtime, group,
+                                                                   [link.name for link in cuts],
+                                                                   tcp, link_overrides, routing, damping,
+                                                                   ecmp))
+        process.start()
+        conns.append(parentConn)
+        processes.append(process)
+
+    nextTimes = [conn.recv() for conn in conns]
+    inbox = [[] for _ in groups]
+    rounds = 0
+    while True:
+        lbts = min(nextTimes + [message[0] for messages in inbox for message in messages])
+        if lbts >= maxtime:
+            break
+        rounds += 1
+        for i, conn in enumerate(conns):
+            conn.send(('run', lbts + lookahead, inbox[i]))
+        inbox = [[] for _ in groups]
+        for i, conn in enumerate(conns):
+            outbox, nextTimes[i] = conn.recv()
+            for message in outbox:
+                inbox[owner[message[1]]].append(message)
+
+    recorder = record.Record()
+    events = 0
+    for conn in conns:
+        conn.send(('finish',))
+        category, executed = conn.recv()
+        events += executed
+        for cate in category:
+            # every series is recorded by the LP owning its object, never by two of them
+            both = set(recorder.category[cate]) & set(category[cate])
+            if both:
+                raise RuntimeError('{} recorded by two processes: {}'.format(cate, ', '.join(sorted(both))))
+            recorder.category[cate].update(category[cate])
+    for process in processes:
+        process.join()
+
+    return recorder, {'workers': len(groups), 'rounds': rounds, 'events': events, 'lookahead': lookahead,
+                      'link_overrides': link_overrides}
+
+
+def main():
+    if len(sys.argv) < 4:
+        print 'Usage: python pdes.py testcase.txt maxtime workers [full_duplex]'
+        return
+    start = time.time()
+    recorder, stats = run_partitioned(sys.argv[1], float(sys.argv[2]), int(sys.argv[3]),
+                                      force_full_duplex = 'full_duplex' in sys.argv[4:])
+    stats['wall'] = time.time() - start
+    print stats
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+'''
+    Engine profiler: per event type and per reactor cost accounting
+
+    Attach it to an engine before running:
+        profiler = EngineProfiler(engine)
+        engine.run()
+        profiler.summary()
+        profiler.export('profile.json')
+    The profiler replaces engine.execute_top on that engine only, so an engine without
+    profiler runs the plain SimEngine code. It is not kept in checkpoints.
+
+    Usage: python profiler.py testcase.txt maxtime [profile.json]
+'''
+import matplotlib
+matplotlib.use('Agg')
+
+import json
+import sys
+from timeit import default_timer
+
+from constants import *
+
+
+class EngineProfiler(object):
+    '''
+        Count and time every event executed by an engine
+
+        Attributes:
+            engine: the engine profiled
+            byType: event type (opcode) -> [count, wall time]
+            byReactor: (reactor class, reactor name) -> [count, wall time]
+                       The packets delivered by the wake up of a pipelined transmitter are counted
+                       as packet receipts of their receivers, as without pipelining
+            delivered: wall time of the deliveries made by the event being executed
+            peakQueue: largest number of pending events seen
+            sumQueue: sum of the number of pending events over all executed events
+            timeouts: PacketTimeOut events executed (the time outs replaced are cancelled, see 'cancelled')
+            events: number of events executed since attached
+            wall: wall time spent executing them (profiler bookkeeping excluded)
+    '''
+    def __init__(self, engine):
+        self.engine = engine
+        self.byType = {}
+        self.byReactor = {}
+        self.peakQueue = 0
+        self.sumQueue = 0
+        self.events = 0
+        self.timeouts = 0
+        self.wall = 0.0
+        self.delivered = 0.0
+        self.startPushed = engine.pushedEvents
+        self.startExecuted = engine.executedEvents
+        self.startSimTime = engine.getCurrentTime()
+        self.original = engine.execute_top
+        engine.execute_top = self.execute_top
+        engine.profiler = self
+
+    def detach(self):
+        '''
+            Give back the plain execute_top to the engine
+        '''
+        del self.engine.execute_top
+        self.engine.profiler = None
+
+    def execute_top(self):
+        '''
+            Replacement of engine.execute_top: account for the top event, then execute it
+        '''
+        engine = self.engine
+        pending = engine.pendingEvents()
+        event = engine.peek_event()
+        eventType = event.type
+        reactor = event.reactor
+
+        if eventType == EVENT_PACKET_TIMEOUT:
+            self.timeouts += 1
+
+        self.delivered = 0.0
+        start = default_timer()
+        self.original()
+        cost = default_timer() - start
+
+        self.events += 1
+        self.wall += cost
+        self.sumQueue += pending
+        if pending > self.peakQueue:
+            self.peakQueue = pending
+        self.charge(eventType, reactor, cost - self.delivered)
+
+    def deliver(self, receiver, packet):
+        '''
+            Deliver a packet on behalf of a pipelined transmitter, charging the receipt to the receiver
+
+            Args:
+                receiver: element receiving the packet
+                packet: the packet delivered
+        '''
+        start = default_timer()
+        receiver.receive(packet)
+        cost = default_timer() - start
+        self.delivered += cost
+        self.charge(EVENT_PACKET_RECEIPT, receiver, cost)
+
+    def charge(self, eventType, reactor, cost):
+        '''
+            Add one execution of cost seconds to the event type and to the reactor
+        '''
+        stat = self.byType.get(eventType)
+        if stat is None:
+            stat = self.byType[eventType] = [0, 0.0]
+        stat[0] += 1
+        stat[1] += cost
+
+        key = (reactor.__class__.__name__, getattr(reactor, 'name', None) or '')
+        stat = self.byReactor.get(key)
+        if stat is None:
+            stat = self.byReactor[key] = [0, 0.0]
+        stat[0] += 1
+        stat[1] += cost
+
+    def report(self):
+        '''
+            Collect the profile into a dict (the content of the JSON export)
+        '''
+        engine = self.engine
+        simTime = engine.getCurrentTime() - self.startSimTime
+        pushed = engine.pushedEvents - self.startPushed
+        return {
+            'events': self.events,
+            'wall': self.wall,
+            'events_per_sec': self.events / self.wall if self.wall else 0,
+            'sim_time': simTime,
+            'sim_to_wall': simTime / self.wall if self.wall else 0,
+            'peak_queue': self.peakQueue,
+            'avg_queue': 1.0 * self.sumQueue / self.events if self.events else 0,
+            'timeouts': self.timeouts,
+            # pushed events which were neither executed nor are still pending
+            'cancelled': pushed - (engine.executedEvents - self.startExecuted) - engine.pendingEvents(),
+            'by_type': dict((EVENT_NAMES[t], {'count': c, 'wall': w}) for t, (c, w) in self.byType.items()),
+            'by_reactor': dict(('%s %s' % key, {'count': c, 'wall': w}) for key, (c, w) in self.byReactor.items()),
+        }
+
+    def summary(self):
+        '''
+            Print the profile as tables, most expensive entries first
+        '''
+        report = self.report()
+        print 'events: {}  wall: {:.2f}s  events/s: {:.0f}  sim/wall: {:.3f}'.format(
+            report['events'], report['wall'], report['events_per_sec'], report['sim_to_wall'])
+        print 'queue: peak {}  avg {:.1f}  cancelled {}'.format(
+            report['peak_queue'], report['avg_queue'], report['cancelled'])
+        print 'time_out: executed {}'.format(report['timeouts'])
+        for title, table in [('event type', report['by_type']), ('reactor', report['by_reactor'])]:
+            print
+            print '{:<32}{:>10}{:>10}{:>8}{:>10}'.format(title, 'count', 'wall/s', '%', 'us/event')
+            for name, stat in sorted(table.items(), key = lambda item: -item[1]['wall']):
+                print '{:<32}{:>10}{:>10.3f}{:>8.1f}{:>10.1f}'.format(
+                    name, stat['count'], stat['wall'], 100.0 * stat['wall'] / report['wall'],
+                    1e6 * stat['wall'] / stat['count'])
+
+    def export(self, file_name):
+        '''
+            Save the profile into a .json file
+        '''
+        with open(file_name, 'w') as profileFile:
+            json.dump(self.report(), profileFile, indent = 2, sort_keys = True)
+
+
+
+def main():
+    if len(sys.argv) < 3:
+        print 'Usage: python profiler.py testcase.txt maxtime [profile.json]'
+        return
+    from engine import SimEngine
+    from parse import parse
+
+    engine = SimEngine(float(sys.argv[2]))
+    parse(engine, sys.argv[1])
+    profiler = EngineProfiler(engine)
+    engine.run()
+    profiler.summary()
+    if len(sys.argv) > 3:
+        profiler.export(sys.argv[3])
+
+
+if __name__ == '__main__':
+    main()
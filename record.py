@@ -30,10 +30,18 @@ class Record(object):
             CATE_RTT: ('Time / s', 'RTT / s'),
             CATE_STATE : ('Time / s', 'State'),
             CATE_DUP_TIMES : ('Time / s', 'Duplicate Times'),
-            CATE_TIMEOUT : ('Time / s', 'Packet Time Out / s') 
+            CATE_TIMEOUT : ('Time / s', 'Packet Time Out / s'),
+            CATE_CONTROL_BYTES : ('Time / s', 'Control Bytes / bytes')
               
         }
-        #set up smooth function for each plot. Flow_rate and packet_loss use different smooth function from others
+        self.setupSmooth()
+        for cate in CATE_ALL:
+            self.category[cate] = {}
+
+    def setupSmooth(self):
+        '''
+            Set up smooth function for each plot. Flow_rate and packet_loss use different smooth function from others
+        '''
         self.unit_smooth = {
             CATE_LINK_RATE: self.smooth,
             CATE_PACKET_LOSS: self.smooth1, 
@@ -47,10 +55,21 @@ class Record(object):
             CATE_RTT: self.smooth,
             CATE_STATE : self.smooth,
             CATE_DUP_TIMES : self.smooth,
-            CATE_TIMEOUT: self.smooth
+            CATE_TIMEOUT: self.smooth,
+            CATE_CONTROL_BYTES: self.smooth1
         }
-        for cate in CATE_ALL:
-            self.category[cate] = {}
+
+    def __getstate__(self):
+        '''
+            Used by pickle (engine checkpoint), bound methods in unit_smooth can not be pickled
+        '''
+        state = dict(self.__dict__)
+        del state['unit_smooth']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.setupSmooth()
 
     def recordEvent(self, cate, element, time, value):
         '''
@@ -152,6 +171,19 @@ class Record(object):
     def record_timeout(self, element, time, tempTimeOut): 
         self.record(CATE_TIMEOUT, element, time, tempTimeOut) 
 
+
+    def record_control_bytes(self, element, time, size):
+        '''
+            Control bytes are summed per CONTROL_BYTES_INTERVAL: one sample per link and
+            interval, at the start of the interval, instead of one per routing packet
+        '''
+        start = int(time / CONTROL_BYTES_INTERVAL) * CONTROL_BYTES_INTERVAL
+        content = self.category[CATE_CONTROL_BYTES].get(element.name)
+        if content is not None and len(content) > 1 and content[-1][0] == start:
+            content[-1] = (start, content[-1][1] + size)
+        else:
+            self.recordEvent(CATE_CONTROL_BYTES, element, start, size)
+
     
     '''
         All the followings are several plot method based on matplotlib
@@ -217,6 +249,8 @@ class Record(object):
     
 
     def smooth2(self, preSmooth):
+        if not preSmooth:
+            return []
         gamma = 0.25; smooth = []; smooth.append(preSmooth[0])
         pre = preSmooth[0][1]
         for i in range(1,len(preSmooth)):
@@ -0,0 +1,271 @@
+'''
+    Routing computed from the parsed topology
+
+    In the default 'dynamic' mode, routers learn their routes with the distance-vector
+    protocol of element.Router: they flood RouterPackets every few seconds and data is
+    forwarded correctly only once the tables have converged. The 'link_state' mode
+    uses the link-state protocol of linkstate.py instead, the 'dv_delta' mode the
+    distance-vector protocol with delta updates of distancevector.py.
+    The static modes compute all-pairs shortest paths with Dijkstra at t = 0 and
+    install them into the routing tables; no RouterPacket is ever sent:
+        'static':       cost of a link is its propagation plus transmission delay (s)
+        'static_hops':  cost of a link is 1
+    Hosts are endpoints: paths never go through a host.
+
+    A mode is selected per run with parse(engine, case, routing = 'static').
+
+    With equal-cost multipath (parse(..., ecmp = tolerance)), a router keeps every next
+    hop whose path is within tolerance (a fraction) of the best one, and which is
+    closer to the destination than the router itself, so that paths have no loop.
+    The static modes and 'dv_delta' support it.
+
+    Routers owning subnets (CIDR, "subnet" in the testcase) are reached through their
+    prefix: the other routers hold one route per prefix instead of one per address.
+    The distance-vector modes and the static modes aggregate, 'link_state' does not.
+
+    A flow can also be pinned to a path ("path R1 R3 R4" in its Flow section, see
+    Flow.setPath): the routers forward its packets on that path in any mode, without
+    looking at their routing tables.
+'''
+import heapq
+
+from addressing import PrefixTrie
+from constants import *
+from distancevector import DeltaVectorRouter
+from element import Router
+from linkstate import LinkStateRouter
+
+
+'''
+    Routing modes: name -> (class of the routers, link metric of the static modes or None)
+'''
+ROUTING_MODES = {
+    'dynamic': (Router, None),
+    'link_state': (LinkStateRouter, None),
+    'dv_delta': (DeltaVectorRouter, None),
+    'static': (Router, 'delay'),
+    'static_hops': (Router, 'hops'),
+}
+
+
+def link_cost(link, metric = 'delay'):
+    '''
+        Cost of a link for the shortest paths
+
+        Args:
+            link: the link
+            metric: 'delay' (propagation plus transmission of a Data Packet, in s) or 'hops'
+    '''
+    if metric == 'hops':
+        return 1
+    return link.propogationDelay + 1.0 * PACKET_SIZE / link.rate
+
+
+def topology_graph(parser, metric = 'delay'):
+    '''
+        Build the graph of the topology
+
+        Return:
+            adjacency: node name -> list of (neighbor name, cost, link)
+    '''
+    adjacency = dict((name, []) for name in parser.hosts)
+    adjacency.update((name, []) for name in parser.routers)
+    for name in sorted(parser.links):
+        link = parser.links[name]
+        cost = link_cost(link, metric)
+        adjacency[link.node1.name].append((link.node2.name, cost, link))
+        adjacency[link.node2.name].append((link.node1.name, cost, link))
+    return adjacency
+
+
+def dijkstra(adjacency, source, transit = None):
+    '''
+        Shortest paths from a node
+
+        Args:
+            adjacency: graph of topology_graph
+            source: name of the source node
+            transit: names of the nodes which paths can go through, all of them if None
+                     (the source is always left)
+
+        Return:
+            (costs, previous)
+            costs: node name -> cost of the shortest path
+            previous: node name -> (previous node name, link) on the shortest path
+    '''
+    costs = {source: 0}
+    previous = {}
+    done = set()
+    heap = [(0, source)]
+    while heap:
+        cost, name = heapq.heappop(heap)
+        if name in done:
+            continue
+        done.add(name)
+        if name != source and transit is not None and name not in transit:
+            continue
+        for neighbor, linkCost, link in adjacency[name]:
+            newCost = cost + linkCost
+            if newCost < costs.get(neighbor, float('inf')):
+                costs[neighbor] = newCost
+                previous[neighbor] = (name, link)
+                heapq.heappush(heap, (newCost, neighbor))
+    return costs, previous
+
+
+def shortest_path(previous, source, destination):
+    '''
+        Path from source to destination found by dijkstra
+
+        Return:
+            list of (node name, link to it) from the first hop to destination,
+            None if destination can not be reached
+    '''
+    if destination != source and destination not in previous:
+        return None
+    path = []
+    name = destination
+    while name != source:
+        before, link = previous[name]
+        path.append((name, link))
+        name = before
+    path.reverse()
+    return path
+
+
+def static_tables(parser, metric = 'delay'):
+    '''
+        Compute the routing table of every router
+
+        Return:
+            router name -> {destination address: (cost, next hop address)}
+    '''
+    nodes = dict(parser.hosts)
+    nodes.update(parser.routers)
+    adjacency = topology_graph(parser, metric)
+    transit = set(parser.routers)
+    tables = {}
+    for name, router in parser.routers.items():
+        costs, previous = dijkstra(adjacency, name, transit)
+        table = {router.address: (0, router.address)}
+        for destination, cost in costs.items():
+            if destination == name:
+                continue
+            nextHop = shortest_path(previous, name, destination)[0][0]
+            table[nodes[destination].address] = (cost, nodes[nextHop].address)
+        tables[name] = table
+    return tables
+
+
+def flow_paths(parser, metric = 'delay'):
+    '''
+        Path the static routes give to every flow, e.g. to pin the flows to it (Flow.setPath)
+
+        Return:
+            flow name -> list of the router names from the source to the destination,
+            for the flows whose destination can be reached
+    '''
+    tables = static_tables(parser, metric)
+    names = dict((node.address, name) for name, node in parser.hosts.items())
+    names.update((router.address, name) for name, router in parser.routers.items())
+    paths = {}
+    for name, flow in parser.flows.items():
+        link = flow.source.link
+        node = link.node2 if link.node1 is flow.source else link.node1
+        path = []
+        while node.name in tables and len(path) <= len(tables):
+            path.append(node.name)
+            route = tables[node.name].get(flow.destination.address)
+            if route is None:
+                break
+            node = parser.routers.get(names[route[1]]) or parser.hosts[names[route[1]]]
+        if node is flow.destination:
+            paths[name] = path
+    return paths
+
+
+def static_multipaths(parser, metric = 'delay', tolerance = 0.0):
+    '''
+        Compute the equal-cost next hops of every router
+
+        Args:
+            tolerance: a next hop is kept if its path costs at most (1 + tolerance) times the best one
+
+        Return:
+            router name -> {destination address: list of next hop addresses}
+    '''
+    nodes = dict(parser.hosts)
+    nodes.update(parser.routers)
+    adjacency = topology_graph(parser, metric)
+    transit = set(parser.routers)
+    costs = dict((name, dijkstra(adjacency, name, transit)[0]) for name in parser.routers)
+    tables = {}
+    for name in parser.routers:
+        table = {}
+        for destination, best in costs[name].items():
+            if destination == name:
+                continue
+            nextHops = []
+            for neighbor, linkCost, link in adjacency[name]:
+                if neighbor == destination:
+                    remaining = 0
+                elif neighbor in transit and destination in costs[neighbor]:
+                    remaining = costs[neighbor][destination]
+                else:
+                    continue
+                # only neighbors closer to the destination, with a margin for rounding
+                if remaining < best * (1 - 1e-9) and linkCost + remaining <= best * (1 + tolerance) * (1 + 1e-9):
+                    nextHops.append(nodes[neighbor].address)
+            table[nodes[destination].address] = nextHops
+        tables[name] = table
+    return tables
+
+
+def aggregate_tables(parser, tables):
+    '''
+        Replace the destinations covered by a subnet of another router by the subnet,
+        the route to a subnet is the route to its router
+
+        Args:
+            tables: router name -> {destination address: route}, of static_tables or static_multipaths
+
+        Return:
+            the tables aggregated, the same ones if no router has subnets
+    '''
+    owners = {}
+    trie = PrefixTrie()
+    for router in parser.routers.values():
+        for prefix in router.subnets:
+            owners[prefix] = router
+            trie.insert(prefix)
+    if not owners:
+        return tables
+    aggregated = {}
+    for name, table in tables.items():
+        router = parser.routers[name]
+        result = {}
+        for destAddr, route in table.items():
+            prefix = trie.lookup(destAddr)
+            if prefix is None or owners[prefix] is router:
+                result[destAddr] = route
+            elif owners[prefix].address in table:
+                result[prefix] = table[owners[prefix].address]
+        aggregated[name] = result
+    return aggregated
+
+
+def install_static_routes(parser, metric = 'delay', ecmp = None):
+    '''
+        Install the shortest paths into the routing tables of the routers,
+        and the equal-cost next hops if ecmp (a cost tolerance) is not None
+    '''
+    for name, table in aggregate_tables(parser, static_tables(parser, metric)).items():
+        router = parser.routers[name]
+        for destAddr, value in table.items():
+            router.setRoute(destAddr, value)
+    if ecmp is None:
+        return
+    for name, table in aggregate_tables(parser, static_multipaths(parser, metric, ecmp)).items():
+        router = parser.routers[name]
+        for destAddr, nextHops in table.items():
+            router.setMultipath(destAddr, nextHops)
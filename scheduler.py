@@ -0,0 +1,204 @@
+'''
+    Event Schedulers (pending event sets used by SimEngine)
+'''
+
+import bisect
+import heapq
+
+
+class HeapScheduler(object):
+    '''
+        Binary heap of pending events, O(log n) push and pop.
+        This is the original SimEngine queue and the default backend.
+
+        Attributes:
+            heap: list of (event.time, event.priority, event.order, event.seq, event) kept in heap order
+    '''
+    def __init__(self):
+        self.heap = []
+
+    def __len__(self):
+        return len(self.heap)
+
+    def push(self, event):
+        '''
+            Push (event.time, event.priority, event.order, event.seq, event), so that it will be
+            ordered by event.time, ties broken by priority, order then insertion order
+
+            Args:
+                event: the event to be scheduled
+        '''
+        heapq.heappush(self.heap, (event.time, event.priority, event.order, event.seq, event))
+
+    def pop(self):
+        '''
+            Pop the event with the nearest time stamp
+        '''
+        return heapq.heappop(self.heap)[4]
+
+    def peek(self):
+        '''
+            Get the event with the nearest time stamp without removing it
+        '''
+        return self.heap[0][4]
+
+    def discard_cancelled(self):
+        '''
+            Drop all cancelled events and restore the heap order
+        '''
+        self.heap = [entry for entry in self.heap if not entry[4].cancelled]
+        heapq.heapify(self.heap)
+
+
+
+class CalendarScheduler(object):
+    '''
+        Calendar queue (R. Brown, 1988), amortized O(1) push and pop.
+
+        Time is cut into buckets of equal width, and a "year" of nbuckets buckets is
+        mapped onto a circular array, each slot holding a short sorted list.
+        Popping walks the array from the current bucket and takes the first entry
+        that falls into the current year. The array is resized (and the bucket width
+        re-estimated from the pending events) whenever the queue doubles or halves.
+
+        Attributes:
+            buckets: circular array of sorted lists of (event.time, event.priority, event.order, event.seq, event)
+            width: time span covered by one bucket
+            vbucket: virtual index of the current bucket, i.e. int(time / width)
+            size: number of pending events
+    '''
+    # number of events sampled to estimate the bucket width on resize
+    SAMPLE_SIZE = 25
+
+    def __init__(self, nbuckets = 2, width = 1.0):
+        self.size = 0
+        self.lastTime = 0.0
+        self._setup(nbuckets, width, [])
+
+    def __len__(self):
+        return self.size
+
+    def _setup(self, nbuckets, width, entries):
+        '''
+            (Re)build the bucket array and reinsert pending entries
+
+            Args:
+                nbuckets: number of buckets
+                width: time span of one bucket
+                entries: pending entries to be reinserted
+        '''
+        self.nbuckets = nbuckets
+        self.width = width
+        self.buckets = [[] for _ in xrange(nbuckets)]
+        self.vbucket = int(self.lastTime / width)
+        self.topThreshold = 2 * nbuckets
+        self.bottomThreshold = nbuckets / 2 - 2
+        for entry in entries:
+            bisect.insort(self.buckets[int(entry[0] / width) % nbuckets], entry)
+
+    def _resize(self, nbuckets):
+        '''
+            Resize the bucket array, bucket width = 3 * average gap between the
+            earliest pending events (gaps far above the average are ignored)
+
+            Args:
+                nbuckets: new number of buckets
+        '''
+        entries = [entry for bucket in self.buckets for entry in bucket]
+        sample = heapq.nsmallest(self.SAMPLE_SIZE, entries)
+        width = self.width
+        if len(sample) > 1:
+            gaps = [sample[i+1][0] - sample[i][0] for i in xrange(len(sample) - 1)]
+            avg = sum(gaps) / len(gaps)
+            kept = [gap for gap in gaps if gap <= 2 * avg]
+            if kept and sum(kept) > 0:
+                width = 3.0 * sum(kept) / len(kept)
+        self._setup(nbuckets, width, entries)
+
+    def push(self, event):
+        '''
+            Insert (event.time, event.priority, event.order, event.seq, event) into its bucket
+
+            Args:
+                event: the event to be scheduled
+        '''
+        entry = (event.time, event.priority, event.order, event.seq, event)
+        vbucket = int(event.time / self.width)
+        bisect.insort(self.buckets[vbucket % self.nbuckets], entry)
+        self.size += 1
+        # an event earlier than the current position moves the calendar back
+        if vbucket < self.vbucket:
+            self.vbucket = vbucket
+            self.lastTime = event.time
+        if self.size > self.topThreshold:
+            self._resize(2 * self.nbuckets)
+
+    def _find(self):
+        '''
+            Locate the bucket holding the earliest event
+
+            Return:
+                (bucket, virtual index of the bucket)
+        '''
+        if self.size == 0:
+            raise IndexError('pop from an empty scheduler')
+        buckets = self.buckets
+        nbuckets = self.nbuckets
+        width = self.width
+        vbucket = self.vbucket
+        for _ in xrange(nbuckets):
+            bucket = buckets[vbucket % nbuckets]
+            if bucket and int(bucket[0][0] / width) <= vbucket:
+                return bucket, vbucket
+            vbucket += 1
+        # nothing in the coming year: jump straight to the earliest event
+        bucket = min((b for b in buckets if b), key = lambda b: b[0])
+        return bucket, int(bucket[0][0] / width)
+
+    def pop(self):
+        '''
+            Pop the event with the nearest time stamp
+        '''
+        bucket, vbucket = self._find()
+        return self._take(bucket, vbucket)
+
+    def peek(self):
+        '''
+            Get the event with the nearest time stamp without removing it
+        '''
+        bucket, vbucket = self._find()
+        # remember the position, the next pop starts from there
+        self.vbucket = vbucket
+        return bucket[0][4]
+
+    def discard_cancelled(self):
+        '''
+            Drop all cancelled events (buckets stay sorted)
+        '''
+        for i in xrange(self.nbuckets):
+            self.buckets[i] = [entry for entry in self.buckets[i] if not entry[4].cancelled]
+        self.size = sum(len(bucket) for bucket in self.buckets)
+        if self.size < self.bottomThreshold:
+            self._resize(max(2, self.nbuckets / 2))
+
+    def _take(self, bucket, vbucket):
+        '''
+            Remove the first entry of a bucket and move the calendar to it
+        '''
+        entry = bucket.pop(0)
+        self.vbucket = vbucket
+        self.lastTime = entry[0]
+        self.size -= 1
+        if self.size < self.bottomThreshold:
+            self._resize(self.nbuckets / 2)
+        return entry[4]
+
+
+
+'''
+    Available scheduler backends, selected by name in SimEngine
+'''
+SCHEDULERS = {
+    'heap': HeapScheduler,
+    'calendar': CalendarScheduler,
+}
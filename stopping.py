@@ -0,0 +1,84 @@
+'''
+    Stop conditions for SimEngine.run
+
+    A stop condition is any callable (engine) -> bool added with
+    engine.add_stop_condition(); run() ends as soon as one of them returns True.
+    They are checked every engine.stopCheckInterval of simulation time.
+
+    Independently, engine.stopWhenQuiescent = True ends the run when only background
+    events (routing updates, routing packets, TCP Fast window updates) are left.
+'''
+
+
+class AllFlowsDone(object):
+    '''
+        Met when every flow of the simulation has all its packets acknowledged
+    '''
+    name = 'all_flows_done'
+
+    def __call__(self, engine):
+        for flow in engine.parse.flows.values():
+            if not flow.isDone():
+                return False
+        return True
+
+
+
+class Predicate(object):
+    '''
+        User defined condition
+
+        Attributes:
+            function: callable (engine) -> bool
+            name: name reported in engine.stopReason
+    '''
+    def __init__(self, function, name = 'predicate'):
+        self.function = function
+        self.name = name
+
+    def __call__(self, engine):
+        return self.function(engine)
+
+
+
+class MetricConverged(object):
+    '''
+        Met when a recorded metric stays within a tolerance over a time window,
+        i.e. max - min <= tolerance * |mean| of the samples in the last `window` seconds
+        The samples are in time order: the start of the window is found by binary search,
+        so a check reads the samples of the window only, not the whole series
+
+        Attributes:
+            cate: category of the metric (CATE_* in constants.py)
+            element: name of the element recording it, e.g. 'F1'
+            window: length of the time window in s
+            tolerance: relative tolerance
+    '''
+    def __init__(self, cate, element, window = 1.0, tolerance = 0.05):
+        self.cate = cate
+        self.element = element
+        self.window = window
+        self.tolerance = tolerance
+        self.name = 'converged %s %s' % (cate, element)
+
+    def __call__(self, engine):
+        content = engine.recorder.category[self.cate].get(self.element)
+        now = engine.getCurrentTime()
+        # the first sample is the (0, 0) placeholder of the recorder
+        if not content or len(content) < 2 or now - content[1][0] < self.window:
+            return False
+        start = now - self.window
+        # first sample at or after start
+        low, high = 1, len(content)
+        while low < high:
+            middle = (low + high) // 2
+            if content[middle][0] < start:
+                low = middle + 1
+            else:
+                high = middle
+        # with the value in force at the start of the window
+        if content[low - 1][0] < start:
+            low -= 1
+        values = [value for (time, value) in content[low:]]
+        mean = 1.0 * sum(values) / len(values)
+        return max(values) - min(values) <= self.tolerance * abs(mean)
@@ -0,0 +1,147 @@
+'''
+    Parameter sweep: run independent simulations in parallel on a process pool
+
+    The grid is a .json file, every combination of its lists is one run:
+        {
+            "testcase": ["testcase1.txt", "testcase2.txt"],
+            "tcp": ["fast", "reno"],
+            "maxtime": [30, 60],
+            "links": [{}, {"*": {"buffer": 32}}, {"L1": {"rate": 5, "delay": 20}}],
+            "routing": ["dynamic", "static"],
+            "damping": [{}, {"alpha": 0.25, "switch": 0.1}],
+            "ecmp": [null, 0]
+        }
+    "links" holds link overrides in the units of the testcase file (see parse.py),
+    "routing" the routing modes (see routing.py), "damping" the link cost damping
+    of the routers (see Router.setDamping), "ecmp" the multipath tolerance (null
+    for single path).
+    Missing keys take the defaults of DEFAULT_GRID.
+
+    Usage: python sweep.py grid.json output_dir [processes]
+    Each run writes its data files (same as testcase.py) and console output into
+    output_dir/run_XXXX/, and output_dir/manifest.json lists all runs.
+'''
+import matplotlib
+matplotlib.use('Agg')
+
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from engine import SimEngine
+from parse import parse
+from testcase import save_data
+
+DEFAULT_GRID = {
+    'testcase': ['testcase0.txt'],
+    'tcp': ['fast'],
+    'maxtime': [30],
+    'links': [{}],
+    'routing': ['dynamic'],
+    'damping': [{}],
+    'ecmp': [None],
+}
+
+
+def expand_grid(grid):
+    '''
+        List every combination of the grid values
+
+        Args:
+            grid: {parameter: list of values}, completed with DEFAULT_GRID
+
+        Return:
+            list of runs, each run is {parameter: value}
+    '''
+    full = dict(DEFAULT_GRID)
+    full.update(grid)
+    keys = sorted(full)
+    return [dict(zip(keys, values)) for values in itertools.product(*[full[key] for key in keys])]
+
+
+def run_one(job):
+    '''
+        Run one simulation in a worker process and save its output
+
+        Args:
+            job: (run directory, run parameters)
+
+        Return:
+            manifest entry of the run
+    '''
+    run_dir, run = job
+    if not os.path.isdir(run_dir):
+        os.makedirs(run_dir)
+    entry = {'dir': run_dir, 'params': run}
+
+    stdout = sys.stdout
+    sys.stdout = open(os.path.join(run_dir, 'console.txt'), 'w')
+    try:
+        start = time.time()
+        engine = SimEngine(run['maxtime'])
+        parse(engine, run['testcase'], tcp = run['tcp'], link_overrides = run['links'], routing = run['routing'],
+              damping = run['damping'], ecmp = run['ecmp'])
+        engine.run()
+        entry['wall'] = time.time() - start
+        entry['events'] = engine.executedEvents
+        entry['fingerprint'] = engine.getFingerprint()
+        save_data(engine, run_dir + '/')
+        entry['status'] = 'ok'
+    except Exception as e:
+        entry['status'] = 'error: ' + str(e)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+    return entry
+
+
+def sweep(grid, out_dir, processes = None):
+    '''
+        Run all combinations of the grid on a process pool and write the manifest
+
+        Args:
+            grid: {parameter: list of values}
+            out_dir: directory of the output
+            processes: number of worker processes, all cores by default
+
+        Return:
+            the manifest, list of entries in the order of the grid
+    '''
+    runs = expand_grid(grid)
+    if not os.path.isdir(out_dir):
+        os.makedirs(out_dir)
+    jobs = [(os.path.join(out_dir, 'run_%04d' % i), run) for i, run in enumerate(runs)]
+
+    # one run per worker process, so that memory is released after each run
+    pool = multiprocessing.Pool(processes, maxtasksperchild = 1)
+    try:
+        manifest = pool.map(run_one, jobs, chunksize = 1)
+    finally:
+        pool.close()
+        pool.join()
+
+    with open(os.path.join(out_dir, 'manifest.json'), 'w') as manifestFile:
+        json.dump(manifest, manifestFile, indent = 2, sort_keys = True)
+    return manifest
+
+
+def main():
+    if len(sys.argv) < 3:
+        print 'Usage: python sweep.py grid.json output_dir [processes]'
+        return
+    with open(sys.argv[1]) as gridFile:
+        grid = json.load(gridFile)
+    processes = int(sys.argv[3]) if len(sys.argv) > 3 else None
+
+    start = time.time()
+    manifest = sweep(grid, sys.argv[2], processes)
+    for entry in manifest:
+        print entry['dir'], entry['status'], entry.get('events'), entry.get('fingerprint')
+    print '{} runs in {:.1f}s'.format(len(manifest), time.time() - start)
+
+
+if __name__ == '__main__':
+    main()
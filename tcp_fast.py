@@ -102,10 +102,12 @@ class TcpFast():
     def setTimeOutEvent(self, delay):
         '''
             Set time_out event and add it to the Event Queue
+            Only the latest time_out event is valid, the previous one is cancelled
             
             Args:
                 delay: specify delay for time_out event
         '''
+        self.engine.cancel_event(self.validTimeOutEvent)
         event = events.Event.CreateEventPacketTimeOut(self.engine.getCurrentTime()+ delay, self.flow)
         self.validTimeOutEvent = event
         self.engine.push_event(event)
@@ -3,6 +3,7 @@
 '''
 import collections
 import events
+from tracing import tracer, TRACE_DEBUG
 
 class TcpReno():
     '''
@@ -174,10 +175,12 @@ class TcpReno():
     def setTimeOutEvent(self, delay):
         '''
             Set time_out event and add it to the Event Queue
+            Only the latest time_out event is valid, the previous one is cancelled
             
             Args:
                 delay: specify delay for time_out event
         '''
+        self.engine.cancel_event(self.validTimeOutEvent)
         event = events.Event.CreateEventPacketTimeOut(self.engine.getCurrentTime()+ delay, self.flow)
         self.validTimeOutEvent = event
         self.engine.push_event(event)
@@ -272,7 +275,9 @@ class StateMachine(object):
         '''
         # Calculate for dupTime
         if self.lastAckID == ackPacket.pck_id:
-            print ackPacket.pck_id
+            if tracer.enabled:
+                tracer.log('tcp', TRACE_DEBUG, self.flow.engine.getCurrentTime(), 'dup_ack',
+                           flow = self.flow.name, pck_id = ackPacket.pck_id, dup_times = self.dupTime + 1)
             self.dupTime += 1
         else:
             self.dupTime = 0
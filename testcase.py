@@ -20,6 +20,35 @@ DIR_IMG = 'img_testcase' + str(CURRENT_TEST) + '/'
 DIR_DATA = 'simu_data/data_fast_testcase1/'
 
 
+def save_data(engine, dir_data):
+    '''
+        Smooth the recorded data and save them into files, use file to plot
+        
+        Args:
+            engine: the engine after simulation
+            dir_data: directory of the data output, ended with '/'
+    '''
+    # category: (file suffix, smooth functions to apply in order)
+    outputs = [(CATE_LINK_RATE, '_link_rate.txt', [engine.recorder.smooth]),
+               (CATE_BUFFER_OCCUPANCY, '_buffer_occupancy.txt', [engine.recorder.smooth]),
+               (CATE_PACKET_LOSS, '_packet_loss.txt', [engine.recorder.smooth1, engine.recorder.smooth2]),
+               (CATE_FLOW_RATE, '_flow_rate.txt', [engine.recorder.smooth1, engine.recorder.smooth2]),
+               (CATE_WINDOW_SIZE, '_window_size.txt', [engine.recorder.smooth]),
+               (CATE_PACKET_DELAY, '_packet_delay.txt', [engine.recorder.smooth]),
+               (CATE_PKTS_RECEIVED, '_pkts.txt', [engine.recorder.smooth]),
+               (CATE_SSTHRE, '_ssthre.txt', [engine.recorder.smooth])]
+    
+    for cate, suffix, smooths in outputs:
+        for name, inventory in engine.recorder.category[cate].items():
+            tempSmooth = smooths[0](0.2, inventory)
+            for smooth in smooths[1:]:
+                tempSmooth = smooth(tempSmooth)
+            
+            with open(dir_data + name + suffix, 'w') as myFile:
+                for x,y in tempSmooth:
+                    myFile.write('{} {}\n'.format(x, y))
+
+
 def main():
     #initialize engine and set maximum running time 
     #for testcase0/1, the maximun running time is 30, for testcase2, it is 60
@@ -34,71 +63,7 @@ def main():
     engine.run()
     
     #save data output into file, use file to plot        
-    for name, inventory in engine.recorder.category[CATE_LINK_RATE].items():
-        tempSmooth = engine.recorder.smooth(0.2, inventory)
-        
-        tempFile = DIR_DATA + name + '_link_rate.txt'
-        myFile = open(tempFile, 'w')
-        for x,y in tempSmooth:
-            myFile.write('{} {}\n'.format(x, y))
-
-    for name, inventory in engine.recorder.category[CATE_BUFFER_OCCUPANCY].items():
-        tempSmooth = engine.recorder.smooth(0.2, inventory)
-
-        tempFile = DIR_DATA + name + '_buffer_occupancy.txt'
-        myFile = open(tempFile, 'w')
-        for x,y in tempSmooth:
-            myFile.write('{} {}\n'.format(x, y))
-                
-    for name, inventory in engine.recorder.category[CATE_PACKET_LOSS].items():
-        tempSmooth = engine.recorder.smooth1(0.2, inventory)
-        tempSmooth = engine.recorder.smooth2(tempSmooth)
-        
-        tempFile = DIR_DATA + name + '_packet_loss.txt'
-        myFile = open(tempFile, 'w')
-        for x,y in tempSmooth:
-            myFile.write('{} {}\n'.format(x, y))
-            
-    for name, inventory in engine.recorder.category[CATE_FLOW_RATE].items():
-        tempSmooth = engine.recorder.smooth1(0.2, inventory)
-        tempSmooth = engine.recorder.smooth2(tempSmooth)
-        
-        tempFile = DIR_DATA + name + '_flow_rate.txt'
-        myFile = open(tempFile, 'w')
-        for x,y in tempSmooth:
-            myFile.write('{} {}\n'.format(x, y))
-                                    
-    for name, inventory in engine.recorder.category[CATE_WINDOW_SIZE].items():
-        tempSmooth = engine.recorder.smooth(0.2, inventory)
-        
-        tempFile = DIR_DATA + name + '_window_size.txt'
-        myFile = open(tempFile, 'w')
-        for x,y in tempSmooth:
-            myFile.write('{} {}\n'.format(x, y))
-                        
-    for name, inventory in engine.recorder.category[CATE_PACKET_DELAY].items():
-        tempSmooth = engine.recorder.smooth(0.2, inventory)
-        
-        tempFile = DIR_DATA + name + '_packet_delay.txt'
-        myFile = open(tempFile, 'w')
-        for x,y in tempSmooth:
-            myFile.write('{} {}\n'.format(x, y))
-            
-    for name, inventory in engine.recorder.category[CATE_PKTS_RECEIVED].items():
-        tempSmooth = engine.recorder.smooth(0.2, inventory)
-        
-        tempFile = DIR_DATA + name + '_pkts.txt'
-        myFile = open(tempFile, 'w')
-        for x,y in tempSmooth:
-            myFile.write('{} {}\n'.format(x, y))   
-            
-    for name, inventory in engine.recorder.category[CATE_SSTHRE].items():
-        tempSmooth = engine.recorder.smooth(0.2, inventory)
-        
-        tempFile = DIR_DATA + name + '_ssthre.txt'
-        myFile = open(tempFile, 'w')
-        for x,y in tempSmooth:
-            myFile.write('{} {}\n'.format(x, y))
+    save_data(engine, DIR_DATA)
             
     # Data Visualization   
     engine.recorder.plot()
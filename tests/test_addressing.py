@@ -0,0 +1,72 @@
+'''
+    Tests of the addresses and the prefix trie (addressing.py)
+
+    Run from the repository root: python -m unittest discover -s tests
+'''
+import random
+import unittest
+
+from addressing import PrefixTrie, covers, parse_prefix
+
+
+def dotted(value):
+    return '.'.join(str(value >> shift & 255) for shift in (24, 16, 8, 0))
+
+
+def longest(prefixes, address):
+    '''
+        Longest prefix containing an address, by trying all of them
+    '''
+    matches = [prefix for prefix in prefixes if covers(prefix, address)]
+    if not matches:
+        return None
+    return max(matches, key = lambda prefix: parse_prefix(prefix)[1])
+
+
+class PrefixTrieTest(unittest.TestCase):
+
+    def random_prefix(self, rand, near):
+        '''
+            Prefix of random length, often nested in or next to a prefix of near
+        '''
+        length = rand.choice([0, 1, 8, 12, 16, 20, 23, 24, 25, 30, 31, 32] + range(8, 33))
+        if near and rand.random() < 0.7:
+            value = parse_prefix(rand.choice(near))[0] | rand.getrandbits(12)
+        else:
+            value = rand.getrandbits(32)
+        return dotted(value) + '/' + str(length)
+
+    def test_same_as_brute_force(self):
+        rand = random.Random(1)
+        for i in xrange(200):
+            trie = PrefixTrie()
+            stored = {}
+            for j in xrange(rand.randint(0, 40)):
+                prefix = self.random_prefix(rand, stored.values())
+                # the same network may be written with host bits set
+                stored.setdefault(parse_prefix(prefix), prefix)
+                trie.insert(prefix)
+                self.assertEqual(len(trie), len(stored))
+                for k in xrange(5):
+                    if stored and rand.random() < 0.8:
+                        value = parse_prefix(rand.choice(stored.values()))[0] | rand.getrandbits(rand.choice([1, 8, 16]))
+                    else:
+                        value = rand.getrandbits(32)
+                    address = dotted(value)
+                    # looked up twice, the second time from the cache
+                    for repeat in xrange(2):
+                        self.assertEqual(trie.lookup(address), longest(stored.values(), address), address)
+
+    def test_cache_cleared_on_insert(self):
+        trie = PrefixTrie()
+        trie.insert('10.2.0.0/16')
+        self.assertEqual(trie.lookup('10.2.3.4'), '10.2.0.0/16')
+        trie.insert('10.2.3.0/24')
+        self.assertEqual(trie.lookup('10.2.3.4'), '10.2.3.0/24')
+        self.assertEqual(trie.lookup('10.3.0.1'), None)
+        trie.insert('0.0.0.0/0')
+        self.assertEqual(trie.lookup('10.3.0.1'), '0.0.0.0/0')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,264 @@
+'''
+    Tests of the queue disciplines (aqm.py), on a buffer of a stub link
+
+    Run from the repository root: python -m unittest discover -s tests
+'''
+import matplotlib
+matplotlib.use('Agg')
+
+import unittest
+
+from aqm import Red, CoDel, Pie
+from constants import PACKET_SIZE
+from element import Buffer, DataPacket
+from engine import SimEngine
+
+# 10 Mbps, in bytes/s as Link.rate
+RATE = 10 * 1024 * 1024 / 8
+
+
+class StubLink(object):
+    '''
+        The only attribute of a link used by the buffer and its queue discipline
+    '''
+    rate = RATE
+
+
+class FixedRandom(object):
+    '''
+        Random generator always drawing the same value
+    '''
+    def __init__(self, value):
+        self.value = value
+
+    def random(self):
+        return self.value
+
+
+def packet(pck_id = 0):
+    return DataPacket(None, None, None, 0, PACKET_SIZE, False, pck_id)
+
+
+def make_buffer(discipline, packets, **options):
+    '''
+        Buffer of 64 packets holding some packets pushed at time 0, then managed by the discipline
+
+        Args:
+            discipline: class of the queue discipline
+            packets: number of packets in the buffer
+            options: parameters of the discipline
+    '''
+    buffer = Buffer(SimEngine(100), 'B', 64 * PACKET_SIZE, StubLink())
+    for i in xrange(packets):
+        buffer.push(packet(i))
+    buffer.aqm = discipline(buffer, **options)
+    return buffer
+
+
+class RedTest(unittest.TestCase):
+
+    def test_drop_probability_between_thresholds(self):
+        '''
+            Halfway between the thresholds pb = maxP / 2, and a packet accepted after count
+            others is dropped with probability pb / (1 - count * pb)
+        '''
+        buffer = make_buffer(Red, 32)
+        red = buffer.aqm
+        # the average stays put when the queue is at the average
+        red.avg = buffer.bytes
+        self.assertEqual(red.avg, (red.minThreshold + red.maxThreshold) / 2)
+        pb = red.maxP / 2
+
+        red.random = FixedRandom(pb / (1 - pb) - 1e-9)
+        self.assertTrue(red.enqueue(packet(), 0))
+        self.assertEqual(red.count, 0)
+        red.random = FixedRandom(pb / (1 - pb) + 1e-9)
+        self.assertFalse(red.enqueue(packet(), 0))
+
+        # with a draw of 0.6, pb / (1 - count * pb) > 0.6 from count = 19
+        red.count = 0
+        red.random = FixedRandom(0.6)
+        drops = [red.enqueue(packet(), 0) for i in xrange(19)]
+        self.assertEqual(drops, [False] * 18 + [True])
+        self.assertEqual(red.avg, buffer.bytes)
+
+    def test_thresholds(self):
+        buffer = make_buffer(Red, 32)
+        red = buffer.aqm
+        red.random = FixedRandom(0.0)
+        red.avg = buffer.bytes = red.minThreshold - 1
+        self.assertFalse(red.enqueue(packet(), 0))
+        red.random = FixedRandom(0.999)
+        red.avg = buffer.bytes = red.maxThreshold
+        self.assertTrue(red.enqueue(packet(), 0))
+
+    def test_decay_over_idle_time(self):
+        '''
+            After the buffer empties, the average decays as if a packet of PACKET_SIZE had
+            arrived to the empty queue every transmission time
+        '''
+        buffer = make_buffer(Red, 4)
+        red = buffer.aqm
+        red.avg = 20000.0
+        for i in xrange(4):
+            buffer.pop(1.0)
+        self.assertEqual(buffer.bytes, 0)
+        self.assertEqual(red.idleSince, 1.0)
+
+        idle = 0.05
+        red.enqueue(packet(), 1.0 + idle)
+        expected = 20000.0 * (1 - red.weight) ** (idle * RATE / PACKET_SIZE)
+        self.assertAlmostEqual(red.avg, expected)
+        self.assertLess(red.avg, 20000.0 * 0.95)
+        self.assertIsNone(red.idleSince)
+
+
+class CoDelTest(unittest.TestCase):
+
+    def setUp(self):
+        self.buffer = make_buffer(CoDel, 40)
+        self.codel = self.buffer.aqm
+
+    def pop(self, now):
+        '''
+            Pop a packet at time now, return the number of packets dropped by CoDel
+        '''
+        before = len(self.buffer.buffer)
+        self.assertIsNotNone(self.buffer.pop(now))
+        return before - len(self.buffer.buffer) - 1
+
+    def test_enter_dropping_state_after_interval(self):
+        '''
+            The first drop happens once the sojourn time has stayed above target for an interval
+        '''
+        codel = self.codel
+        self.assertEqual(self.pop(0.01), 0)
+        self.assertAlmostEqual(codel.firstAboveTime, 0.01 + codel.interval)
+        self.assertEqual(self.pop(0.1), 0)
+        self.assertFalse(codel.dropping)
+        self.assertEqual(self.pop(0.11), 1)
+        self.assertTrue(codel.dropping)
+        self.assertEqual(codel.count, 1)
+
+    def test_sojourn_under_target_resets(self):
+        codel = self.codel
+        self.assertFalse(codel.dequeue(packet(), 0.01, 0.01))
+        self.assertFalse(codel.dequeue(packet(), 0.001, 0.06))
+        self.assertEqual(codel.firstAboveTime, 0)
+        self.assertFalse(codel.dequeue(packet(), 0.01, 0.11))
+
+    def test_control_law_spacing(self):
+        '''
+            In the dropping state, the count-th drop comes interval / sqrt(count) after the previous one
+        '''
+        codel = self.codel
+        self.pop(0.01)
+        self.assertEqual(self.pop(0.11), 1)
+        dropTime = 0.11
+        for count in xrange(1, 5):
+            nextDrop = dropTime + codel.interval / count ** 0.5
+            self.assertAlmostEqual(codel.dropNext, nextDrop)
+            self.assertEqual(self.pop(nextDrop - 0.001), 0)
+            self.assertEqual(self.pop(nextDrop), 1)
+            self.assertEqual(codel.count, count + 1)
+            dropTime = nextDrop
+
+    def test_reentry_count(self):
+        '''
+            Re-entering the dropping state soon after leaving it starts from the drops of the last
+            dropping period beyond the first one, instead of 1
+        '''
+        codel = self.codel
+        interval = codel.interval
+        codel.dequeue(packet(), 0.01, 0.0)
+        self.assertTrue(codel.dequeue(packet(), 0.01, interval))
+        for i in xrange(3):
+            self.assertTrue(codel.dequeue(packet(), 0.01, codel.dropNext))
+        self.assertEqual((codel.count, codel.lastCount), (4, 1))
+        # the sojourn time goes under target: leave the dropping state
+        self.assertFalse(codel.dequeue(packet(), 0.001, codel.dropNext))
+        self.assertFalse(codel.dropping)
+
+        # back above target for an interval, soon after: count = 4 - 1
+        now = codel.dropNext + interval
+        codel.dequeue(packet(), 0.01, now)
+        self.assertTrue(codel.dequeue(packet(), 0.01, now + interval))
+        self.assertEqual((codel.count, codel.lastCount), (3, 3))
+        self.assertAlmostEqual(codel.dropNext, now + interval + interval / 3 ** 0.5)
+
+        # leave again without further drop, delta = 0: count = 1
+        self.assertFalse(codel.dequeue(packet(), 0.001, now + interval))
+        now += 3 * interval
+        codel.dequeue(packet(), 0.01, now)
+        self.assertTrue(codel.dequeue(packet(), 0.01, now + interval))
+        self.assertEqual(codel.count, 1)
+
+    def test_reentry_after_long_time(self):
+        '''
+            More than 16 intervals after the last drop, the count starts from 1 again
+        '''
+        codel = self.codel
+        interval = codel.interval
+        codel.dequeue(packet(), 0.01, 0.0)
+        codel.dequeue(packet(), 0.01, interval)
+        for i in xrange(3):
+            codel.dequeue(packet(), 0.01, codel.dropNext)
+        codel.dequeue(packet(), 0.001, codel.dropNext)
+        now = codel.dropNext + 16 * interval
+        codel.dequeue(packet(), 0.01, now)
+        self.assertTrue(codel.dequeue(packet(), 0.01, now + interval))
+        self.assertEqual(codel.count, 1)
+
+
+class PieTest(unittest.TestCase):
+
+    def test_burst_allowance(self):
+        '''
+            A standing queue is let through for maxBurst, then dropped at the PIE probability;
+            the allowance is given back once the queue has drained
+        '''
+        buffer = make_buffer(Pie, 40)
+        pie = buffer.aqm
+        pie.random = FixedRandom(0.0)
+        self.assertGreater(1.0 * buffer.bytes / RATE, pie.target)
+
+        arrivals = 0
+        while not pie.enqueue(packet(), arrivals * pie.tUpdate):
+            self.assertGreater(pie.burstAllowance, 0)
+            arrivals += 1
+        self.assertEqual(pie.burstAllowance, 0)
+        self.assertGreater(pie.probability, 0)
+        # one arrival per update, give or take the rounding of the update times
+        self.assertAlmostEqual(arrivals * pie.tUpdate, pie.maxBurst, delta = pie.tUpdate * 1.01)
+
+        buffer.bytes = 0
+        pie.probability = 0.0
+        now = (arrivals + 3) * pie.tUpdate
+        self.assertFalse(pie.enqueue(packet(), now))
+        self.assertEqual(pie.burstAllowance, pie.maxBurst)
+
+    def test_probability_catch_up(self):
+        '''
+            An arrival after several tUpdate periods applies all the updates missed,
+            as regular arrivals would have
+        '''
+        regular = make_buffer(Pie, 40).aqm
+        late = make_buffer(Pie, 40).aqm
+        for i in xrange(4):
+            regular.enqueue(packet(), i * regular.tUpdate)
+        late.enqueue(packet(), 0)
+        late.enqueue(packet(), 3 * late.tUpdate)
+        self.assertEqual(late.nextUpdate, regular.nextUpdate)
+        self.assertAlmostEqual(late.probability, regular.probability)
+        self.assertGreater(late.probability, 0)
+        self.assertEqual(late.qdelayOld, regular.qdelayOld)
+
+        # more updates raise the probability under a standing queue
+        before = late.probability
+        late.enqueue(packet(), 10.5 * late.tUpdate)
+        self.assertGreater(late.probability, before)
+        self.assertAlmostEqual(late.nextUpdate, 11 * late.tUpdate)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+'''
+    Tests of the checkpoints of the engine (SimEngine.save_checkpoint, load_checkpoint, fork)
+
+    Run from the repository root: python -m unittest discover -s tests
+'''
+import matplotlib
+matplotlib.use('Agg')
+
+import os
+import tempfile
+import unittest
+
+from engine import SimEngine, load_checkpoint
+from parse import parse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CASE = os.path.join(ROOT, 'testcase2.txt')
+MAXTIME = 6
+CHECKPOINT = 3
+
+# parse options of the runs checked
+RUNS = [{'routing': 'dynamic'}, {'routing': 'static', 'ecmp': 0}, {'routing': 'link_state'}, {'routing': 'dv_delta'}]
+
+
+def start(options):
+    engine = SimEngine(MAXTIME)
+    parse(engine, CASE, **options)
+    return engine
+
+
+def straight(options):
+    engine = start(options)
+    engine.run()
+    return engine
+
+
+class CheckpointTest(unittest.TestCase):
+
+    def assertSameRun(self, engine, reference, label):
+        self.assertEqual(engine.getFingerprint(), reference.getFingerprint(), label)
+        self.assertEqual(engine.executedEvents, reference.executedEvents, label)
+        self.assertEqual(engine.recorder.category, reference.recorder.category, label)
+
+    def test_save_and_restore(self):
+        '''
+            Saving at 3 s, restoring, then running to 6 s executes the events of a straight 6 s run
+        '''
+        for options in RUNS:
+            label = str(options)
+            reference = straight(options)
+            engine = start(options)
+            engine.run_until(CHECKPOINT)
+            checkpointFile = tempfile.NamedTemporaryFile(suffix = '.ckpt', delete = False)
+            checkpointFile.close()
+            try:
+                engine.save_checkpoint(checkpointFile.name)
+                restored = load_checkpoint(checkpointFile.name)
+            finally:
+                os.remove(checkpointFile.name)
+            self.assertEqual(restored.getFingerprint(), engine.getFingerprint())
+            restored.run()
+            self.assertSameRun(restored, reference, label)
+
+    def test_fork(self):
+        '''
+            Both the forked engine and the original one continue like a straight run,
+            independently of each other
+        '''
+        for options in RUNS:
+            label = str(options)
+            reference = straight(options)
+            engine = start(options)
+            engine.run_until(CHECKPOINT)
+            fork = engine.fork()
+            fork.run()
+            self.assertSameRun(fork, reference, label + ' fork')
+            self.assertLess(engine.getCurrentTime(), MAXTIME)
+            engine.run()
+            self.assertSameRun(engine, reference, label + ' original')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+'''
+    Tests of the damping of the measured link costs (Router.setDamping)
+
+    Run from the repository root: python -m unittest discover -s tests
+'''
+import matplotlib
+matplotlib.use('Agg')
+
+import unittest
+
+from constants import PACKET_SIZE
+from distancevector import DeltaVectorRouter
+from element import Router, Link
+from engine import SimEngine
+
+DEST = '10.0.9.9'
+
+
+class Update(object):
+    '''
+        'update' packet of a neighbor router
+    '''
+    def __init__(self, source, routerTable):
+        self.source = source
+        self.routerTable = routerTable
+
+
+def triangle(routerClass):
+    '''
+        Router R1 with two neighbor routers A and B
+
+        Return:
+            (R1, A, B, link to A)
+    '''
+    engine = SimEngine(1)
+    router = routerClass(engine, 'R1', '10.0.0.1')
+    neighborA = routerClass(engine, 'A', '10.0.0.2')
+    neighborB = routerClass(engine, 'B', '10.0.0.3')
+    link = Link(engine, 'L1', router, neighborA, 0.01, 1.25e6, 65536)
+    Link(engine, 'L2', router, neighborB, 0.01, 1.25e6, 65536)
+    return router, neighborA, neighborB, link
+
+
+class LinkCostTest(unittest.TestCase):
+
+    def setUp(self):
+        self.router, self.neighborA, self.neighborB, self.link = triangle(Router)
+        self.address = self.neighborA.address
+
+    def test_raw_by_default(self):
+        self.assertEqual(self.router.linkCost(self.address, 0.3), 0.3)
+        self.assertEqual(self.router.linkCost(self.address, 0.1), 0.1)
+
+    def test_ewma(self):
+        self.router.setDamping(alpha = 0.25)
+        self.assertEqual(self.router.linkCost(self.address, 0.2), 0.2)
+        self.assertAlmostEqual(self.router.linkCost(self.address, 0.6), 0.2 + 0.25 * 0.4)
+        self.assertAlmostEqual(self.router.linkCost(self.address, 0.3), 0.3)
+        # each neighbor has its own average
+        self.assertEqual(self.router.linkCost(self.neighborB.address, 1.0), 1.0)
+
+    def test_blend(self):
+        self.router.setDamping(alpha = 1.0, blend = 0.5)
+        static = self.link.propogationDelay + 1.0 * PACKET_SIZE / self.link.rate
+        self.assertAlmostEqual(self.router.linkCost(self.address, 0.5), 0.5 * static + 0.5 * 0.5)
+
+    def test_hysteresis(self):
+        '''
+            Costs within the hysteresis of the last cost used are replaced by it
+        '''
+        self.router.setDamping(hysteresis = 0.1)
+        self.assertEqual(self.router.linkCost(self.address, 1.0), 1.0)
+        self.assertEqual(self.router.linkCost(self.address, 1.09), 1.0)
+        self.assertEqual(self.router.linkCost(self.address, 0.91), 1.0)
+        self.assertEqual(self.router.linkCost(self.address, 1.2), 1.2)
+        # compared with the last cost used, not the last sample
+        self.assertEqual(self.router.linkCost(self.address, 1.1), 1.2)
+        self.assertEqual(self.router.linkCost(self.address, 1.07), 1.07)
+
+
+
+class SwitchThresholdTest(unittest.TestCase):
+
+    def test_update_rt(self):
+        '''
+            Distance vector: a route moves to the neighbor of an update only if it is cheaper
+            by more than switchThreshold
+        '''
+        router, neighborA, neighborB, link = triangle(Router)
+        router.setDamping(switch = 0.1)
+        router.setRoute(neighborA.address, (1.0, neighborA.address))
+        router.setRoute(neighborB.address, (1.0, neighborB.address))
+        router.setRoute(DEST, (10.0, neighborA.address))
+
+        router.updateRT(Update(neighborB, {DEST: (8.5, '10.0.0.8')}))
+        self.assertEqual(router.rt[DEST], (10.0, neighborA.address))
+        router.updateRT(Update(neighborB, {DEST: (7.9, '10.0.0.8')}))
+        self.assertEqual(router.rt[DEST], (8.9, neighborB.address))
+        self.assertEqual(router.routeChanges, 1)
+        # the current next hop is always followed
+        router.updateRT(Update(neighborB, {DEST: (20.0, '10.0.0.8')}))
+        self.assertEqual(router.rt[DEST], (21.0, neighborB.address))
+
+        router.setDamping(switch = 0.0)
+        router.updateRT(Update(neighborA, {DEST: (19.5, '10.0.0.8')}))
+        self.assertEqual(router.rt[DEST], (20.5, neighborA.address))
+
+    def test_recompute(self):
+        '''
+            dv_delta: the current next hop is kept unless another one is cheaper by more than switchThreshold
+        '''
+        router, neighborA, neighborB, link = triangle(DeltaVectorRouter)
+        router.setDamping(switch = 0.1)
+        router.linkCosts = {neighborA.address: 1.0, neighborB.address: 1.0}
+        router.vectors = {neighborA.address: {DEST: (9.0, '10.0.0.8')},
+                          neighborB.address: {DEST: (9.5, '10.0.0.8')}}
+        router.recompute([DEST])
+        self.assertEqual(router.rt[DEST], (10.0, neighborA.address))
+
+        router.vectors[neighborB.address] = {DEST: (8.5, '10.0.0.8')}
+        router.recompute([DEST])
+        self.assertEqual(router.rt[DEST], (10.0, neighborA.address))
+        router.vectors[neighborB.address] = {DEST: (7.9, '10.0.0.8')}
+        router.recompute([DEST])
+        self.assertEqual(router.rt[DEST], (8.9, neighborB.address))
+
+        # without threshold, any cheaper next hop is taken
+        router.setDamping(switch = 0.0)
+        router.vectors[neighborA.address] = {DEST: (7.8, '10.0.0.8')}
+        router.recompute([DEST])
+        self.assertEqual(router.rt[DEST], (8.8, neighborA.address))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+'''
+    Tests of the distance-vector routing with delta updates (distancevector.py)
+
+    Run from the repository root: python -m unittest discover -s tests
+'''
+import matplotlib
+matplotlib.use('Agg')
+
+import os
+import unittest
+
+from engine import SimEngine
+from parse import parse
+from tracing import tracer, TRACE_DEBUG, TRACE_INFO, TRACE_ERROR
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class DeltaVectorTest(unittest.TestCase):
+
+    def tearDown(self):
+        tracer.disable()
+        tracer.ring.clear()
+
+    def test_traced_run(self):
+        '''
+            A dv_delta run with debug tracing on logs the routing tables it merges
+        '''
+        tracer.enable(TRACE_DEBUG, categories = ['routing'])
+        engine = SimEngine(6)
+        parser = parse(engine, os.path.join(ROOT, 'testcase1.txt'), routing = 'dv_delta')
+        engine.run()
+        events = set(record[3] for record in tracer.records())
+        self.assertIn('routing_table', events)
+        for router in parser.routers.values():
+            self.assertEqual(len(router.rt), len(parser.hosts) + len(parser.routers))
+
+    def test_tables_only_copied_when_traced(self):
+        '''
+            The routing tables are not copied into records the tracer would discard
+        '''
+        tracer.enable(TRACE_INFO, categories = ['routing'])
+        self.assertFalse(tracer.wants('routing', TRACE_DEBUG))
+        self.assertTrue(tracer.wants('routing', TRACE_INFO))
+        self.assertFalse(tracer.wants('tcp', TRACE_INFO))
+        copies = []
+        log = tracer.log
+        def counting(category, level, time, event, **fields):
+            copies.append(event)
+            return log(category, level, time, event, **fields)
+        tracer.log = counting
+        try:
+            engine = SimEngine(3)
+            parse(engine, os.path.join(ROOT, 'testcase1.txt'), routing = 'dv_delta')
+            engine.run()
+        finally:
+            del tracer.log
+        self.assertNotIn('routing_table', copies)
+        tracer.disable()
+        self.assertFalse(tracer.wants('routing', TRACE_ERROR))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+'''
+    Tests of the half and full-duplex links (element.Link, element.Transmitter)
+
+    Run from the repository root: python -m unittest discover -s tests
+'''
+import matplotlib
+matplotlib.use('Agg')
+
+import os
+import tempfile
+import unittest
+
+from constants import CATE_LINK_RATE, CATE_PKTS_RECEIVED
+from engine import SimEngine
+from parse import parse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# a 10 Mbps link L1 between two routers, with a flow in each direction, the second one
+# starting at 3 s; each host has a single flow, behind a 100 Mbps access link
+CASE = '''
+Host
+	ID 		H1
+	IP 		192.168.0.1
+	ID 		H2
+	IP 		192.168.0.2
+	ID 		H3
+	IP 		192.168.0.3
+	ID 		H4
+	IP 		192.168.0.4
+
+Router
+	ID 		R1
+	IP		192.168.1.1
+	ID		R2
+	IP		192.168.1.2
+
+Link
+	ID 		L0
+	rate		100
+	delay		1
+	buffer	 	64
+	connection	H1 R1
+	ID 		L1
+	rate		10
+	delay		10
+	buffer	 	64
+	connection	R1 R2
+	ID 		L2
+	rate		100
+	delay		1
+	buffer	 	64
+	connection	R2 H2
+	ID 		L3
+	rate		100
+	delay		1
+	buffer	 	64
+	connection	H3 R1
+	ID 		L4
+	rate		100
+	delay		1
+	buffer	 	64
+	connection	R2 H4
+
+Flow
+	ID		F1
+	src		H1
+	dst		H2
+	data_amt	20
+	start		1.0
+	ID		F2
+	src		H4
+	dst		H3
+	data_amt	20
+	start		3.0
+
+//end
+'''
+
+
+def run(case, maxtime, **options):
+    engine = SimEngine(maxtime)
+    parser = parse(engine, case, **options)
+    engine.run()
+    return engine, parser
+
+
+def transmissions(content, start, end):
+    '''
+        Intervals of transmission between start and end, from a recorded link rate
+    '''
+    return [(max(begin, start), min(finish, end))
+            for (begin, rate), (finish, _) in zip(content, content[1:] + [(end, 0)])
+            if rate > 0 and finish > start and begin < end]
+
+
+def busy(content, start, end):
+    '''
+        Time spent transmitting between start and end
+    '''
+    return sum(finish - begin for begin, finish in transmissions(content, start, end))
+
+
+def overlap(content1, content2, start, end):
+    '''
+        Time spent transmitting on both between start and end
+    '''
+    intervals1 = transmissions(content1, start, end)
+    intervals2 = transmissions(content2, start, end)
+    total = 0.0
+    i = j = 0
+    while i < len(intervals1) and j < len(intervals2):
+        (begin1, finish1), (begin2, finish2) = intervals1[i], intervals2[j]
+        total += max(0.0, min(finish1, finish2) - max(begin1, begin2))
+        if finish1 < finish2:
+            i += 1
+        else:
+            j += 1
+    return total
+
+
+class DuplexTest(unittest.TestCase):
+
+    def setUp(self):
+        caseFile = tempfile.NamedTemporaryFile(suffix = '.txt', delete = False)
+        caseFile.write(CASE)
+        caseFile.close()
+        self.case = caseFile.name
+
+    def tearDown(self):
+        os.remove(self.case)
+
+    def test_full_duplex_directions(self):
+        '''
+            Both directions of a full-duplex link transmit at the same time, each at the link rate,
+            and carry more than the half-duplex link
+        '''
+        engine, parser = run(self.case, 6, link_overrides = {'L1': {'duplex': 'full'}})
+        rates = engine.recorder.category[CATE_LINK_RATE]
+        self.assertEqual(sorted(name for name in rates if name.startswith('L1')), ['L1a', 'L1b'])
+        link = parser.links['L1']
+        self.assertIsNot(link.transmitters[0], link.transmitters[1])
+        for name in ['L1a', 'L1b']:
+            self.assertEqual(max(rate for time, rate in rates[name]), link.rate * 8 / 1024 / 1024)
+        self.assertGreater(overlap(rates['L1a'], rates['L1b'], 4, 6), 0.5)
+
+        half, halfParser = run(self.case, 6)
+        acked = lambda engine: sum(content[-1][1] for content in engine.recorder.category[CATE_PKTS_RECEIVED].values())
+        self.assertGreater(acked(engine), 1.3 * acked(half))
+
+    def test_independent_rates(self):
+        '''
+            Each direction has its own rate: before the second flow starts, the data of the
+            first one keeps its direction busy while the other one only carries its ACKs
+        '''
+        engine, parser = run(self.case, 3, link_overrides = {'L1': {'duplex': 'full'}})
+        rates = engine.recorder.category[CATE_LINK_RATE]
+        self.assertGreater(busy(rates['L1a'], 1.5, 3), 0.9 * 1.5)
+        self.assertLess(busy(rates['L1b'], 1.5, 3), 0.1 * 1.5)
+
+    def test_half_duplex_unchanged(self):
+        '''
+            A half-duplex link (the default) has one transmitter for both directions, and its
+            recorded data is the same whether the mode is given or not
+        '''
+        testcase1 = os.path.join(ROOT, 'testcase1.txt')
+        default, parser = run(testcase1, 10)
+        explicit, explicitParser = run(testcase1, 10, link_overrides = {'*': {'duplex': 'half'}})
+        self.assertEqual(default.recorder.category, explicit.recorder.category)
+        for link in parser.links.values():
+            self.assertIs(link.transmitters[0], link.transmitters[1])
+            self.assertIn(link.name, default.recorder.category[CATE_LINK_RATE])
+
+
+if __name__ == '__main__':
+    unittest.main()
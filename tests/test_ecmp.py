@@ -0,0 +1,115 @@
+'''
+    Tests of the equal-cost multipath forwarding (Router.multipath)
+
+    Run from the repository root: python -m unittest discover -s tests
+'''
+import matplotlib
+matplotlib.use('Agg')
+
+import collections
+import os
+import tempfile
+import unittest
+
+import topology
+from element import Host, DataPacket
+from engine import SimEngine
+from parse import parse
+
+# (topology, routing mode, ecmp tolerance)
+CASES = [(('fat_tree', 4, 16), 'static_hops', 0),
+         (('fat_tree', 4, 16), 'dv_delta', 0.2),
+         (('random_graph', 16, 16), 'static_hops', 0),
+         (('random_graph', 16, 16), 'dv_delta', 0.2)]
+
+
+def load(size, routing, ecmp, maxtime):
+    kind, n, m = size
+    caseFile = tempfile.NamedTemporaryFile(suffix = '.txt', delete = False)
+    caseFile.close()
+    topology.TOPOLOGIES[kind](n, m).write(caseFile.name)
+    try:
+        engine = SimEngine(maxtime)
+        parser = parse(engine, caseFile.name, routing = routing, ecmp = ecmp)
+    finally:
+        os.remove(caseFile.name)
+    return engine, parser
+
+
+def neighbor(port):
+    link, side = port
+    return link.node2 if side == 1 else link.node1
+
+
+class MultipathTest(unittest.TestCase):
+
+    def assertLoopFree(self, parser, label):
+        '''
+            Every walk over all the next hops, from every router to every host, reaches the host
+            without visiting a node twice
+
+            Return:
+                number of destinations with several next hops
+        '''
+        multipaths = 0
+        for host in parser.hosts.values():
+            destAddr = host.address
+            for router in parser.routers.values():
+                # depth first, over every branch: (node, nodes visited before it)
+                stack = [(router, ())]
+                while stack:
+                    node, visited = stack.pop()
+                    if node is host:
+                        continue
+                    self.assertNotIsInstance(node, Host, label)
+                    self.assertNotIn(node, visited, label + ' loop to ' + host.name)
+                    ports = node.multipath.get(destAddr)
+                    if ports is not None:
+                        multipaths += 1
+                    else:
+                        self.assertIn(destAddr, node.fib, label + ' ' + node.name + ' has no route')
+                        ports = (node.fib[destAddr],)
+                    for port in ports:
+                        stack.append((neighbor(port), visited + (node,)))
+        return multipaths
+
+    def test_walks_are_loop_free(self):
+        for size, routing, ecmp in CASES:
+            engine, parser = load(size, routing, ecmp, 3)
+            multipaths = 0
+            for time in [0.5, 1.5, 3]:
+                engine.run_until(time)
+                multipaths += self.assertLoopFree(parser, '%s %s at %s' % (size[0], routing, time))
+            self.assertGreater(multipaths, 0, size[0] + ' ' + routing)
+
+    def test_flow_keeps_its_port(self):
+        '''
+            With static routing, every data packet (or ACK) of a flow leaves a router on the same link
+        '''
+        for size, routing, ecmp in CASES:
+            if routing != 'static_hops':
+                continue
+            engine, parser = load(size, routing, ecmp, 2)
+            ports = collections.defaultdict(set)
+            for link in parser.links.values():
+                watchSends(link, parser, ports)
+            engine.run()
+            self.assertTrue(ports)
+            for (router, flow, ack), links in ports.items():
+                self.assertEqual(len(links), 1, '%s %s %s %s' % (size[0], router, flow, sorted(links)))
+
+
+def watchSends(link, parser, ports):
+    '''
+        Record the link taken by the packets forwarded by the routers: (router, flow, ACK) -> link names
+    '''
+    send = link.send
+    def wrapper(packet, sender):
+        if sender.name in parser.routers and isinstance(packet, DataPacket):
+            ports[(sender.name, packet.flow.name, packet.acknowledgement)].add(link.name)
+        return send(packet, sender)
+    link.send = wrapper
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+'''
+    Tests of the event cancellation of the engine (engine.py)
+
+    Run from the repository root: python -m unittest discover -s tests
+'''
+import matplotlib
+matplotlib.use('Agg')
+
+import os
+import subprocess
+import sys
+import unittest
+
+from engine import SimEngine
+from events import Event
+from scheduler import SCHEDULERS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Timer(object):
+    '''
+        Reactor logging the time outs it handles
+    '''
+    def __init__(self):
+        self.executed = []
+
+    def react_to_time_out(self, event):
+        self.executed.append(event.pck_id)
+
+
+def timeouts(engine, reactor, count):
+    events = [Event.CreateEventPacketTimeOut(1.0 + i * 0.01, reactor, pck_id = i) for i in xrange(count)]
+    for event in events:
+        engine.push_event(event)
+    return events
+
+
+class CancelEventTest(unittest.TestCase):
+
+    def test_cancel_then_pop(self):
+        for scheduler in SCHEDULERS:
+            engine = SimEngine(10, scheduler = scheduler)
+            timer = Timer()
+            events = timeouts(engine, timer, 6)
+            # the earliest event, one in the middle and the last one
+            for i in [0, 3, 5]:
+                engine.cancel_event(events[i])
+            # cancelling twice, or None, changes nothing
+            engine.cancel_event(events[3])
+            engine.cancel_event(None)
+            self.assertEqual(engine.cancelledEvents, 3)
+            self.assertEqual(engine.pendingEvents(), 3)
+            self.assertEqual(engine.foregroundEvents, 3)
+            self.assertIs(engine.peek_event(), events[1])
+            # peek dropped the cancelled top event
+            self.assertEqual(engine.cancelledEvents, 2)
+
+            engine.run()
+            self.assertEqual(timer.executed, [1, 2, 4], scheduler)
+            # the run ends with the last live event, the cancelled one after it stays queued
+            self.assertEqual(engine.cancelledEvents, 1)
+            self.assertEqual(len(engine.queue), 1)
+            self.assertEqual(engine.stopReason, 'empty')
+            # an executed event is no longer queued
+            engine.cancel_event(events[4])
+            self.assertEqual(engine.cancelledEvents, 1)
+
+    def test_compaction_threshold(self):
+        for scheduler in SCHEDULERS:
+            engine = SimEngine(10, scheduler = scheduler)
+            timer = Timer()
+            events = timeouts(engine, timer, 200)
+            cancelled = range(0, 200, 2) + [1]
+            for i in cancelled[:100]:
+                engine.cancel_event(events[i])
+            # more than COMPACT_THRESHOLD cancelled events, but not more than half the queue
+            self.assertEqual(len(engine.queue), 200)
+            self.assertEqual(engine.cancelledEvents, 100)
+
+            engine.cancel_event(events[cancelled[100]])
+            self.assertEqual(len(engine.queue), 99)
+            self.assertEqual(engine.cancelledEvents, 0)
+            self.assertEqual(engine.pendingEvents(), 99)
+
+            engine.run()
+            self.assertEqual(timer.executed, range(3, 200, 2), scheduler)
+
+    def test_no_compaction_below_threshold(self):
+        engine = SimEngine(10)
+        timer = Timer()
+        events = timeouts(engine, timer, SimEngine.COMPACT_THRESHOLD)
+        for event in events:
+            engine.cancel_event(event)
+        # all of the queue is cancelled, but no more than COMPACT_THRESHOLD events
+        self.assertEqual(len(engine.queue), SimEngine.COMPACT_THRESHOLD)
+        self.assertEqual(engine.pendingEvents(), 0)
+        engine.run()
+        self.assertEqual(timer.executed, [])
+
+
+
+class FingerprintTest(unittest.TestCase):
+
+    def test_independent_of_hash_seed(self):
+        '''
+            Two processes with different hash seeds get the same fingerprint for the same run
+        '''
+        script = ('import matplotlib; matplotlib.use("Agg"); from engine import SimEngine; from parse import parse; '
+                  'engine = SimEngine(2); parse(engine, "testcase1.txt"); engine.run(); print engine.getFingerprint()')
+        fingerprints = set()
+        for seed in ['1', '2']:
+            environment = dict(os.environ, PYTHONHASHSEED = seed)
+            fingerprints.add(subprocess.check_output([sys.executable, '-R', '-c', script], cwd = ROOT,
+                                                     env = environment).strip())
+        self.assertEqual(len(fingerprints), 1)
+
+        engine = SimEngine(10)
+        timer = Timer()
+        timeouts(engine, timer, 3)
+        engine.run()
+        self.assertNotEqual(engine.getFingerprint(), SimEngine(10).getFingerprint())
+
+
+if __name__ == '__main__':
+    unittest.main()
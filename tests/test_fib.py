@@ -0,0 +1,77 @@
+'''
+    Tests of the forwarding table of the routers (Router.fib)
+
+    Run from the repository root: python -m unittest discover -s tests
+'''
+import matplotlib
+matplotlib.use('Agg')
+
+import os
+import unittest
+
+from element import Router, Link
+from engine import SimEngine
+from parse import parse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# routing modes checked during runs
+ROUTINGS = ['dynamic', 'static', 'link_state', 'dv_delta']
+
+
+class FibTest(unittest.TestCase):
+
+    def assertInSync(self, router, label = ''):
+        '''
+            The forwarding table has an entry for every route, the port of its next hop
+        '''
+        self.assertEqual(set(router.fib), set(router.rt), label + router.name)
+        for destAddr, (cost, nextHop) in router.rt.items():
+            self.assertEqual(router.fib[destAddr], router.neighbors.get(nextHop),
+                             '%s%s %s' % (label, router.name, destAddr))
+
+    def test_add_link_and_set_route(self):
+        '''
+            A route set before its link is attached is forwarded once the link is added,
+            and setRoute moves the port with the next hop
+        '''
+        engine = SimEngine(1)
+        router = Router(engine, 'R1', '10.0.0.1')
+        self.assertEqual(router.fib, {'10.0.0.1': None})
+        router.setRoute('10.0.0.9', (1, '10.0.0.2'))
+        self.assertIsNone(router.fib['10.0.0.9'])
+
+        neighbor1 = Router(engine, 'R2', '10.0.0.2')
+        neighbor2 = Router(engine, 'R3', '10.0.0.3')
+        link1 = Link(engine, 'L1', router, neighbor1, 0.01, 1e6, 65536)
+        self.assertEqual(router.fib['10.0.0.9'], (link1, 1))
+        link2 = Link(engine, 'L2', neighbor2, router, 0.01, 1e6, 65536)
+        self.assertInSync(router)
+
+        router.setRoute('10.0.0.9', (1, '10.0.0.3'))
+        self.assertEqual(router.fib['10.0.0.9'], (link2, 2))
+        # a second link to the same neighbor does not change the port
+        Link(engine, 'L3', router, neighbor2, 0.01, 1e6, 65536)
+        self.assertEqual(router.fib['10.0.0.9'], (link2, 2))
+        # a cost change keeps the port
+        router.setRoute('10.0.0.9', (5, '10.0.0.3'))
+        self.assertEqual(router.fib['10.0.0.9'], (link2, 2))
+        router.setRoute('10.0.0.9', (1, '10.0.0.7'))
+        self.assertIsNone(router.fib['10.0.0.9'])
+        self.assertInSync(router)
+
+    def test_in_sync_during_runs(self):
+        '''
+            With every routing protocol, the forwarding tables follow the routing tables during a run
+        '''
+        for routing in ROUTINGS:
+            engine = SimEngine(6)
+            parser = parse(engine, os.path.join(ROOT, 'testcase2.txt'), routing = routing)
+            for time in [0.5, 2, 4, 6]:
+                engine.run_until(time)
+                for router in parser.routers.values():
+                    self.assertInSync(router, '%s at %s: ' % (routing, time))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+'''
+    Tests of the fluid-flow simulation mode (fluid.py)
+
+    Run from the repository root: python -m unittest discover -s tests
+'''
+import matplotlib
+matplotlib.use('Agg')
+
+import os
+import unittest
+import warnings
+
+from fluid import FluidEngine
+from parse import parse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CASE = os.path.join(ROOT, 'testcase2.txt')
+
+
+def run(tcp):
+    engine = FluidEngine(40)
+    parse(engine, CASE, tcp = tcp)
+    with warnings.catch_warnings(record = True) as caught:
+        warnings.simplefilter('always')
+        engine.run()
+    return engine, caught
+
+
+class FluidWarningTest(unittest.TestCase):
+
+    def test_reno_warns(self):
+        '''
+            Reno windows are cut by losses, the results are flagged as approximate
+        '''
+        engine, caught = run('reno')
+        self.assertEqual(len(caught), 1)
+        for name in ['F1', 'F2', 'F3']:
+            self.assertIn(name, str(caught[0].message))
+
+    def test_fast_without_losses(self):
+        '''
+            FAST TCP fills no buffer: no loss, no warning
+        '''
+        engine, caught = run('fast')
+        self.assertEqual(caught, [])
+        self.assertTrue(all(fluid.lastLoss == -float('inf') for fluid in engine.flows))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+'''
+    Tests of the demultiplexing of packets to their flows on hosts (Host.receive)
+
+    Run from the repository root: python -m unittest discover -s tests
+'''
+import matplotlib
+matplotlib.use('Agg')
+
+import os
+import tempfile
+import unittest
+
+import topology
+from element import Host, DataPacket
+from engine import SimEngine
+from parse import parse
+
+
+class StubFlow(object):
+    '''
+        Flow logging the packets its ends receive
+    '''
+    def __init__(self, name, source, destination):
+        self.name = name
+        self.source = source
+        self.destination = destination
+        self.received = []
+
+    def sourceReceive(self, packet):
+        self.received.append(('source', packet.pck_id))
+
+    def destinationReceive(self, packet):
+        self.received.append(('destination', packet.pck_id))
+
+
+def packet(flow, pck_id, acknowledgement):
+    if acknowledgement:
+        return DataPacket(flow.destination, flow.source, flow, 0, 64, True, pck_id)
+    return DataPacket(flow.source, flow.destination, flow, 0, 1024, False, pck_id)
+
+
+class HostTest(unittest.TestCase):
+
+    def test_demultiplex(self):
+        '''
+            A packet goes to its own flow only, to the end of the flow on the host
+        '''
+        engine = SimEngine(1)
+        host = Host(engine, 'H1', '10.0.0.1')
+        other = Host(engine, 'H2', '10.0.0.2')
+        sending = [StubFlow('S%d' % i, host, other) for i in xrange(3)]
+        receiving = [StubFlow('D%d' % i, other, host) for i in xrange(3)]
+        for flow in sending + receiving:
+            host.addFlow(flow)
+        self.assertEqual(host.sourceFlows, set(sending))
+        self.assertEqual(host.destinationFlows, set(receiving))
+
+        host.receive(packet(sending[1], 7, True))
+        host.receive(packet(receiving[2], 8, False))
+        # a flow of other hosts is ignored
+        host.receive(packet(StubFlow('X', other, other), 9, False))
+        self.assertEqual(sending[1].received, [('source', 7)])
+        self.assertEqual(receiving[2].received, [('destination', 8)])
+        for flow in sending + receiving:
+            if flow not in (sending[1], receiving[2]):
+                self.assertEqual(flow.received, [], flow.name)
+
+    def test_shared_hosts(self):
+        '''
+            Flows sharing their two hosts all complete, each with its own packets
+        '''
+        caseFile = tempfile.NamedTemporaryFile(suffix = '.txt', delete = False)
+        caseFile.close()
+        topology.shared_hosts(2, 8).write(caseFile.name)
+        try:
+            engine = SimEngine(20)
+            parser = parse(engine, caseFile.name)
+        finally:
+            os.remove(caseFile.name)
+        engine.run()
+        self.assertEqual(len(parser.flows), 8)
+        for flow in parser.flows.values():
+            self.assertTrue(flow.isDone(), flow.name)
+            self.assertGreaterEqual(flow.lastOrderedPacketID, flow.amount - 1, flow.name)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+'''
+    Tests of the incremental shortest path tree of link-state routing (linkstate.py)
+
+    Run from the repository root: python -m unittest discover -s tests
+'''
+import matplotlib
+matplotlib.use('Agg')
+
+import random
+import unittest
+
+from engine import SimEngine
+from linkstate import LinkStateRouter
+import routing
+
+
+def full_spf(router):
+    '''
+        Shortest paths over the LSDB of a router with routing.dijkstra
+
+        Return:
+            address -> (cost, first hop) of the reachable destinations
+    '''
+    adjacency = {}
+    for origin, (sequence, costs) in router.lsdb.items():
+        adjacency[origin] = [(address, cost, None) for address, cost in sorted(costs.items())]
+        for address in costs:
+            adjacency.setdefault(address, [])
+    adjacency.setdefault(router.address, [])
+    costs, previous = routing.dijkstra(adjacency, router.address, set(router.lsdb))
+    routes = {}
+    for address, cost in costs.items():
+        if address != router.address:
+            path = routing.shortest_path(previous, router.address, address)
+            routes[address] = (cost, path[0][0])
+    return routes
+
+
+class IncrementalSPFTest(unittest.TestCase):
+
+    def check(self, router):
+        expected = full_spf(router)
+        for address, (cost, hop) in expected.items():
+            self.assertAlmostEqual(router.dist[address], cost)
+            self.assertAlmostEqual(router.rt[address][0], cost)
+            self.assertEqual(router.rt[address][1], hop)
+        for address, (cost, hop) in router.rt.items():
+            if address != router.address and address not in expected:
+                # a destination which can no longer be reached keeps no usable route
+                self.assertEqual(cost, float('inf'), address)
+        self.assertEqual(set(router.dist), set(expected) | set([router.address]))
+
+    def random_lsdb(self, seed, routers, steps):
+        '''
+            Feed a router random LSAs which add, remove, raise and lower link costs,
+            and check its tree against a full Dijkstra after each of them
+        '''
+        rand = random.Random(seed)
+        names = ['10.0.0.%d' % i for i in xrange(routers)]
+        hosts = ['10.1.0.%d' % i for i in xrange(routers / 2)]
+        router = LinkStateRouter(SimEngine(0), 'R0', names[0])
+        links = dict((name, {}) for name in names)
+        for i, name in enumerate(names[1:]):
+            # a random tree first, then random chords
+            other = names[rand.randint(0, i)]
+            links[name][other] = links[other][name] = rand.uniform(0.01, 1.0)
+        for i in xrange(routers):
+            a, b = rand.sample(names, 2)
+            links[a][b] = rand.uniform(0.01, 1.0)
+        for host in hosts:
+            links[rand.choice(names)][host] = rand.uniform(0.01, 1.0)
+        sequence = dict((name, 0) for name in names)
+
+        def advertise(origin):
+            sequence[origin] += 1
+            router.installLSA((origin, sequence[origin], dict(links[origin])))
+
+        for name in rand.sample(names, routers):
+            advertise(name)
+            self.check(router)
+        for step in xrange(steps):
+            origin = rand.choice(names)
+            costs = links[origin]
+            for i in xrange(rand.randint(1, 3)):
+                action = rand.random()
+                if costs and action < 0.15:
+                    del costs[rand.choice(sorted(costs))]
+                elif action < 0.3:
+                    costs[rand.choice(names + hosts)] = rand.uniform(0.01, 1.0)
+                    costs.pop(origin, None)
+                elif costs:
+                    address = rand.choice(sorted(costs))
+                    costs[address] *= rand.choice([0.2, 0.5, 0.9, 1.1, 2.0, 5.0])
+            advertise(origin)
+            self.check(router)
+
+    def test_same_as_dijkstra(self):
+        for seed in xrange(20):
+            self.random_lsdb(seed, 12, 150)
+
+    def test_unreachable_destination(self):
+        router = LinkStateRouter(SimEngine(0), 'R0', 'r0')
+        router.installLSA(('r0', 1, {'r1': 1.0}))
+        router.installLSA(('r1', 1, {'r0': 1.0, 'r2': 1.0}))
+        router.installLSA(('r2', 1, {'r1': 1.0, 'h2': 0.5}))
+        self.assertEqual(router.rt['h2'], (2.5, 'r1'))
+        # r1 loses its link to r2: r2 and h2 can not be reached any more
+        router.installLSA(('r1', 2, {'r0': 1.0}))
+        self.assertEqual(router.rt['r2'][0], float('inf'))
+        self.assertEqual(router.rt['h2'][0], float('inf'))
+        self.assertEqual(router.rt['r1'], (1.0, 'r1'))
+        # and back
+        router.installLSA(('r1', 3, {'r0': 1.0, 'r2': 3.0}))
+        self.assertEqual(router.rt['h2'], (4.5, 'r1'))
+
+
+if __name__ == '__main__':
+    unittest.main()
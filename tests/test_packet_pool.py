@@ -0,0 +1,57 @@
+'''
+    Tests of the recycling of Data Packets (element.PacketPool)
+
+    Run from the repository root: python -m unittest discover -s tests
+'''
+import matplotlib
+matplotlib.use('Agg')
+
+import os
+import unittest
+
+from engine import SimEngine
+from parse import parse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CASE = os.path.join(ROOT, 'testcase2.txt')
+
+
+class Unreachable(object):
+    '''
+        Destination no router has a route to
+    '''
+    name = 'X'
+    address = '10.255.255.255'
+
+
+class PacketPoolTest(unittest.TestCase):
+
+    def test_same_records(self):
+        '''
+            A run recycling its packets records the same data as a run allocating them
+        '''
+        engines = {}
+        for pool in [False, True]:
+            engine = engines[pool] = SimEngine(10, pool_packets = pool)
+            parse(engine, CASE)
+            engine.run()
+        self.assertEqual(engines[True].recorder.category, engines[False].recorder.category)
+        self.assertEqual(engines[True].getFingerprint(), engines[False].getFingerprint())
+        pool = engines[True].packetPool
+        self.assertGreater(pool.reused, 10 * pool.allocated)
+
+    def test_release_without_route(self):
+        '''
+            A packet a router cannot forward goes back to the pool
+        '''
+        engine = SimEngine(10, pool_packets = True)
+        parser = parse(engine, CASE)
+        flow = parser.flows.values()[0]
+        router = parser.routers.values()[0]
+        packet = engine.packetPool.acquire(flow.source, Unreachable(), flow, 0, 1024, False, 0)
+        router.receiveData(packet)
+        self.assertEqual(engine.packetPool.free, [packet])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+'''
+    Tests of the parallel simulation (pdes.py)
+
+    Run from the repository root: python -m unittest discover -s tests
+'''
+import matplotlib
+matplotlib.use('Agg')
+
+import os
+import unittest
+
+from constants import CATE_PKTS_RECEIVED, CATE_CONTROL_BYTES
+from engine import SimEngine
+from parse import parse
+import pdes
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CASE = os.path.join(ROOT, 'testcase2.txt')
+
+
+def acked(recorder):
+    return dict((flow, content[-1][1]) for flow, content in recorder.category[CATE_PKTS_RECEIVED].items())
+
+
+class PartitionTest(unittest.TestCase):
+
+    def test_half_duplex_cut_links(self):
+        '''
+            Half-duplex cut links are refused, unless force_full_duplex: they are then simulated
+            as full duplex, and the overrides returned give the same model to a sequential run
+        '''
+        engine = SimEngine(0)
+        parser = parse(engine, CASE)
+        cuts = set(link.name for link in pdes.cut_links(parser, pdes.partition(parser, 2)))
+        self.assertTrue(cuts)
+
+        with self.assertRaises(ValueError) as raised:
+            pdes.run_partitioned(CASE, 6, 2, routing = 'static')
+        for name in cuts:
+            self.assertIn(name, str(raised.exception))
+
+        recorder, stats = pdes.run_partitioned(CASE, 6, 2, routing = 'static', force_full_duplex = True)
+        for name in cuts:
+            self.assertEqual(stats['link_overrides'][name], {'duplex': 'full'})
+
+        engine = SimEngine(6)
+        parse(engine, CASE, routing = 'static', link_overrides = stats['link_overrides'])
+        engine.run()
+        self.assertEqual(acked(recorder), acked(engine.recorder))
+
+    def assertMatchesSequential(self, routing, workers, maxtime = 10):
+        '''
+            All the data recorded before the tail at MAXTIME is the same as sequentially,
+            but the control bytes, counted per direction of the cut links
+        '''
+        tail = maxtime - 0.1
+        overrides = {'*': {'duplex': 'full'}}
+        recorder, stats = pdes.run_partitioned(CASE, maxtime, workers, routing = routing, link_overrides = overrides)
+        engine = SimEngine(maxtime)
+        parse(engine, CASE, routing = routing, link_overrides = overrides)
+        engine.run()
+        for cate, data in engine.recorder.category.items():
+            if cate == CATE_CONTROL_BYTES:
+                continue
+            for name in set(data) | set(recorder.category[cate]):
+                sequential = [sample for sample in data.get(name, []) if sample[0] < tail]
+                partitioned = [sample for sample in recorder.category[cate].get(name, []) if sample[0] < tail]
+                # a series may only be created by an event at MAXTIME
+                if sequential != [(0, 0)] or partitioned:
+                    self.assertEqual(sequential, partitioned, cate + ' ' + name)
+
+    def test_static_routing_matches(self):
+        self.assertMatchesSequential('static', 2)
+
+    def test_dynamic_routing_matches(self):
+        '''
+            Routing packets cross the cut links too: deliveries on both sides are ordered the same way
+        '''
+        self.assertMatchesSequential('dynamic', 2)
+        self.assertMatchesSequential('dynamic', 4)
+
+    def test_full_duplex_cut_links(self):
+        '''
+            No error and no override when the cut links are full duplex already
+        '''
+        overrides = {'*': {'duplex': 'full'}}
+        recorder, stats = pdes.run_partitioned(CASE, 2, 2, routing = 'static', link_overrides = overrides)
+        self.assertEqual(stats['link_overrides'], overrides)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+'''
+    Tests of the flows pinned to a path ("path" in a Flow section, Flow.setPath)
+
+    Run from the repository root: python -m unittest discover -s tests
+'''
+import matplotlib
+matplotlib.use('Agg')
+
+import os
+import tempfile
+import unittest
+
+from engine import SimEngine
+from errors import unknownObject
+from parse import parse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_with_path(path, routing = 'static', maxtime = 0):
+    '''
+        Parse testcase1 (H1 - R1 - R2|R3 - R4 - H2) with flow F1 pinned to path
+    '''
+    with open(os.path.join(ROOT, 'testcase1.txt')) as case:
+        content = case.read()
+    if path is not None:
+        content = content.replace('\tstart\t\t0.5\n', '\tstart\t\t0.5\n\tpath\t\t' + path + '\n')
+    caseFile = tempfile.NamedTemporaryFile(suffix = '.txt', delete = False)
+    try:
+        caseFile.write(content)
+        caseFile.close()
+        return parse(SimEngine(maxtime), caseFile.name, routing = routing)
+    finally:
+        os.remove(caseFile.name)
+
+
+def counting(send, sent, name):
+    '''
+        Link.send counting the packets sent on the link into sent[name]
+    '''
+    def wrapper(packet, sender):
+        sent[name] += 1
+        send(packet, sender)
+    return wrapper
+
+
+class SetPathTest(unittest.TestCase):
+
+    def assertRejected(self, path, message):
+        with self.assertRaises(unknownObject) as context:
+            parse_with_path(path)
+        self.assertIn(message, str(context.exception))
+
+    def test_unknown_router(self):
+        self.assertRejected('R1 R9 R4', 'unknown router R9')
+
+    def test_hops_not_adjacent(self):
+        self.assertRejected('R1 R4', 'no link between R1 and R4')
+
+    def test_wrong_endpoints(self):
+        self.assertRejected('R2 R4', 'no link between H1 and R2')
+        self.assertRejected('R1 R3', 'no link between H2 and R3')
+
+    def test_router_twice(self):
+        self.assertRejected('R1 R2 R1 R3 R4', 'goes through a router twice')
+
+    def test_empty_or_not_router(self):
+        parser = parse_with_path(None)
+        flow = parser.flows['F1']
+        self.assertRaises(ValueError, flow.setPath, [])
+        self.assertRaises(ValueError, flow.setPath, [parser.routers['R1'], parser.hosts['H2'], parser.routers['R4']])
+        # a rejected path leaves the flow routed by the tables
+        self.assertIsNone(flow.path)
+        self.assertIsNone(flow.hops)
+
+    def test_pinned_path_overrides_routes(self):
+        '''
+            Pinned to the branch R1 does not route H2 through, data and ACKs take it
+        '''
+        parser = parse_with_path(None)
+        nextHop = parser.routers['R1'].rt[parser.hosts['H2'].address][1]
+        unused = 'R3' if nextHop == parser.routers['R2'].address else 'R2'
+        used = 'R2' if unused == 'R3' else 'R3'
+
+        parser = parse_with_path('R1 %s R4' % unused, maxtime = 3)
+        self.assertEqual([router.name for router in parser.flows['F1'].path], ['R1', unused, 'R4'])
+        # the routing table still points the other way
+        self.assertEqual(parser.routers['R1'].rt[parser.hosts['H2'].address][1], parser.routers[used].address)
+        sent = dict((name, 0) for name in parser.links)
+        for name, link in parser.links.items():
+            link.send = counting(link.send, sent, name)
+        parser.engine.run()
+        self.assertGreater(parser.flows['F1'].tcp.acknowledgedPacketID, 0)
+        links = dict((frozenset([link.node1.name, link.node2.name]), name) for name, link in parser.links.items())
+        for router in ['R1', 'R4']:
+            self.assertGreater(sent[links[frozenset([router, unused])]], 0)
+            self.assertEqual(sent[links[frozenset([router, used])]], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
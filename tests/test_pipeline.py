@@ -0,0 +1,86 @@
+'''
+    Tests of the pipelined transmitters (element.Transmitter)
+
+    Run from the repository root: python -m unittest discover -s tests
+'''
+import matplotlib
+matplotlib.use('Agg')
+
+import os
+import unittest
+
+from constants import CATE_PKTS_RECEIVED, CATE_LINK_RATE, CATE_BUFFER_OCCUPANCY, CATE_PACKET_LOSS
+from engine import SimEngine
+from parse import parse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CASE = os.path.join(ROOT, 'testcase0.txt')
+
+
+def run(pipelined, aqm, counts = None):
+    '''
+        Run testcase0 (one link) with small buffers and the given queue discipline
+
+        Args:
+            pipelined: mode of the transmitters
+            aqm: queue discipline of the link
+            counts: if given, dict in which to count the transmissions started and
+                    the packets dropped by the queue discipline before the current time
+    '''
+    engine = SimEngine(10)
+    parser = parse(engine, CASE, link_overrides = {'L1': {'aqm': aqm, 'buffer': 16}})
+    for link in parser.links.values():
+        link.setPipelined(pipelined)
+    if counts is not None:
+        for link in parser.links.values():
+            for transmitter in link.transmitters:
+                countLate(engine, transmitter, 'decide', counts, 'late_transmissions')
+                for buffer, receiver in transmitter.ports:
+                    countLate(engine, buffer, 'drop', counts, 'late_drops')
+    engine.run()
+    return engine.recorder
+
+
+def countLate(engine, element, method, counts, key):
+    '''
+        Wrap a method of an element taking the time as second argument, counting the calls for an earlier time
+    '''
+    original = getattr(element, method)
+    counts[key] = 0
+    def wrapper(*args):
+        if args[1 if method == 'drop' else 0] < engine.getCurrentTime():
+            counts[key] += 1
+        return original(*args)
+    setattr(element, method, wrapper)
+
+
+class PipelineTest(unittest.TestCase):
+
+    def assertSameRecords(self, aqm):
+        counts = {}
+        pipelined = run(True, aqm, counts)
+        plain = run(False, aqm)
+        for cate in [CATE_PKTS_RECEIVED, CATE_LINK_RATE, CATE_BUFFER_OCCUPANCY, CATE_PACKET_LOSS]:
+            self.assertEqual(pipelined.category[cate], plain.category[cate], aqm + ' ' + cate)
+        return counts
+
+    def test_drop_tail(self):
+        '''
+            Deliveries, link rate and buffer occupancy are the same as with a transmitter which
+            wakes up at every transmission, including transmissions started back to back by catchUp
+        '''
+        counts = self.assertSameRecords('droptail')
+        self.assertGreater(counts['late_transmissions'], 0)
+
+    def test_aqm_drops_during_catch_up(self):
+        '''
+            Same records when the queue discipline drops packets while catchUp starts late transmissions
+        '''
+        lateDrops = 0
+        for aqm in ['red', 'codel', 'pie']:
+            lateDrops += self.assertSameRecords(aqm)['late_drops']
+        self.assertGreater(lateDrops, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+'''
+    Tests of the recorder (record.py)
+
+    Run from the repository root: python -m unittest discover -s tests
+'''
+import matplotlib
+matplotlib.use('Agg')
+
+import os
+import random
+import unittest
+
+from constants import CATE_CONTROL_BYTES, CONTROL_BYTES_INTERVAL
+from engine import SimEngine
+from parse import parse
+from record import Record
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Named(object):
+
+    def __init__(self, name):
+        self.name = name
+
+
+class ControlBytesTest(unittest.TestCase):
+
+    def test_summed_per_interval(self):
+        rand = random.Random(2)
+        recorder = Record()
+        links = [Named('L1'), Named('L2')]
+        sums = {}
+        time = 0.0
+        for i in xrange(2000):
+            time += rand.expovariate(100.0)
+            link = rand.choice(links)
+            size = rand.choice([64, 1024, 20 + 12 * rand.randint(1, 4)])
+            recorder.record_control_bytes(link, time, size)
+            key = (link.name, int(time / CONTROL_BYTES_INTERVAL))
+            sums[key] = sums.get(key, 0) + size
+        for link in links:
+            content = recorder.category[CATE_CONTROL_BYTES][link.name]
+            self.assertEqual(content[0], (0, 0))
+            expected = sorted((index, size) for (name, index), size in sums.items() if name == link.name)
+            self.assertEqual([(int(round(start / CONTROL_BYTES_INTERVAL)), size) for start, size in content[1:]],
+                             expected)
+
+    def test_dynamic_run(self):
+        '''
+            One sample per link and interval at most, and all the bytes of the routers are there
+        '''
+        maxtime = 12
+        engine = SimEngine(maxtime)
+        parser = parse(engine, os.path.join(ROOT, 'testcase1.txt'))
+        engine.run()
+        control = engine.recorder.category[CATE_CONTROL_BYTES]
+        for content in control.values():
+            self.assertLessEqual(len(content), maxtime / CONTROL_BYTES_INTERVAL + 2)
+        routers = sum(router.routingBytes for router in parser.routers.values())
+        self.assertGreaterEqual(sum(size for content in control.values() for start, size in content), routers)
+
+
+if __name__ == '__main__':
+    unittest.main()
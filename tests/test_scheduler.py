@@ -0,0 +1,95 @@
+'''
+    Tests of the event schedulers (scheduler.py)
+
+    Run from the repository root: python -m unittest discover -s tests
+'''
+import random
+import unittest
+
+from scheduler import HeapScheduler, CalendarScheduler
+
+
+class FakeEvent(object):
+
+    def __init__(self, time, priority, seq):
+        self.time = time
+        self.priority = priority
+        self.order = ''
+        self.seq = seq
+        self.cancelled = False
+
+
+class CalendarSchedulerTest(unittest.TestCase):
+
+    def check_same_order(self, seed, rounds, spread):
+        '''
+            Drive both schedulers with the same random pushes, cancellations and pops,
+            as SimEngine does, and compare the events popped
+
+            Return:
+                bucket counts the calendar went through
+        '''
+        rand = random.Random(seed)
+        heap, calendar = HeapScheduler(), CalendarScheduler()
+        pending = []
+        seq = 0
+        now = 0.0
+        nbuckets = set([calendar.nbuckets])
+        for i in xrange(rounds):
+            # bursts of pushes grow the queue, runs of pops shrink it again
+            burst = rand.choice([1, 1, 2, 5, 40]) if i % 400 < 250 else rand.choice([0, 0, 1])
+            for j in xrange(burst):
+                # ties on the time stamp are common, broken by priority then seq
+                time = now + round(rand.expovariate(1.0 / spread), 3)
+                event = FakeEvent(time, rand.randint(0, 4), seq)
+                seq += 1
+                heap.push(event)
+                calendar.push(event)
+                pending.append(event)
+            if pending and rand.random() < 0.2:
+                rand.choice(pending).cancelled = True
+            if rand.random() < 0.02:
+                heap.discard_cancelled()
+                calendar.discard_cancelled()
+                pending = [event for event in pending if not event.cancelled]
+            for j in xrange(rand.choice([0, 1, 1, 2, 3])):
+                if not len(heap):
+                    break
+                self.assertIs(calendar.peek(), heap.peek())
+                event = heap.pop()
+                self.assertIs(calendar.pop(), event)
+                self.assertGreaterEqual(event.time, now)
+                now = event.time
+                pending.remove(event)
+            self.assertEqual(len(calendar), len(heap))
+            nbuckets.add(calendar.nbuckets)
+        while len(heap):
+            self.assertIs(calendar.pop(), heap.pop())
+        self.assertEqual(len(calendar), 0)
+        return nbuckets
+
+    def test_same_order_as_heap(self):
+        for seed in xrange(3):
+            nbuckets = self.check_same_order(seed, 1500, 0.01)
+            # the queue went through several resizes, up and down
+            self.assertGreater(len(nbuckets), 4)
+
+    def test_sparse_events(self):
+        '''
+            Events far apart leave the coming year empty, pop jumps to the earliest one
+        '''
+        self.check_same_order(7, 1500, 50.0)
+
+    def test_push_before_current_bucket(self):
+        calendar = CalendarScheduler()
+        for seq, time in enumerate([5.0, 5.5, 7.0]):
+            calendar.push(FakeEvent(time, 0, seq))
+        self.assertEqual(calendar.pop().time, 5.0)
+        # 2.0 goes to another bucket than 5.5, which is in the current one
+        calendar.push(FakeEvent(2.0, 0, 3))
+        self.assertEqual([calendar.pop().time for i in xrange(3)], [2.0, 5.5, 7.0])
+        self.assertRaises(IndexError, calendar.pop)
+
+
+if __name__ == '__main__':
+    unittest.main()
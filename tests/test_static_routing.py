@@ -0,0 +1,94 @@
+'''
+    Tests of the static routing tables (routing.static_tables)
+
+    Run from the repository root: python -m unittest discover -s tests
+'''
+import matplotlib
+matplotlib.use('Agg')
+
+import os
+import tempfile
+import unittest
+
+import routing
+import topology
+from engine import SimEngine
+from parse import parse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load(name):
+    '''
+        Parse a testcase file, or a generated topology given as (kind, n, m)
+    '''
+    engine = SimEngine(0)
+    if isinstance(name, str):
+        return parse(engine, os.path.join(ROOT, name))
+    kind, n, m = name
+    caseFile = tempfile.NamedTemporaryFile(suffix = '.txt', delete = False)
+    caseFile.close()
+    topology.TOPOLOGIES[kind](n, m).write(caseFile.name)
+    try:
+        return parse(engine, caseFile.name)
+    finally:
+        os.remove(caseFile.name)
+
+
+def all_pairs(parser, metric):
+    '''
+        Shortest path costs by Floyd-Warshall over the routers, hosts being ends only
+
+        Return:
+            (source name, destination name) -> cost, for the routers as sources
+    '''
+    names = sorted(parser.routers) + sorted(parser.hosts)
+    inf = float('inf')
+    distance = dict(((a, b), 0 if a == b else inf) for a in names for b in names)
+    for link in parser.links.values():
+        cost = routing.link_cost(link, metric)
+        for a, b in [(link.node1.name, link.node2.name), (link.node2.name, link.node1.name)]:
+            distance[(a, b)] = min(distance[(a, b)], cost)
+    for via in sorted(parser.routers):
+        for a in names:
+            for b in names:
+                if distance[(a, via)] + distance[(via, b)] < distance[(a, b)]:
+                    distance[(a, b)] = distance[(a, via)] + distance[(via, b)]
+    return distance
+
+
+class StaticTablesTest(unittest.TestCase):
+
+    def test_tables_match_shortest_paths(self):
+        '''
+            Every route costs the shortest path, and its next hop is a neighbor on a shortest path
+        '''
+        for name in ['testcase1.txt', 'testcase2.txt', ('random_graph', 16, 16), ('fat_tree', 4, 8)]:
+            parser = load(name)
+            nodes = dict(parser.hosts)
+            nodes.update(parser.routers)
+            byAddress = dict((node.address, nodeName) for nodeName, node in nodes.items())
+            for metric in ['delay', 'hops']:
+                distance = all_pairs(parser, metric)
+                tables = routing.static_tables(parser, metric)
+                self.assertEqual(sorted(tables), sorted(parser.routers))
+                for routerName, table in tables.items():
+                    router = parser.routers[routerName]
+                    reachable = set(destination for destination in nodes
+                                    if distance[(routerName, destination)] < float('inf'))
+                    self.assertEqual(set(byAddress[address] for address in table), reachable)
+                    for address, (cost, nextHop) in table.items():
+                        destination = byAddress[address]
+                        label = '%s %s %s -> %s' % (name, metric, routerName, destination)
+                        self.assertAlmostEqual(cost, distance[(routerName, destination)], msg = label)
+                        if destination == routerName:
+                            self.assertEqual(nextHop, router.address, label)
+                            continue
+                        self.assertIn(nextHop, router.neighbors, label)
+                        link = router.neighbors[nextHop][0]
+                        self.assertAlmostEqual(routing.link_cost(link, metric)
+                                               + distance[(byAddress[nextHop], destination)], cost, msg = label)
+
+
+if __name__ == '__main__':
+    unittest.main()
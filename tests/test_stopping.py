@@ -0,0 +1,110 @@
+'''
+    Tests of the stop conditions (stopping.py)
+
+    Run from the repository root: python -m unittest discover -s tests
+'''
+import matplotlib
+matplotlib.use('Agg')
+
+import random
+import unittest
+
+from constants import CATE_WINDOW_SIZE
+from stopping import MetricConverged
+
+
+class FakeRecorder(object):
+
+    def __init__(self, content):
+        self.category = {CATE_WINDOW_SIZE: {'F1': content}}
+
+
+class FakeEngine(object):
+
+    def __init__(self, content, now):
+        self.recorder = FakeRecorder(content)
+        self.now = now
+
+    def getCurrentTime(self):
+        return self.now
+
+
+class CountingList(list):
+    '''
+        List counting the samples read
+    '''
+    def __init__(self, content):
+        list.__init__(self, content)
+        self.reads = 0
+
+    def __getitem__(self, index):
+        self.reads += 1
+        return list.__getitem__(self, index)
+
+    def __getslice__(self, i, j):
+        result = list.__getslice__(self, i, j)
+        self.reads += len(result)
+        return result
+
+    def __iter__(self):
+        for sample in list.__iter__(self):
+            self.reads += 1
+            yield sample
+
+    def __reversed__(self):
+        for sample in list.__reversed__(self):
+            self.reads += 1
+            yield sample
+
+
+def converged(content, now, window, tolerance):
+    '''
+        Definition of MetricConverged, over the whole series
+    '''
+    if len(content) < 2 or now - content[1][0] < window:
+        return False
+    start = now - window
+    values = [value for (time, value) in content if time >= start]
+    before = [value for (time, value) in content if time < start]
+    if before:
+        values.append(before[-1])
+    mean = 1.0 * sum(values) / len(values)
+    return max(values) - min(values) <= tolerance * abs(mean)
+
+
+def series(rand, length):
+    '''
+        Recorder series: the (0, 0) placeholder, then samples in time order, some at the same time
+    '''
+    content = [(0, 0)]
+    time = 0.0
+    for i in xrange(length):
+        if rand.random() < 0.8:
+            time += rand.random() * 0.1
+        content.append((time, rand.choice([10, 10.2, 10.4, 11, 20])))
+    return content
+
+
+class MetricConvergedTest(unittest.TestCase):
+
+    def test_same_as_definition(self):
+        rand = random.Random(3)
+        for i in xrange(300):
+            content = series(rand, rand.randint(0, 60))
+            end = content[-1][0]
+            for now in [end, end + rand.random(), rand.random() * (end + 1), 1.0]:
+                window = rand.choice([0.1, 0.5, 1.0, 2.0])
+                tolerance = rand.choice([0.01, 0.05, 0.5])
+                condition = MetricConverged(CATE_WINDOW_SIZE, 'F1', window, tolerance)
+                self.assertEqual(condition(FakeEngine(content, now)), converged(content, now, window, tolerance))
+
+    def test_reads_the_window_only(self):
+        content = [(0, 0)] + [(i * 0.001, 10) for i in xrange(100000)]
+        counting = CountingList(content)
+        condition = MetricConverged(CATE_WINDOW_SIZE, 'F1', window = 0.01)
+        self.assertTrue(condition(FakeEngine(counting, content[-1][0])))
+        self.assertLess(counting.reads, 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
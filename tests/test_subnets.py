@@ -0,0 +1,115 @@
+'''
+    Tests of the routing with subnets: aggregation of the static tables (routing.py)
+    and longest-prefix forwarding (Router.receiveData)
+
+    Run from the repository root: python -m unittest discover -s tests
+'''
+import matplotlib
+matplotlib.use('Agg')
+
+import os
+import tempfile
+import unittest
+
+from addressing import covers
+from constants import PACKET_SIZE
+from element import DataPacket
+from engine import SimEngine
+from parse import parse
+import routing
+import topology
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def campus_parser(routing_mode):
+    caseFile = tempfile.NamedTemporaryFile(suffix = '.txt', delete = False)
+    caseFile.close()
+    try:
+        topology.campus(8, 4, 3, subnets = True).write(caseFile.name)
+        return parse(SimEngine(0), caseFile.name, routing = routing_mode)
+    finally:
+        os.remove(caseFile.name)
+
+
+def owner(parser, address):
+    '''
+        Router owning a subnet containing address, None if there is none
+    '''
+    for router in parser.routers.values():
+        for prefix in router.subnets:
+            if covers(prefix, address):
+                return router, prefix
+    return None
+
+
+class AggregateTablesTest(unittest.TestCase):
+
+    def test_covered_addresses_replaced(self):
+        parser = campus_parser('dynamic')
+        tables = routing.static_tables(parser)
+        aggregated = routing.aggregate_tables(parser, tables)
+        for name, table in tables.items():
+            router = parser.routers[name]
+            expected = {}
+            for destAddr, route in table.items():
+                found = owner(parser, destAddr)
+                if found is None or found[0] is router:
+                    expected[destAddr] = route
+                else:
+                    # the route to a subnet is the route to its router
+                    expected[found[1]] = table[found[0].address]
+            self.assertEqual(aggregated[name], expected, name)
+            # one entry per other router, plus the router itself and its own hosts
+            self.assertLess(len(aggregated[name]), len(table))
+
+    def test_without_subnets(self):
+        parser = parse(SimEngine(0), os.path.join(ROOT, 'testcase2.txt'))
+        tables = routing.static_tables(parser)
+        self.assertIs(routing.aggregate_tables(parser, tables), tables)
+
+
+class PrefixForwardingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = campus_parser('static')
+        self.sent = []
+        for link in self.parser.links.values():
+            link.send = lambda packet, sender, link = link: self.sent.append(link)
+        self.flow = self.parser.flows.values()[0]
+
+    def forward(self, router, destination):
+        '''
+            Link on which router sends a data packet to destination, None if it drops it
+        '''
+        del self.sent[:]
+        router.receiveData(DataPacket(self.flow.source, destination, self.flow, 0, PACKET_SIZE, False, 0))
+        self.assertLessEqual(len(self.sent), 1)
+        return self.sent[0] if self.sent else None
+
+    def test_longest_prefix_route(self):
+        parser = self.parser
+        for router in parser.routers.values():
+            for host in parser.hosts.values():
+                hostRouter, prefix = owner(parser, host.address)
+                link = self.forward(router, host)
+                if hostRouter is router:
+                    # own hosts have their own route, straight to them
+                    self.assertIn(host.address, router.rt)
+                    self.assertIs(link, host.link)
+                else:
+                    self.assertNotIn(host.address, router.fib)
+                    self.assertEqual(router.prefixes.lookup(host.address), prefix)
+                    self.assertIs(link, router.fib[prefix][0])
+                    # the same link as to the router owning the subnet
+                    self.assertIs(link, self.forward(router, hostRouter))
+
+    def test_address_without_route(self):
+        router = self.parser.routers.values()[0]
+        stranger = type('Stranger', (object,), {'address': '192.168.0.1'})()
+        self.assertIsNone(router.prefixes.lookup(stranger.address))
+        self.assertIsNone(self.forward(router, stranger))
+
+
+if __name__ == '__main__':
+    unittest.main()
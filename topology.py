@@ -0,0 +1,291 @@
+'''
+    Synthetic topologies, written in the testcase .txt format read by parse.py
+
+    TopologyBuilder collects hosts, routers, links and flows and writes them out.
+    The generators below build scalable topologies with n routers and m flows:
+        dumbbell, parking_lot, fat_tree, random_graph, shared_hosts, campus
+    Every flow gets its own pair of hosts, attached to the routers picked for it,
+    except in shared_hosts where all the flows run between the same two hosts, and
+    in campus where every router has CAMPUS_HOSTS hosts and flows join random ones.
+    With subnets = True, every router owns a /24 subnet and its hosts are numbered in it.
+
+    Usage: python topology.py kind n m output.txt [subnets]
+'''
+import random
+import sys
+
+# hosts per router of the campus topology
+CAMPUS_HOSTS = 32
+
+
+class TopologyBuilder(object):
+    '''
+        Programmatic builder of a testcase
+
+        Attributes:
+            hosts: list of (ID, IP)
+            routers: list of (ID, IP)
+            subnets: router ID -> its subnet, None if the routers own no subnet
+            subnetHosts: router ID -> number of hosts numbered in its subnet
+            links: list of (ID, node1, node2, rate in Mbps, delay in ms, buffer in kB)
+            flows: list of (ID, src, dst, data_amt in MB, start in s)
+            paths: flow ID -> router IDs of the path it is pinned to, for the pinned flows
+    '''
+    def __init__(self, name = 'synthetic', subnets = False):
+        self.name = name
+        self.hosts = []
+        self.routers = []
+        self.subnets = {} if subnets else None
+        self.subnetHosts = {}
+        self.links = []
+        self.flows = []
+        self.paths = {}
+
+    def add_host(self, name = None, router = None):
+        '''
+            Add a host, IP addresses are given in order: 10.0.x.y,
+            or in the subnet of router (the router it will be attached to) if the routers own subnets
+        '''
+        i = len(self.hosts) + 1
+        name = name or 'H%d' % i
+        if self.subnets is not None and router is not None:
+            count = self.subnetHosts[router] + 1
+            if count > 253:
+                raise ValueError('subnet of ' + router + ' is full')
+            self.subnetHosts[router] = count
+            self.hosts.append((name, self.subnets[router].split('/')[0][:-1] + str(count + 1)))
+        else:
+            self.hosts.append((name, '10.0.%d.%d' % (i / 250, i % 250 + 1)))
+        return name
+
+    def add_router(self, name = None):
+        '''
+            Add a router, IP addresses are given in order: 10.1.x.y,
+            or the first one of its subnet 10.x.y.0/24 (x from 16) if the routers own subnets
+        '''
+        i = len(self.routers) + 1
+        name = name or 'R%d' % i
+        if self.subnets is not None:
+            subnet = '10.%d.%d.0' % (16 + i / 256, i % 256)
+            self.subnets[name] = subnet + '/24'
+            self.subnetHosts[name] = 0
+            self.routers.append((name, subnet[:-1] + '1'))
+        else:
+            self.routers.append((name, '10.1.%d.%d' % (i / 250, i % 250 + 1)))
+        return name
+
+    def add_link(self, node1, node2, rate = 10, delay = 10, buffer = 64):
+        '''
+            Add a link between two nodes
+        '''
+        name = 'L%d' % (len(self.links) + 1)
+        self.links.append((name, node1, node2, rate, delay, buffer))
+        return name
+
+    def add_flow(self, src, dst, data_amt = 1, start = 1.0, path = None):
+        '''
+            Add a flow between two hosts, pinned to path (router IDs) if it is given
+        '''
+        name = 'F%d' % (len(self.flows) + 1)
+        self.flows.append((name, src, dst, data_amt, start))
+        if path:
+            self.paths[name] = list(path)
+        return name
+
+    def add_host_flow(self, router1, router2, data_amt = 1, start = 1.0, rate = 12.5):
+        '''
+            Attach a new host to each router and add a flow between them
+        '''
+        src = self.add_host(router = router1)
+        dst = self.add_host(router = router2)
+        self.add_link(src, router1, rate = rate)
+        self.add_link(router2, dst, rate = rate)
+        return self.add_flow(src, dst, data_amt, start)
+
+    def text(self):
+        '''
+            Get the testcase in the .txt format
+        '''
+        lines = ['// ' + self.name, '// data_amt: MB, start: s, rate: Mbps, delay: ms, buffer: kB', '']
+        for title, objects in [('Host', self.hosts), ('Router', self.routers)]:
+            if objects:
+                lines.append(title)
+                for name, ip in objects:
+                    lines += ['\tID\t\t' + name, '\tIP\t\t' + ip]
+                    if title == 'Router' and self.subnets is not None:
+                        lines.append('\tsubnet\t\t' + self.subnets[name])
+                lines.append('')
+        lines.append('Link')
+        for name, node1, node2, rate, delay, buffer in self.links:
+            lines += ['\tID\t\t' + name, '\trate\t\t%s' % rate, '\tdelay\t\t%s' % delay,
+                      '\tbuffer\t\t%s' % buffer, '\tconnection\t%s %s' % (node1, node2)]
+        lines += ['', 'Flow']
+        for name, src, dst, data_amt, start in self.flows:
+            lines += ['\tID\t\t' + name, '\tsrc\t\t' + src, '\tdst\t\t' + dst,
+                      '\tdata_amt\t%s' % data_amt, '\tstart\t\t%s' % start]
+            if name in self.paths:
+                lines.append('\tpath\t\t' + ' '.join(self.paths[name]))
+        lines += ['', '// end', '']
+        return '\n'.join(lines)
+
+    def write(self, file_name):
+        '''
+            Write the testcase into a .txt file
+        '''
+        with open(file_name, 'w') as caseFile:
+            caseFile.write(self.text())
+        return file_name
+
+
+
+def _flow_start(i):
+    '''
+        Start times of the flows are staggered by 0.1s
+    '''
+    return 0.5 + 0.1 * i
+
+
+def dumbbell(n, m, data_amt = 1, subnets = False):
+    '''
+        Chain of n routers (at least 2), all m flows cross the whole chain
+        from the first router to the last one
+    '''
+    builder = TopologyBuilder('dumbbell n=%d m=%d' % (n, m), subnets)
+    routers = [builder.add_router() for _ in xrange(max(2, n))]
+    for i in xrange(len(routers) - 1):
+        builder.add_link(routers[i], routers[i+1])
+    for i in xrange(m):
+        builder.add_host_flow(routers[0], routers[-1], data_amt, _flow_start(i))
+    return builder
+
+
+def parking_lot(n, m, data_amt = 1, subnets = False):
+    '''
+        Chain of n routers, flow i enters at router i and leaves 2 routers further,
+        so that every link of the chain is shared by overlapping flows
+    '''
+    builder = TopologyBuilder('parking lot n=%d m=%d' % (n, m), subnets)
+    routers = [builder.add_router() for _ in xrange(max(2, n))]
+    for i in xrange(len(routers) - 1):
+        builder.add_link(routers[i], routers[i+1])
+    for i in xrange(m):
+        first = i % (len(routers) - 1)
+        last = min(first + 2, len(routers) - 1)
+        builder.add_host_flow(routers[first], routers[last], data_amt, _flow_start(i))
+    return builder
+
+
+def fat_tree(k, m, data_amt = 1, seed = 0, subnets = False):
+    '''
+        k-ary fat tree (k even): (k/2)^2 core routers, k pods of k/2 aggregation
+        and k/2 edge routers, i.e. 5k^2/4 routers. Flows join random edge routers.
+    '''
+    k = max(2, k - k % 2)
+    half = k / 2
+    builder = TopologyBuilder('fat tree k=%d m=%d' % (k, m), subnets)
+    cores = [builder.add_router('C%d' % i) for i in xrange(half * half)]
+    edges = []
+    for pod in xrange(k):
+        aggs = [builder.add_router('A%d_%d' % (pod, i)) for i in xrange(half)]
+        pod_edges = [builder.add_router('E%d_%d' % (pod, i)) for i in xrange(half)]
+        for i, agg in enumerate(aggs):
+            for edge in pod_edges:
+                builder.add_link(agg, edge)
+            for j in xrange(half):
+                builder.add_link(agg, cores[i * half + j])
+        edges += pod_edges
+    rand = random.Random(seed)
+    for i in xrange(m):
+        src, dst = rand.sample(edges, 2)
+        builder.add_host_flow(src, dst, data_amt, _flow_start(i))
+    return builder
+
+
+def random_graph(n, m, degree = 3, data_amt = 1, seed = 0, subnets = False):
+    '''
+        Random connected graph of n routers: a random spanning tree plus random
+        extra links up to an average degree of `degree`. Flows join random routers.
+    '''
+    rand = random.Random(seed)
+    builder = TopologyBuilder('random graph n=%d m=%d' % (n, m), subnets)
+    routers = [builder.add_router() for _ in xrange(max(2, n))]
+    edges = set()
+    for i in xrange(1, len(routers)):
+        edges.add((rand.randrange(i), i))
+    target = max(len(edges), len(routers) * degree / 2)
+    tries = 0
+    while len(edges) < target and tries < 10 * target:
+        tries += 1
+        a, b = sorted(rand.sample(xrange(len(routers)), 2))
+        edges.add((a, b))
+    for a, b in sorted(edges):
+        builder.add_link(routers[a], routers[b], delay = rand.choice([5, 10, 20]))
+    for i in xrange(m):
+        src, dst = rand.sample(routers, 2)
+        builder.add_host_flow(src, dst, data_amt, _flow_start(i))
+    return builder
+
+
+def shared_hosts(n, m, data_amt = 1, subnets = False):
+    '''
+        Chain of n routers with one host at each end, all m flows run between these
+        two hosts and start within 0.1s: many concurrent flows per host
+    '''
+    builder = TopologyBuilder('shared hosts n=%d m=%d' % (n, m), subnets)
+    routers = [builder.add_router() for _ in xrange(max(2, n))]
+    for i in xrange(len(routers) - 1):
+        builder.add_link(routers[i], routers[i+1])
+    src = builder.add_host(router = routers[0])
+    dst = builder.add_host(router = routers[-1])
+    builder.add_link(src, routers[0], rate = 12.5)
+    builder.add_link(routers[-1], dst, rate = 12.5)
+    for i in xrange(m):
+        builder.add_flow(src, dst, data_amt, 0.5 + 0.1 * i / max(1, m))
+    return builder
+
+
+def campus(n, m, hosts = CAMPUS_HOSTS, degree = 3, data_amt = 1, seed = 0, subnets = False):
+    '''
+        Random graph of n routers (as random_graph) with `hosts` hosts on every router,
+        i.e. n * hosts addresses, and m flows between random hosts of different routers
+    '''
+    rand = random.Random(seed)
+    builder = random_graph(n, 0, degree, data_amt, seed, subnets)
+    builder.name = 'campus n=%d m=%d hosts=%d' % (n, m, hosts)
+    routers = [name for name, ip in builder.routers]
+    attached = {}
+    for router in routers:
+        attached[router] = []
+        for _ in xrange(hosts):
+            host = builder.add_host(router = router)
+            builder.add_link(host, router, rate = 12.5)
+            attached[router].append(host)
+    for i in xrange(m):
+        src, dst = rand.sample(routers, 2)
+        builder.add_flow(rand.choice(attached[src]), rand.choice(attached[dst]), data_amt, _flow_start(i))
+    return builder
+
+
+'''
+    Available generators: kind -> function(n, m)
+'''
+TOPOLOGIES = {
+    'dumbbell': dumbbell,
+    'parking_lot': parking_lot,
+    'fat_tree': fat_tree,
+    'random_graph': random_graph,
+    'shared_hosts': shared_hosts,
+    'campus': campus,
+}
+
+
+def main():
+    if len(sys.argv) < 5 or sys.argv[1] not in TOPOLOGIES:
+        print 'Usage: python topology.py {} n m output.txt [subnets]'.format('|'.join(sorted(TOPOLOGIES)))
+        return
+    TOPOLOGIES[sys.argv[1]](int(sys.argv[2]), int(sys.argv[3]),
+                            subnets = sys.argv[5:] == ['subnets']).write(sys.argv[4])
+
+
+if __name__ == '__main__':
+    main()
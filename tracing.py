@@ -0,0 +1,214 @@
+'''
+    Structured trace of the simulation
+
+    The elements, the TCPs and the parser report what they do through the module
+    tracer instead of printing it. A trace record is
+        (time, level, category, event, fields)
+    e.g. (3.2, TRACE_INFO, 'buffer', 'packet_lost', {'buffer': 'L1a', 'pck_id': 17, ...}).
+
+    The tracer is off by default. Call sites test tracer.enabled before building a
+    record, so a disabled trace costs one attribute lookup:
+        if tracer.enabled:
+            tracer.log('buffer', TRACE_INFO, now, 'packet_lost', pck_id = packet.pck_id)
+    Call sites whose fields are costly to build (e.g. a copy of a routing table) also
+    test tracer.wants(category, level), so that they only build records which are kept.
+    Once enabled, the records of the categories and levels selected are kept in an
+    in-memory ring buffer (the last ringSize records) and written to the sinks:
+        tracer.enable(TRACE_DEBUG, categories = ['buffer', 'tcp'])
+        tracer.addSink(JsonlSink('trace.jsonl'))
+
+    Categories: 'parse', 'buffer', 'routing', 'tcp'
+    Usage: python tracing.py trace.bin  (print a binary trace as JSON lines)
+'''
+import collections
+import json
+import marshal
+import sys
+
+
+TRACE_DEBUG = 10
+TRACE_INFO = 20
+TRACE_WARNING = 30
+TRACE_ERROR = 40
+
+TRACE_LEVEL_NAMES = {
+    TRACE_DEBUG: 'debug',
+    TRACE_INFO: 'info',
+    TRACE_WARNING: 'warning',
+    TRACE_ERROR: 'error',
+}
+
+
+class Tracer(object):
+    '''
+        Filter trace records and dispatch them to the ring buffer and the sinks
+
+        Attributes:
+            enabled: False when nothing is traced, tested by the call sites
+            level: lowest level traced
+            categories: set of the categories traced, None for all of them
+            ring: the last records traced, deque of (time, level, category, event, fields)
+            sinks: objects with write(record) and close()
+    '''
+    def __init__(self):
+        self.enabled = False
+        self.level = TRACE_INFO
+        self.categories = None
+        self.ring = collections.deque(maxlen = 0)
+        self.sinks = []
+
+    def enable(self, level = TRACE_INFO, categories = None, ringSize = 10000):
+        '''
+            Start tracing
+
+            Args:
+                level: lowest level traced
+                categories: categories traced, None for all of them
+                ringSize: number of records kept in memory
+        '''
+        self.level = level
+        self.categories = set(categories) if categories is not None else None
+        self.ring = collections.deque(self.ring, maxlen = ringSize)
+        self.enabled = True
+
+    def disable(self):
+        '''
+            Stop tracing and close the sinks, the ring buffer is kept
+        '''
+        self.enabled = False
+        for sink in self.sinks:
+            sink.close()
+        self.sinks = []
+
+    def addSink(self, sink):
+        self.sinks.append(sink)
+        return sink
+
+    def wants(self, category, level):
+        '''
+            Check whether a record of the category and level would be traced
+        '''
+        return self.enabled and level >= self.level and (self.categories is None or category in self.categories)
+
+    def log(self, category, level, time, event, **fields):
+        '''
+            Trace a record if its category and level are selected
+        '''
+        if level < self.level or (self.categories is not None and category not in self.categories):
+            return
+        record = (time, level, category, event, fields)
+        self.ring.append(record)
+        for sink in self.sinks:
+            sink.write(record)
+
+    def records(self, category = None):
+        '''
+            Get the records of the ring buffer, of one category or all of them
+        '''
+        return [record for record in self.ring if category is None or record[2] == category]
+
+
+
+def _jsonable(value):
+    '''
+        Field values are mostly numbers and names, anything else is written as a string
+    '''
+    if isinstance(value, (int, long, float, basestring, bool)) or value is None:
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    if isinstance(value, dict):
+        return dict((str(key), _jsonable(item)) for key, item in value.items())
+    return str(value)
+
+
+def json_line(record):
+    '''
+        Format a record as a line of JSON:
+            {"time": ..., "level": "info", "category": ..., "event": ..., <fields>}
+    '''
+    time, level, category, event, fields = record
+    line = _jsonable(fields)
+    line.update({'time': time, 'level': TRACE_LEVEL_NAMES.get(level, level),
+                 'category': category, 'event': event})
+    return json.dumps(line, sort_keys = True)
+
+
+class JsonlSink(object):
+    '''
+        Write every record as a line of JSON (see json_line)
+    '''
+    def __init__(self, file_name):
+        self.traceFile = open(file_name, 'w')
+
+    def write(self, record):
+        self.traceFile.write(json_line(record) + '\n')
+
+    def close(self):
+        self.traceFile.close()
+
+
+class BinarySink(object):
+    '''
+        Write the records with marshal, read them back with read_binary
+        Field values which marshal can not write are replaced by strings
+    '''
+    def __init__(self, file_name):
+        self.traceFile = open(file_name, 'wb')
+
+    def write(self, record):
+        try:
+            data = marshal.dumps(record)
+        except ValueError:
+            time, level, category, event, fields = record
+            data = marshal.dumps((time, level, category, event, _jsonable(fields)))
+        self.traceFile.write(data)
+
+    def close(self):
+        self.traceFile.close()
+
+
+class ConsoleSink(object):
+    '''
+        Print every record, one line each
+    '''
+    def write(self, record):
+        time, level, category, event, fields = record
+        print '{:.6f} {} {} {} {}'.format(time, TRACE_LEVEL_NAMES.get(level, level), category, event,
+                                          ' '.join('%s=%s' % item for item in sorted(fields.items())))
+
+    def close(self):
+        pass
+
+
+def read_binary(file_name):
+    '''
+        Read the records written by a BinarySink
+
+        Return:
+            generator of (time, level, category, event, fields)
+    '''
+    with open(file_name, 'rb') as traceFile:
+        while True:
+            try:
+                yield marshal.load(traceFile)
+            except EOFError:
+                return
+
+
+'''
+    Tracer used by the whole simulator
+'''
+tracer = Tracer()
+
+
+def main():
+    if len(sys.argv) < 2:
+        print 'Usage: python tracing.py trace.bin'
+        return
+    for record in read_binary(sys.argv[1]):
+        print json_line(record)
+
+
+if __name__ == '__main__':
+    main()